@@ -0,0 +1,166 @@
+"""
+batch conversion over a multiprocessing pool
+
+inputs may be schematic files, directories (searched recursively for *.sch) or glob patterns;
+a manifest is a text file listing one input per line
+"""
+
+import glob
+import json
+import multiprocessing
+import os
+import time
+import traceback
+
+_options = {}
+
+
+def init_worker(options):
+    """
+    options are handed to each worker process once, so caches they hold live across files
+    """
+    global _options
+    _options = options
+
+
+def glob_base(pattern):
+    """
+    the directory of pattern before its first wildcard, which names of its matches are relative to
+    """
+    parts = []
+    for part in pattern.replace(os.sep, "/").split("/"):
+        if glob.has_magic(part):
+            break
+        parts.append(part)
+    return "/".join(parts) or "."
+
+
+def unique_names(jobs):
+    """
+    renames jobs whose outputs would have the same name after the path relative to their common
+    directory; raises ValueError when names still clash
+    """
+    groups = {}
+    for path, name in jobs:
+        groups.setdefault(os.path.normcase(os.path.splitext(name)[0]), []).append(path)
+    renamed = {}
+    for paths in groups.values():
+        if len(paths) > 1:
+            root = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in paths])
+            renamed.update((path, os.path.relpath(os.path.abspath(path), root)) for path in paths)
+    jobs = [(path, renamed.get(path, name)) for path, name in jobs]
+
+    seen = {}
+    for path, name in jobs:
+        key = os.path.normcase(os.path.splitext(name)[0])
+        if key in seen:
+            raise ValueError("{} and {} would both be written to {}".format(seen[key], path, name))
+        seen[key] = path
+    return jobs
+
+
+def collect(inputs=(), manifest=None):
+    """
+    returns a list of (schematic, relative output name) without duplicates.
+    files under a directory or matched by a glob pattern are named by their path below it,
+    other files by their base name; files which would get the same name are told apart by their directories
+    """
+    inputs = list(inputs)
+    if manifest is not None:
+        base = os.path.dirname(manifest)
+        with open(manifest, "r") as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    inputs.append(os.path.join(base, line))
+
+    found = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, dirs, files in os.walk(item):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(".sch"):
+                        path = os.path.join(root, name)
+                        found.append((path, os.path.relpath(path, item)))
+        elif glob.has_magic(item):
+            base = glob_base(item)
+            found.extend((path, os.path.relpath(path, base)) for path in sorted(glob.glob(item, recursive=True))
+                         if os.path.isfile(path))
+        else:
+            found.append((item, os.path.basename(item)))
+
+    seen = set()
+    jobs = []
+    for path, name in found:
+        key = os.path.abspath(path)
+        if key not in seen:
+            seen.add(key)
+            jobs.append((path, name))
+    return unique_names(jobs)
+
+
+def output_name(name, output_dir, suffix=".svg"):
+    return os.path.join(output_dir, os.path.splitext(name)[0] + suffix)
+
+
+def convert_one(job):
+    """
+    runs in a worker; a failure is reported in the result rather than raised
+    """
+    import eaglesch2svg
+
+    filename, output = job
+    result = {"input": filename, "output": output, "error": None, "cached": False}
+    start = time.perf_counter()
+    try:
+        directory = os.path.dirname(output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        result["cached"] = eaglesch2svg.convert(filename, output, **_options)
+    except Exception:
+        result["error"] = traceback.format_exc()
+        if os.path.isfile(output):
+            os.remove(output)
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def run(jobs, output_dir, processes=None, options=None, callback=None):
+    """
+    converts every (schematic, name) in jobs to output_dir and returns a summary dict.
+    processes=None uses one worker per CPU; callback(result) is called as each file finishes
+    """
+    options = options or {}
+    if options.get("per_sheet") or options.get("tiles"):
+        suffix = ""
+    else:
+        suffix = ".svgz" if options.get("svgz") else ".svg"
+    tasks = [(filename, output_name(name, output_dir, suffix)) for filename, name in jobs]
+    results = []
+    start = time.perf_counter()
+    if processes == 1:
+        init_worker(options)
+        for task in tasks:
+            results.append(convert_one(task))
+            if callback is not None:
+                callback(results[-1])
+    else:
+        with multiprocessing.Pool(processes, initializer=init_worker, initargs=(options,)) as pool:
+            for result in pool.imap_unordered(convert_one, tasks):
+                results.append(result)
+                if callback is not None:
+                    callback(result)
+    results.sort(key=lambda result: result["input"])
+    return {
+        "total": len(results),
+        "failed": sum(1 for result in results if result["error"] is not None),
+        "cached": sum(1 for result in results if result["cached"]),
+        "seconds": time.perf_counter() - start,
+        "files": results,
+    }
+
+
+def write_summary(summary, filename):
+    with open(filename, "w") as f:
+        json.dump(summary, f, indent=2)
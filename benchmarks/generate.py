@@ -0,0 +1,201 @@
+"""
+synthetic Eagle 7.x schematics of a given size
+
+    python benchmarks/generate.py -O big.sch --sheets 10 --instances 400 --nets 300
+
+every library has symbols with wires, a rectangle, a circle, a polygon, >NAME and >VALUE texts and pins,
+and one deviceset per symbol. every instance is a part of its own; nets join pins of instances on the
+same sheet with segments of wires, a junction and a label. the same arguments and seed give the same file
+"""
+
+import argparse
+import random
+from xml.sax.saxutils import quoteattr
+
+GRID = 2.54
+ROTATIONS = ["R0", "R90", "R180", "R270"]  # pin_position() follows quarter turns only
+
+HEADER = """<?xml version="1.0" encoding="utf-8"?>
+<!DOCTYPE eagle SYSTEM "eagle.dtd">
+<eagle version="7.7.0">
+<drawing>
+<settings>
+<setting alwaysvectorfont="no"/>
+</settings>
+<grid distance="0.1" unitdist="inch" unit="inch" style="lines" multiple="1" display="no"/>
+<layers>
+<layer number="91" name="Nets" color="2" fill="1" visible="yes" active="yes"/>
+<layer number="94" name="Symbols" color="4" fill="1" visible="yes" active="yes"/>
+<layer number="95" name="Names" color="7" fill="1" visible="yes" active="yes"/>
+<layer number="96" name="Values" color="7" fill="1" visible="yes" active="yes"/>
+</layers>
+<schematic xreflabel="%F%N/%S.%C%R" xrefpart="/%S.%C%R">
+"""
+
+FOOTER = """</schematic>
+</drawing>
+</eagle>
+"""
+
+DEFAULTS = {"sheets": 2, "libraries": 3, "symbols": 8, "instances": 40, "nets": 30, "wires": 4, "texts": 10}
+
+
+def element(tag, **attrs):
+    items = " ".join("{}={}".format(key, quoteattr(str(value))) for key, value in attrs.items())
+    return "<{} {}/>".format(tag, items)
+
+
+def coord(value):
+    return round(value, 4)
+
+
+class Generator(object):
+    """
+    sizes: sheets, libraries, symbols per library, instances per sheet, nets per sheet,
+    wires per segment and plain texts per sheet
+    """
+
+    def __init__(self, sheets=2, libraries=3, symbols=8, instances=40, nets=30, wires=4, texts=10, seed=0):
+        self.sheets = sheets
+        self.libraries = libraries
+        self.symbols = symbols
+        self.instances = instances
+        self.nets = nets
+        self.wires = wires
+        self.texts = texts
+        self.random = random.Random(seed)
+        # (library, symbol) -> pin names and positions
+        self.pins = {}
+
+    def write(self, f):
+        f.write(HEADER)
+        f.write("<libraries>\n")
+        for library in range(self.libraries):
+            self.write_library(f, "lib{}".format(library))
+        f.write("</libraries>\n<attributes>\n</attributes>\n<variantdefs>\n</variantdefs>\n")
+        f.write('<classes>\n<class number="0" name="default" width="0" drill="0">\n</class>\n</classes>\n')
+
+        placed = [[self.place(sheet, number) for number in range(self.instances)] for sheet in range(self.sheets)]
+        f.write("<parts>\n")
+        for instances in placed:
+            for part, library, symbol, x, y, rot in instances:
+                value = "" if symbol % 2 else "{}k".format(self.random.randint(1, 99))
+                f.write(element("part", name=part, library=library, deviceset="D{}".format(symbol), device="",
+                                value=value) + "\n")
+        f.write("</parts>\n<sheets>\n")
+        for sheet, instances in enumerate(placed):
+            self.write_sheet(f, sheet, instances)
+        f.write("</sheets>\n")
+        f.write(FOOTER)
+
+    def write_library(self, f, name):
+        f.write('<library name="{}">\n<description>generated</description>\n<symbols>\n'.format(name))
+        for symbol in range(self.symbols):
+            self.write_symbol(f, name, symbol)
+        f.write("</symbols>\n<devicesets>\n")
+        for symbol in range(self.symbols):
+            uservalue = ' uservalue="yes"' if symbol % 2 == 0 else ""
+            f.write('<deviceset name="D{0}" prefix="U"{1}>\n<gates>\n'
+                    '<gate name="G$1" symbol="S{0}" x="0" y="0"/>\n</gates>\n'
+                    '<devices>\n<device name="">\n<technologies>\n<technology name=""/>\n</technologies>\n'
+                    '</device>\n</devices>\n</deviceset>\n'.format(symbol, uservalue))
+        f.write("</devicesets>\n</library>\n")
+
+    def write_symbol(self, f, library, symbol):
+        half = GRID * (1 + symbol % 3)
+        f.write('<symbol name="S{}">\n'.format(symbol))
+        corners = [(-half, -half), (half, -half), (half, half), (-half, half)]
+        for (x1, y1), (x2, y2) in zip(corners, corners[1:] + corners[:1]):
+            f.write(element("wire", x1=x1, y1=y1, x2=x2, y2=y2, width=0.254, layer=94) + "\n")
+        f.write(element("rectangle", x1=-half / 2, y1=-half / 2, x2=0, y2=0, layer=94) + "\n")
+        f.write(element("circle", x=half / 2, y=half / 2, radius=GRID / 4, width=0.254, layer=94) + "\n")
+        f.write('<polygon width="0.254" layer="94">\n{}\n{}\n{}\n</polygon>\n'.format(
+            element("vertex", x=0, y=half / 2), element("vertex", x=half / 2, y=0, curve=90),
+            element("vertex", x=0, y=0)))
+        f.write('<text x="{}" y="{}" size="1.778" layer="95">&gt;NAME</text>\n'.format(-half, half + 0.5))
+        f.write('<text x="{}" y="{}" size="1.778" layer="96">&gt;VALUE</text>\n'.format(-half, -half - 2.5))
+        pins = []
+        for number in range(2 + symbol % 3):
+            side = -1 if number % 2 == 0 else 1
+            x, y = side * (half + GRID * 2), coord(half - GRID * (number // 2))
+            rot = "R0" if side < 0 else "R180"
+            f.write(element("pin", name="P{}".format(number), x=x, y=y, visible="pad", length="short",
+                            direction="pas", rot=rot) + "\n")
+            pins.append(("P{}".format(number), x, y))
+        f.write("</symbol>\n")
+        self.pins[(library, symbol)] = pins
+
+    def place(self, sheet, number):
+        columns = max(1, int(self.instances ** 0.5))
+        library = "lib{}".format(self.random.randrange(self.libraries))
+        symbol = self.random.randrange(self.symbols)
+        x = coord(GRID * 12 * (number % columns + 1))
+        y = coord(GRID * 12 * (number // columns + 1))
+        return "U{}_{}".format(sheet + 1, number + 1), library, symbol, x, y, self.random.choice(ROTATIONS)
+
+    def pin_position(self, instance, pin):
+        part, library, symbol, x, y, rot = instance
+        name, px, py = pin
+        angle = int(rot[1:])
+        for _ in range(angle // 90):
+            px, py = -py, px
+        return coord(x + px), coord(y + py)
+
+    def write_sheet(self, f, sheet, instances):
+        f.write("<sheet>\n<plain>\n")
+        width = GRID * 12 * (max(1, int(self.instances ** 0.5)) + 2)
+        height = GRID * 12 * (self.instances // max(1, int(self.instances ** 0.5)) + 2)
+        f.write(element("frame", x1=0, y1=0, x2=coord(width), y2=coord(height), columns=8, rows=5, layer=94) + "\n")
+        for number in range(self.texts):
+            f.write('<text x="{}" y="{}" size="2.54" layer="94">note {} of sheet {}</text>\n'.format(
+                coord(self.random.uniform(0, width)), coord(self.random.uniform(0, height)), number + 1, sheet + 1))
+        f.write("</plain>\n<instances>\n")
+        for part, library, symbol, x, y, rot in instances:
+            f.write(element("instance", part=part, gate="G$1", x=x, y=y, rot=rot) + "\n")
+        f.write("</instances>\n<busses>\n</busses>\n<nets>\n")
+        for number in range(self.nets if instances else 0):
+            self.write_net(f, "N$S{}_{}".format(sheet + 1, number + 1), instances)
+        f.write("</nets>\n</sheet>\n")
+
+    def write_net(self, f, name, instances):
+        a, b = self.random.choice(instances), self.random.choice(instances)
+        pin_a = self.random.choice(self.pins[(a[1], a[2])])
+        pin_b = self.random.choice(self.pins[(b[1], b[2])])
+        (x1, y1), (x2, y2) = self.pin_position(a, pin_a), self.pin_position(b, pin_b)
+        f.write('<net name="{}" class="0">\n<segment>\n'.format(name))
+        f.write(element("pinref", part=a[0], gate="G$1", pin=pin_a[0]) + "\n")
+        f.write(element("pinref", part=b[0], gate="G$1", pin=pin_b[0]) + "\n")
+        # a staircase of wires from one pin to the other
+        points = [(x1, y1)]
+        for step in range(1, self.wires):
+            x, y = points[-1]
+            if step % 2:
+                points.append((coord(x1 + (x2 - x1) * step / self.wires), y))
+            else:
+                points.append((x, coord(y1 + (y2 - y1) * step / self.wires)))
+        points.append((x2, y2))
+        for (sx, sy), (ex, ey) in zip(points, points[1:]):
+            f.write(element("wire", x1=sx, y1=sy, x2=ex, y2=ey, width=0.1524, layer=91) + "\n")
+        jx, jy = points[len(points) // 2]
+        f.write(element("junction", x=jx, y=jy) + "\n")
+        f.write(element("label", x=jx, y=jy, size=1.778, layer=95, xref="yes") + "\n")
+        f.write("</segment>\n</net>\n")
+
+
+def generate(filename, seed=0, **sizes):
+    with open(filename, "w", encoding="utf-8") as f:
+        Generator(seed=seed, **sizes).write(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="write a synthetic Eagle schematic")
+    parser.add_argument("--output", "-O", default="synthetic.sch")
+    parser.add_argument("--seed", type=int, default=0)
+    for name, default in DEFAULTS.items():
+        parser.add_argument("--" + name, type=int, default=default)
+    args = parser.parse_args()
+    generate(args.output, args.seed, **{name: getattr(args, name) for name in DEFAULTS})
+
+
+if __name__ == "__main__":
+    main()
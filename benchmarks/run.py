@@ -0,0 +1,159 @@
+"""
+benchmark suite: converts generated schematics of several sizes and records per-phase timings and peak memory
+
+    python benchmarks/run.py -O results.json
+    python benchmarks/run.py -O new.json --compare results.json
+
+phases are those of instrument.py: parse (XML parse and Schematic build), library, populate and serialize;
+"xml" is a plain ElementTree parse of the same file for comparison. timings are taken over --repeat runs
+without tracemalloc, then peak memory is measured in one more run with it
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from xml.etree import ElementTree
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import geometry
+import instrument
+from converter import Converter
+from eaglesch2svg import __version__
+from generate import Generator
+
+CASES = {
+    "small": {"sheets": 1, "libraries": 2, "symbols": 4, "instances": 20, "nets": 15, "wires": 3, "texts": 5},
+    "medium": {"sheets": 4, "libraries": 5, "symbols": 12, "instances": 100, "nets": 80, "wires": 5, "texts": 20},
+    "large": {"sheets": 10, "libraries": 10, "symbols": 20, "instances": 400, "nets": 300, "wires": 8, "texts": 50},
+}
+PHASES = ("parse", "library", "populate", "serialize")
+
+
+def summary(values):
+    return {"min": min(values), "median": statistics.median(values), "mean": statistics.mean(values)}
+
+
+def commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def measure(converter, filename, output):
+    stats = instrument.Instrumentation()
+    start = time.perf_counter()
+    with instrument.activate(stats), open(output, "wb") as f:
+        converter.write(filename, f)
+    return time.perf_counter() - start, stats
+
+
+def run_case(name, sizes, converter, repeat, directory):
+    filename = os.path.join(directory, name + ".sch")
+    output = os.path.join(directory, name + ".svg")
+    with open(filename, "w", encoding="utf-8") as f:
+        Generator(**sizes).write(f)
+
+    xml = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        ElementTree.parse(filename)
+        xml.append(time.perf_counter() - start)
+
+    totals = []
+    phases = {phase: [] for phase in PHASES}
+    for _ in range(repeat):
+        total, stats = measure(converter, filename, output)
+        totals.append(total)
+        for phase in PHASES:
+            phases[phase].append(stats.phases.get(phase, 0.0))
+
+    tracemalloc.start()
+    try:
+        measure(converter, filename, output)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "name": name,
+        "sizes": sizes,
+        "input_bytes": os.path.getsize(filename),
+        "output_bytes": os.path.getsize(output),
+        "elements": {element: values["count"] for element, values in stats.report()["elements"].items()},
+        "repeat": repeat,
+        "total": summary(totals),
+        "xml": summary(xml),
+        "phases": {phase: summary(values) for phase, values in phases.items()},
+        "peak_memory": peak,
+    }
+
+
+def compare(baseline, results):
+    """
+    prints median time and peak memory of results relative to baseline, per case
+    """
+    cases = {case["name"]: case for case in baseline["cases"]}
+    for case in results["cases"]:
+        before = cases.get(case["name"])
+        if before is None or before["sizes"] != case["sizes"]:
+            print("{}: not in baseline".format(case["name"]))
+            continue
+        rows = [("total", before["total"]["median"], case["total"]["median"])]
+        rows += [(phase, before["phases"][phase]["median"], case["phases"][phase]["median"]) for phase in PHASES]
+        rows.append(("peak_memory", before["peak_memory"], case["peak_memory"]))
+        print(case["name"])
+        for label, old, new in rows:
+            ratio = "{:.2f}x".format(new / old) if old else "-"
+            print("  {:<12} {:>14.6g} {:>14.6g} {:>8}".format(label, old, new, ratio))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="time conversion of generated schematics")
+    parser.add_argument("--output", "-O", default="benchmark.json", help="results JSON file")
+    parser.add_argument("--cases", nargs="+", choices=sorted(CASES), default=["small", "medium", "large"])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--parser", choices=["stream", "dom"], default="stream")
+    parser.add_argument("--backend", choices=["stream", "svgwrite"], default="stream")
+    parser.add_argument("--compare", default=None, metavar="BASELINE",
+                        help="print results relative to an earlier results file")
+    args = parser.parse_args()
+
+    # as the command line converts
+    converter = Converter(args.parser, args.backend, release_sheets=True)
+    results = {
+        "version": __version__,
+        "commit": commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": geometry.numpy is not None,
+        "options": {"parser": args.parser, "backend": args.backend, "repeat": args.repeat},
+        "cases": [],
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        for name in args.cases:
+            case = run_case(name, CASES[name], converter, args.repeat, directory)
+            results["cases"].append(case)
+            print("{}: {:.3f}s median, {:.1f} MB peak".format(name, case["total"]["median"],
+                                                             case["peak_memory"] / 1024 / 1024), file=sys.stderr)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    if args.compare is not None:
+        with open(args.compare, "r") as f:
+            compare(json.load(f), results)
+
+
+if __name__ == "__main__":
+    main()
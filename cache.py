@@ -0,0 +1,194 @@
+"""
+on-disk caches
+
+ResultCache holds converted SVGs. an entry is keyed by a hash of the input bytes, the converter version
+and the render options; evict() removes least recently used entries until the cache fits in its size limit;
+it walks the whole cache so it is called once after a run rather than after every store
+
+LibraryCache holds compiled libraries shared by many schematics
+"""
+
+import collections
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import zlib
+
+
+class ResultCache(object):
+    suffix = ".svg"
+
+    def __init__(self, directory, max_bytes=1024 * 1024 * 1024, link=False):
+        """
+        link: hard link cached results to the output instead of copying them
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.link = link
+
+    @staticmethod
+    def key(data, version, options):
+        digest = hashlib.sha256()
+        digest.update(version.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(json.dumps(options, sort_keys=True).encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(data)
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key + self.suffix)
+
+    def fetch(self, key, output):
+        """
+        puts the cached result for key at output; returns False on a miss
+        """
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return False
+        if os.path.exists(output):
+            os.remove(output)
+        if self.link:
+            try:
+                os.link(path, output)
+                return True
+            except OSError:
+                pass
+        try:
+            shutil.copyfile(path, output)
+        except FileNotFoundError:
+            # evicted by another process in the meantime
+            return False
+        return True
+
+    def store(self, key, output):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        os.close(fd)
+        try:
+            shutil.copy(output, tmp)
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+    def entries(self):
+        for root, dirs, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(self.suffix):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    yield stat.st_mtime, stat.st_size, path
+
+    def evict(self):
+        entries = sorted(self.entries())
+        total = sum(size for mtime, size, path in entries)
+        for mtime, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+class LibraryCache(object):
+    """
+    compiled Library objects stored by a hash of their <library> subtree.
+    libraries are pickled together with the symbols and devicesets built so far and
+    the most recently used ones are also kept in memory for the following schematics.
+    without a directory libraries are only kept in memory. one cache may be shared by threads
+    """
+    suffix = ".lib"
+
+    def __init__(self, directory, version="", memory=64):
+        self.directory = directory
+        self.version = version
+        self.memory = memory
+        self.loaded = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __getstate__(self):
+        # handed to worker processes without the lock
+        state = dict(self.__dict__)
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def key(self, obj):
+        digest = hashlib.sha256()
+        digest.update(self.version.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(json.dumps(obj, sort_keys=True).encode("utf-8"))
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key + self.suffix)
+
+    def remember(self, key, library):
+        with self.lock:
+            self.loaded[key] = library
+            self.loaded.move_to_end(key)
+            while len(self.loaded) > self.memory:
+                self.loaded.popitem(last=False)
+
+    def load(self, key):
+        """
+        returns the cached Library or None
+        """
+        with self.lock:
+            library = self.loaded.get(key)
+            if library is not None:
+                self.loaded.move_to_end(key)
+                self.hits += 1
+                return library
+        library = None
+        if self.directory is not None:
+            try:
+                with open(self.path(key), "rb") as f:
+                    library = pickle.loads(zlib.decompress(f.read()))
+            except FileNotFoundError:
+                pass
+            except Exception:
+                # written by an incompatible version or truncated; rebuild it
+                pass
+        if library is None:
+            with self.lock:
+                self.misses += 1
+            return None
+        with self.lock:
+            self.hits += 1
+        self.remember(key, library)
+        return library
+
+    def store(self, key, library):
+        if self.directory is None:
+            self.remember(key, library)
+            return
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(zlib.compress(pickle.dumps(library, pickle.HIGHEST_PROTOCOL)))
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+        self.remember(key, library)
@@ -0,0 +1,136 @@
+"""
+re-entrant conversion API
+
+a Converter holds only its options; everything a conversion builds lives in that call, so one
+Converter can be used again and again and from several threads at once:
+
+    converter = Converter(merge_wires=True)
+    svg = converter.convert(open("a.sch", "rb").read())    # bytes
+    stream = converter.stream("a.sch")                      # file object at the start of the SVG
+    converter.write(source, f)                              # into a file object opened by the caller
+
+a source is a file name, bytes or a binary file object. a LibraryCache shared by the threads
+lets them reuse compiled libraries.
+
+run() returns the Schematic, whose sheets keep their spatial index for hit-testing:
+
+    schematic = Converter().run("a.sch", layout)
+    schematic.sheets[0].index.at(x, y)     # (box, kind, name, obj) of whatever is drawn at x, y
+
+with release_sheets=True every sheet is dropped as soon as it has been drawn instead, so memory does
+not grow with the number of sheets; the command line converts that way
+"""
+
+import io
+import shutil
+import tempfile
+
+import attrdict
+import xmltodict
+
+import instrument
+import streamparser
+from output import Document
+from schematic import Schematic
+from writer import StreamWriter, SvgwriteWriter
+
+
+class Converter(object):
+
+    def __init__(self, parser="stream", backend="stream", library_cache=None, merge_wires=False, flatten=False,
+                 css=False, infer_junctions=False, release_sheets=False, fit_viewbox=False):
+        """
+        parser: "stream" or "dom"; backend: "stream" or "svgwrite".
+        infer_junctions: add the junctions a file leaves out, see Segment.infer_junctions().
+        release_sheets: drop each sheet once drawn, see Sheet.release().
+        fit_viewbox: see write()
+        """
+        self.parser = parser
+        self.backend = backend
+        self.library_cache = library_cache
+        self.merge_wires = merge_wires
+        self.flatten = flatten
+        self.css = css
+        self.infer_junctions = infer_junctions
+        self.release_sheets = release_sheets
+        self.fit_viewbox = fit_viewbox
+
+    def run(self, source, layout):
+        """
+        parses source into layout, see output.py; returns the Schematic, whose sheets have been
+        released once drawn with release_sheets
+        """
+        if isinstance(source, (bytes, bytearray)):
+            source = io.BytesIO(source)
+        on_sheet = layout
+        if self.infer_junctions:
+            def on_sheet(schematic, sheet):
+                with instrument.phase("populate"):
+                    sheet.infer_junctions()
+                layout(schematic, sheet)
+
+        layout.begin()
+        with instrument.phase("parse"):
+            if self.parser == "stream":
+                sch = streamparser.parse(source, on_sheet, self.library_cache, release_sheets=self.release_sheets)
+            else:
+                if isinstance(source, str):
+                    with open(source, "rb") as f:
+                        sch = xmltodict.parse(f)
+                else:
+                    sch = xmltodict.parse(source)
+                sch = attrdict.AttrDict(sch["eagle"]["drawing"]["schematic"])
+                sch = Schematic(sch, on_sheet, self.library_cache, release_sheets=self.release_sheets)
+        if self.library_cache is not None:
+            sch.store_libraries()
+
+        with instrument.phase("serialize"):
+            layout.end(sch)
+        return sch
+
+    def writer(self, f, rewritable=True):
+        if self.backend == "stream":
+            return StreamWriter(f, css=self.css, rewritable=rewritable)
+        return SvgwriteWriter(f, css=self.css)
+
+    def write(self, source, f, rewritable=True):
+        """
+        writes the SVG of source into f, a text or binary file object, as each sheet is drawn.
+        rewritable=False when f must only be appended to, e.g. a socket; like a file which can not be
+        seeked, it keeps a default viewBox then. with fit_viewbox such output is written to a temporary
+        file first, so the viewBox can still fit the drawing
+        """
+        if self.fit_viewbox and (not rewritable or not f.seekable()):
+            with tempfile.TemporaryFile() as raw:
+                self.write(source, raw)
+                raw.seek(0)
+                if isinstance(f, io.TextIOBase):
+                    f.write(raw.read().decode("utf-8"))
+                else:
+                    shutil.copyfileobj(raw, f)
+            return
+        if isinstance(f, io.TextIOBase):
+            self.run(source, Document(self.writer(f, rewritable), self.merge_wires, self.flatten))
+            return
+        text = io.TextIOWrapper(f, encoding="utf-8")
+        try:
+            self.run(source, Document(self.writer(text, rewritable), self.merge_wires, self.flatten))
+        finally:
+            text.flush()
+            # f stays open for the caller
+            text.detach()
+
+    def stream(self, source):
+        """
+        SVG of source as a binary file object positioned at its start
+        """
+        f = io.BytesIO()
+        self.write(source, f)
+        f.seek(0)
+        return f
+
+    def convert(self, source):
+        """
+        SVG of source as bytes
+        """
+        return self.stream(source).getvalue()
@@ -0,0 +1,259 @@
+"""
+conversion service: a long-running process which converts schematics on request
+
+requests come over HTTP, on a TCP port or a Unix socket, and run on a pool of worker processes.
+every worker imports the converter once and keeps a LibraryCache, so libraries and symbols built for
+one request are reused by the following ones without being compiled or unpickled again
+
+    POST /convert   {"input": "a.sch", "output": "a.svg", "options": {"merge_wires": true}}
+    GET  /metrics   request counts, latencies and cache hit rates
+
+paths are relative to the directory the service runs in. options are those of convert() which
+do not name a cache; the rest come from the command line the service was started with.
+a result cache is kept within its size limit every EVICT_INTERVAL seconds while the service runs
+"""
+
+import collections
+import json
+import multiprocessing
+import os
+import socket
+import socketserver
+import stat
+import sys
+import threading
+import time
+import traceback
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+OPTIONS = {"parser", "backend", "per_sheet", "tiles", "merge_wires", "flatten", "css", "svgz", "infer_junctions",
+           "search_index", "fit_viewbox"}
+
+EVICT_INTERVAL = 60.0
+
+_options = {}
+
+
+def init_worker(options):
+    global _options
+    _options = options
+
+
+def convert_request(request):
+    """
+    runs in a worker; a failure is reported in the result rather than raised
+    """
+    import eaglesch2svg
+
+    options = dict(_options, **request["options"])
+    library_cache = options.get("library_cache")
+    hits, misses = (library_cache.hits, library_cache.misses) if library_cache is not None else (0, 0)
+    result = {"input": request["input"], "output": request["output"], "error": None, "cached": False}
+    start = time.perf_counter()
+    try:
+        result["cached"] = eaglesch2svg.convert(request["input"], request["output"], **options)
+    except Exception:
+        result["error"] = traceback.format_exc()
+    result["seconds"] = time.perf_counter() - start
+    if library_cache is not None:
+        result["library_hits"] = library_cache.hits - hits
+        result["library_misses"] = library_cache.misses - misses
+    return result
+
+
+def parse_request(body):
+    """
+    returns the request dict of a /convert body; raises ValueError when it is not one
+    """
+    request = json.loads(body.decode("utf-8"))
+    if not isinstance(request, dict):
+        raise ValueError("request must be a JSON object")
+    for name in ("input", "output"):
+        if not isinstance(request.get(name), str) or not request[name]:
+            raise ValueError("{} must be a file name".format(name))
+    if request["output"] == "-":
+        raise ValueError("output must be a file name")
+    options = request.get("options") or {}
+    if not isinstance(options, dict):
+        raise ValueError("options must be a JSON object")
+    unknown = set(options) - OPTIONS
+    if unknown:
+        raise ValueError("unknown options: {}".format(", ".join(sorted(unknown))))
+    return {"input": request["input"], "output": request["output"], "options": options}
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+class Metrics(object):
+    """
+    counts over the lifetime of the service; latencies of the last window requests
+    """
+
+    def __init__(self, window=1000):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.requests = 0
+        self.failed = 0
+        self.cached = 0
+        self.library_hits = 0
+        self.library_misses = 0
+        self.latencies = collections.deque(maxlen=window)
+
+    def record(self, result, latency):
+        with self.lock:
+            self.requests += 1
+            self.failed += result["error"] is not None
+            self.cached += result["cached"]
+            self.library_hits += result.get("library_hits", 0)
+            self.library_misses += result.get("library_misses", 0)
+            self.latencies.append(latency)
+
+    def report(self):
+        with self.lock:
+            latencies = list(self.latencies)
+            loads = self.library_hits + self.library_misses
+            return {
+                "uptime": time.time() - self.started,
+                "requests": self.requests,
+                "failed": self.failed,
+                "results": {"hits": self.cached,
+                            "hit_rate": self.cached / self.requests if self.requests else None},
+                "libraries": {"hits": self.library_hits, "misses": self.library_misses,
+                              "hit_rate": self.library_hits / loads if loads else None},
+                "latency": {"count": len(latencies),
+                            "mean": sum(latencies) / len(latencies) if latencies else None,
+                            "p50": percentile(latencies, 0.5),
+                            "p95": percentile(latencies, 0.95),
+                            "max": max(latencies) if latencies else None},
+            }
+
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = "eaglesch2svg"
+
+    def send_json(self, status, obj):
+        body = json.dumps(obj, indent=2).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            self.send_json(200, self.server.metrics.report())
+        else:
+            self.send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/convert":
+            self.send_json(404, {"error": "not found"})
+            return
+        try:
+            request = parse_request(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        except ValueError as e:
+            self.send_json(400, {"error": str(e)})
+            return
+        start = time.perf_counter()
+        result = self.server.pool.apply(convert_request, (request,))
+        self.server.metrics.record(result, time.perf_counter() - start)
+        self.send_json(200 if result["error"] is None else 500, result)
+
+    def log_message(self, format, *args):
+        # requests are counted in /metrics instead
+        pass
+
+
+class Server(socketserver.ThreadingMixIn, HTTPServer):
+    """
+    one thread per connection, each waiting for its conversion on the shared pool
+    """
+    daemon_threads = True
+
+    def __init__(self, address, pool):
+        self.pool = pool
+        self.metrics = Metrics()
+        HTTPServer.__init__(self, address, Handler)
+
+    def server_bind(self):
+        if self.address_family == socket.AF_UNIX:
+            # no host and port to look up for a socket file
+            socketserver.TCPServer.server_bind(self)
+        else:
+            HTTPServer.server_bind(self)
+
+
+class UnixServer(Server):
+    address_family = socket.AF_UNIX
+
+
+def evict_periodically(cache, stop, interval=EVICT_INTERVAL):
+    """
+    runs in a thread of the service until stop is set, and once more then
+    """
+    while not stop.wait(interval):
+        try:
+            cache.evict()
+        except OSError:
+            traceback.print_exc()
+    cache.evict()
+
+
+def parse_address(address):
+    """
+    "host:port" or ":port" for TCP, anything else is the path of a Unix socket
+    """
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit() and "/" not in address:
+        return host or "127.0.0.1", int(port)
+    return address
+
+
+def remove_socket(path):
+    """
+    removes the Unix socket at path, e.g. one left by a service which did not shut down;
+    raises ValueError when something else is there
+    """
+    try:
+        mode = os.lstat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise ValueError("{} exists and is not a socket".format(path))
+    os.remove(path)
+
+
+def serve(address, processes=None, options=None):
+    """
+    serves conversions at address until interrupted. processes=None uses one worker per CPU;
+    options are passed to convert() in the workers unless a request sets them.
+    a socket left at a Unix socket address is replaced; anything else there is a ValueError
+    """
+    options = options or {}
+    address = parse_address(address)
+    if not isinstance(address, tuple):
+        remove_socket(address)
+    stop = threading.Event()
+    if options.get("cache") is not None:
+        threading.Thread(target=evict_periodically, args=(options["cache"], stop), daemon=True).start()
+    with multiprocessing.Pool(processes, initializer=init_worker, initargs=(options,)) as pool:
+        if isinstance(address, tuple):
+            server = Server(address, pool)
+        else:
+            server = UnixServer(address, pool)
+        print("serving on {}".format(address if isinstance(address, str) else "http://{}:{}".format(*address)),
+              file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            stop.set()
+            server.server_close()
+            if not isinstance(address, tuple):
+                remove_socket(address)
@@ -1,8 +1,35 @@
-import xmltodict
-import attrdict
-from schematic import Schematic
+import instrument
+from converter import Converter
+from writer import open_writer
+from output import Document, SheetDocuments, Tiles
+import os
+import batch
+import daemon
+import extract
+import search
+from cache import ResultCache, LibraryCache
+from watch import Watcher
 import argparse
-import svgwrite
+import functools
+import hashlib
+import sys
+
+__version__ = "0.1.0"
+
+
+@functools.lru_cache(maxsize=None)
+def code_version():
+    """
+    __version__ and a hash of the converter's sources; cached results are keyed on it,
+    so those of a converter which draws differently are not used
+    """
+    digest = hashlib.sha256()
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".py"):
+            with open(os.path.join(directory, name), "rb") as f:
+                digest.update(name.encode("utf-8") + b"\0" + f.read() + b"\0")
+    return "{}+{}".format(__version__, digest.hexdigest()[:16])
 
 
 class MyParser(object):
@@ -11,31 +38,230 @@ class MyParser(object):
         self._parser = argparse.ArgumentParser(description="")
         self._parser.add_argument("--input", "-I", help="schematic input",
                                   default="untitled.sch")
-        self._parser.add_argument("--output", "-O", help="SVG input",
+        self._parser.add_argument("--output", "-O", help="SVG output; - writes to stdout and "
+                                                         "a name ending in .svgz is gzip compressed",
                                   default="svg.svg")
+        self._parser.add_argument("--parser", "-P", help="stream: build objects while reading (default), "
+                                                         "dom: read whole file with xmltodict first",
+                                  choices=["stream", "dom"], default="stream")
+        self._parser.add_argument("--backend", "-B", help="stream: write SVG text directly (default), "
+                                                          "svgwrite: build an svgwrite drawing and save it",
+                                  choices=["stream", "svgwrite"], default="stream")
+        self._parser.add_argument("--per-sheet", action="store_true",
+                                  help="write one SVG per sheet plus index.json and index.html "
+                                       "into the output, which is a directory then")
+        self._parser.add_argument("--tiles", type=int, default=0, metavar="LEVELS",
+                                  help="write every sheet as tiles at this many zoom levels, plus defs.svg "
+                                       "and tiles.json, into the output, which is a directory then")
+        self._parser.add_argument("--merge-wires", action="store_true",
+                                  help="draw net wires joined end to end as one path each")
+        self._parser.add_argument("--infer-junctions", action="store_true",
+                                  help="draw junctions where three or more wires of a net meet but the file has none")
+        self._parser.add_argument("--flatten", action="store_true",
+                                  help="write absolute coordinates without <use> or nested transforms")
+        self._parser.add_argument("--css", action="store_true",
+                                  help="write each distinct style once as a CSS class instead of on every element")
+        self._parser.add_argument("--search-index", action="store_true",
+                                  help="also write part names and values, nets and texts with their sheet and box "
+                                       "to a.search.json next to a.svg, or search.json in the output directory")
+        self._parser.add_argument("--fit-viewbox", action="store_true",
+                                  help="fit the viewBox of output to stdout or to .svgz to the drawing, "
+                                       "which writes it to a temporary file first; it is a default one otherwise")
+        self._parser.add_argument("--svgz", action="store_true",
+                                  help="gzip compress the files of --per-sheet, --tiles and batch conversion")
+        self._parser.add_argument("--watch", action="store_true",
+                                  help="keep running and convert again whenever the input is saved, "
+                                       "redrawing only the sheets that changed")
+        self._parser.add_argument("--interval", type=float, default=0.5, metavar="SECONDS",
+                                  help="how often --watch checks the input for changes")
+        self._parser.add_argument("--extract", action="store_true",
+                                  help="write parts, values and nets as JSON to the output instead of drawing")
+        self._parser.add_argument("--stats", help="write element counts and phase timings to this JSON file; "
+                                                  "with --watch, of all conversions once it is stopped",
+                                  default=None)
+        self._parser.add_argument("--batch", nargs="+", metavar="INPUT", default=None,
+                                  help="convert schematic files, directories or glob patterns in parallel")
+        self._parser.add_argument("--manifest", default=None,
+                                  help="batch conversion of inputs listed in this file, one per line")
+        self._parser.add_argument("--output-dir", default=".",
+                                  help="batch output directory")
+        self._parser.add_argument("--jobs", "-j", type=int, default=None,
+                                  help="number of worker processes for batch conversion; one per CPU by default")
+        self._parser.add_argument("--summary", default=None,
+                                  help="write per-file batch timings and errors to this JSON file")
+        self._parser.add_argument("--serve", default=None, metavar="ADDRESS",
+                                  help="run as a conversion service on HOST:PORT or a Unix socket path, "
+                                       "with --jobs worker processes; see daemon.py for requests")
+        self._parser.add_argument("--cache", default=None, metavar="DIR",
+                                  help="reuse converted SVGs of unchanged schematics from this directory")
+        self._parser.add_argument("--cache-size", type=int, default=1024, metavar="MB",
+                                  help="cache size limit; least recently used results are dropped beyond it")
+        self._parser.add_argument("--cache-link", action="store_true",
+                                  help="hard link cached results instead of copying them")
+        self._parser.add_argument("--library-cache", default=None, metavar="DIR",
+                                  help="keep compiled libraries in this directory and reuse them across schematics")
         self.args = self._parser.parse_args(namespace=self)
 
 
+def indexed(layout, output, search_index, directory=False):
+    """
+    layout, also writing the search index of output when search_index is set
+    """
+    filename = search.sidecar(output, directory) if search_index else None
+    return layout if filename is None else search.SearchIndex(layout, filename)
+
+
+def convert(filename, output, parser="stream", backend="stream", cache=None, library_cache=None,
+            per_sheet=False, tiles=0, merge_wires=False, flatten=False, css=False, svgz=False, infer_junctions=False,
+            search_index=False, fit_viewbox=False):
+    """
+    returns True when the result came from cache.
+    per_sheet: output is a directory for SheetDocuments; tiles: output is a directory for Tiles
+    with that many zoom levels. cache is not used for either, nor for output to stdout.
+    svgz: compress the files written into the directory; a single output is compressed by its name.
+    search_index: write a search index next to the output too, see search.py; none for stdout.
+    fit_viewbox: let the viewBox of stdout and .svgz output fit the drawing, see writer.open_sink()
+    """
+    title = os.path.splitext(os.path.basename(filename))[0]
+    suffix = ".svgz" if svgz else ".svg"
+    converter = Converter(parser, backend, library_cache, merge_wires, flatten, css, infer_junctions,
+                          release_sheets=True)
+    if tiles:
+        converter.run(filename, indexed(Tiles(output, backend, tiles, title, merge_wires, flatten, css, suffix),
+                                        output, search_index, directory=True))
+        return False
+    if per_sheet:
+        converter.run(filename, indexed(SheetDocuments(output, backend, title, merge_wires, flatten, css, suffix),
+                                        output, search_index, directory=True))
+        return False
+    if output == "-":
+        cache = None
+    sidecar = search.sidecar(output) if search_index else None
+
+    if cache is not None:
+        with open(filename, "rb") as f:
+            data = f.read()
+        options = {"backend": backend, "merge_wires": merge_wires, "flatten": flatten, "css": css,
+                   "svgz": output.endswith(".svgz"), "infer_junctions": infer_junctions,
+                   "fit_viewbox": fit_viewbox and output.endswith(".svgz")}
+        key = cache.key(data, code_version(), options)
+        # the search index is cached as a result of its own
+        sidecar_key = cache.key(data, code_version(), dict(options, search_index=True))
+        if cache.fetch(key, output) and (sidecar is None or cache.fetch(sidecar_key, sidecar)):
+            return True
+
+    with open_writer(output, backend, css=css, fit_viewbox=fit_viewbox) as writer:
+        converter.run(filename, indexed(Document(writer, merge_wires, flatten), output, search_index))
+
+    if cache is not None:
+        cache.store(key, output)
+        if sidecar is not None:
+            cache.store(sidecar_key, sidecar)
+    return False
+
+
+def watch(filename, output, interval=0.5, backend="stream", library_cache=None, per_sheet=False, tiles=0,
+          merge_wires=False, flatten=False, css=False, svgz=False, infer_junctions=False, search_index=False,
+          fit_viewbox=False, **options):
+    """
+    converts filename whenever it changes, until interrupted. with per_sheet or tiles only the sheets
+    which changed are written again; a single output is written again as a whole from the sheets in memory
+    """
+    title = os.path.splitext(os.path.basename(filename))[0]
+    suffix = ".svgz" if svgz else ".svg"
+    layout = None
+    if tiles:
+        layout = Tiles(output, backend, tiles, title, merge_wires, flatten, css, suffix)
+    elif per_sheet:
+        layout = SheetDocuments(output, backend, title, merge_wires, flatten, css, suffix)
+    if layout is not None:
+        layout = indexed(layout, output, search_index, directory=True)
+        layout.begin()
+
+    def render(schematic, sheets):
+        with instrument.phase("serialize"):
+            if layout is not None:
+                [layout(schematic, sheet) for sheet in sheets]
+                layout.end(schematic)
+                return
+            with open_writer(output, backend, css=css, fit_viewbox=fit_viewbox) as writer:
+                document = indexed(Document(writer, merge_wires, flatten), output, search_index)
+                document.begin()
+                [document(schematic, sheet) for sheet in schematic.sheets]
+                document.end(schematic)
+
+    try:
+        Watcher(filename, library_cache, infer_junctions).run(render, interval)
+    except KeyboardInterrupt:
+        pass
+
+
+def report(result):
+    if result["error"] is None:
+        print("{input} -> {output} ({seconds:.2f}s)".format(**result), file=sys.stderr)
+    else:
+        print("{input} failed:\n{error}".format(**result), file=sys.stderr)
+
+
 def main():
     parser = MyParser()
     filename = parser.input
     output = parser.output
 
-    with open(filename, "r") as f:
-        read = f.read()
-    sch = xmltodict.parse(read)
-    sch = attrdict.AttrDict(sch["eagle"]["drawing"]["schematic"])
-    # instances = list(sch.sheets.sheet.instances.instance)
-    # print([instance["@part"] for instance in instances])
-    sch = Schematic(sch)
-    dwg = svgwrite.Drawing(filename=output, debug=True)
-    dwg.viewbox(0, -1000, 1000, 1500)
-    [dwg.defs.add(symbol) for symbol in sch.symbols]
-
-    dwg.add(sch.schematic)
-    # print(schematic.tostring())
-
-    dwg.save(pretty=True)
+    failed = 0
+    cache = None
+    if parser.cache is not None:
+        cache = ResultCache(parser.cache, parser.cache_size * 1024 * 1024, parser.cache_link)
+    library_cache = None
+    if parser.library_cache is not None:
+        library_cache = LibraryCache(parser.library_cache, code_version())
+
+    options = {"parser": parser.parser, "backend": parser.backend, "cache": cache,
+               "library_cache": library_cache, "per_sheet": parser.per_sheet, "tiles": parser.tiles,
+               "merge_wires": parser.merge_wires, "flatten": parser.flatten, "css": parser.css,
+               "svgz": parser.svgz, "infer_junctions": parser.infer_junctions,
+               "search_index": parser.search_index, "fit_viewbox": parser.fit_viewbox}
+    if parser.stats is not None and (parser.serve is not None or parser.batch is not None
+                                     or parser.manifest is not None):
+        # conversions run in worker processes there, which the report can not see
+        parser._parser.error("--stats can not be used with --serve, --batch or --manifest")
+    stats = instrument.Instrumentation() if parser.stats is not None else None
+
+    if parser.serve is not None:
+        if library_cache is None:
+            # kept in memory by every worker across requests
+            options["library_cache"] = LibraryCache(None, code_version())
+        try:
+            daemon.serve(parser.serve, parser.jobs, options)
+        except ValueError as e:
+            parser._parser.error(str(e))
+    elif parser.batch is not None or parser.manifest is not None:
+        try:
+            jobs = batch.collect(parser.batch or [], parser.manifest)
+        except ValueError as e:
+            parser._parser.error(str(e))
+        summary = batch.run(jobs, parser.output_dir, parser.jobs, options, callback=report)
+        if parser.summary is not None:
+            batch.write_summary(summary, parser.summary)
+        print("{} converted, {} failed in {:.2f}s".format(summary["total"] - summary["failed"], summary["failed"],
+                                                         summary["seconds"]), file=sys.stderr)
+        failed = summary["failed"]
+    else:
+        with instrument.activate(stats):
+            if parser.watch:
+                watch(filename, output, parser.interval, **options)
+            elif parser.extract:
+                extract.write(extract.extract(filename), output)
+            else:
+                convert(filename, output, **options)
+
+    if stats is not None:
+        stats.dump(parser.stats)
+
+    if cache is not None:
+        cache.evict()
+    if failed:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
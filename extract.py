@@ -0,0 +1,152 @@
+"""
+metadata extraction: parts with their values and nets with their pins, without drawing anything
+
+    metadata = extract("a.sch")
+    write(metadata, "a.json")
+
+only <devicesets>, <parts> and the pinrefs and portrefs of <nets> become objects. symbols, packages,
+instances, wires and everything else are dropped as soon as their end tags are read, so no geometry
+is built. part values are those the drawing would show, see Part.generate_value()
+"""
+
+import json
+import sys
+from xml.etree import ElementTree
+
+import instrument
+from schematic import Deviceset, Part, Pinref, Portref
+from streamparser import element2dict
+
+
+class Extractor(object):
+    """
+    walks <schematic> with iterparse like StreamParser but keeps only what metadata() reports.
+    paths are relative to <schematic>
+    """
+
+    def __init__(self):
+        self.devicesets = {}  # (library, deviceset) -> Deviceset
+        self.parts = []
+        self.nets = {}  # net name -> {"pins": {(part, gate, pin): None}, "ports": {...}, "sheets": {number: None}}
+        self.library = None
+        self.net = None
+        self.sheet = 0
+        self.handlers = {
+            ("libraries", "library", "devicesets", "deviceset"): self.on_deviceset,
+            ("parts", "part"): self.on_part,
+            ("sheets", "sheet", "nets", "net", "segment", "pinref"): self.on_pinref,
+            ("sheets", "sheet", "nets", "net", "segment", "portref"): self.on_portref,
+        }
+
+    def parse(self, source):
+        """
+        source: filename or file object; returns metadata()
+        """
+        elements = []
+        path = None
+        # depth of the deviceset or part being read; its children are kept for its handler
+        kept = None
+        for event, elem in ElementTree.iterparse(source, events=("start", "end")):
+            if event == "start":
+                elements.append(elem)
+                if path is not None:
+                    path = path + (elem.tag,)
+                    if kept is None:
+                        self.on_start(path, elem)
+                        if path in self.handlers:
+                            kept = len(path)
+                elif elem.tag == "schematic":
+                    path = ()
+                continue
+
+            elements.pop()
+            if path is None or path == ():
+                path = None
+            else:
+                depth = len(path)
+                if kept is not None and depth > kept:
+                    path = path[:-1]
+                    continue
+                if depth == kept:
+                    kept = None
+                    self.handlers[path](elem)
+                path = path[:-1]
+            elem.clear()
+            parent = elements[-1] if elements else None
+            if parent is not None and len(parent) and parent[-1] is elem:
+                del parent[-1]
+
+        return self.metadata()
+
+    def on_start(self, path, elem):
+        if path == ("libraries", "library"):
+            self.library = elem.get("name")
+        elif path == ("sheets", "sheet"):
+            self.sheet += 1
+        elif path == ("sheets", "sheet", "nets", "net"):
+            self.net = self.nets.setdefault(elem.get("name"), {"pins": {}, "ports": {}, "sheets": {}})
+            self.net["sheets"][self.sheet] = None
+
+    def on_deviceset(self, elem):
+        deviceset = Deviceset(element2dict(elem))
+        self.devicesets[(self.library, deviceset.name)] = deviceset
+
+    def on_part(self, elem):
+        self.parts.append(Part(element2dict(elem)))
+
+    def on_pinref(self, elem):
+        pinref = Pinref(element2dict(elem))
+        self.net["pins"][(pinref.part, pinref.gate, pinref.pin)] = None
+
+    def on_portref(self, elem):
+        portref = Portref(element2dict(elem))
+        self.net["ports"][(portref.moduleinst, portref.port)] = None
+
+    def part(self, part):
+        deviceset = self.devicesets.get((part.library, part.deviceset))
+        # as Instance.pop_texts() does when the part is drawn
+        if deviceset is None or not deviceset.uservalue:
+            part.generate_value()
+        package = None
+        if deviceset is not None:
+            package = next((device.package for device in deviceset.devices if device.name == part.device), None)
+        return {
+            "name": part.name,
+            "library": part.library,
+            "deviceset": part.deviceset,
+            "device": part.device,
+            "technology": part.technology,
+            "value": part.value,
+            "package": package,
+            "prefix": deviceset.prefix if deviceset is not None else None,
+        }
+
+    def metadata(self):
+        """
+        parts and nets as JSON-ready dicts; nets of the same name on several sheets are one net
+        """
+        return {
+            "parts": [self.part(part) for part in self.parts],
+            "nets": {name: {"sheets": list(net["sheets"]), "pins": list(net["pins"]), "ports": list(net["ports"])}
+                     for name, net in self.nets.items()},
+        }
+
+
+def extract(source):
+    """
+    metadata of an Eagle schematic, see Extractor.metadata()
+    """
+    with instrument.phase("parse"):
+        return Extractor().parse(source)
+
+
+def write(metadata, output):
+    """
+    output: file name, - for stdout
+    """
+    if output == "-":
+        json.dump(metadata, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+        return
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=2)
@@ -0,0 +1,140 @@
+"""
+batched unit conversion and geometry
+
+coordinates of many primitives of one kind are converted together; a Batch collects those of a whole
+sheet, from every net and segment, so they are converted in one go. with NumPy installed, batches of
+THRESHOLD rows or more run as array operations; otherwise, and for shorter batches where setting up
+arrays costs more than it saves, the same arithmetic runs in plain Python. both give the same floats:
+values are scaled, then rounded to DIGITS decimals as round(value * SCALE) / SCALE, and sines come
+from the same table
+"""
+
+import math
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+MM = 10.0  # SVG units per Eagle mm
+DIGITS = 5
+SCALE = 10.0 ** DIGITS
+THRESHOLD = 32
+
+_half_sines = {}
+
+# exact (cos, sin) of quarter turns, so rotated coordinates do not pick up 6e-17 and such
+QUARTERS = {0: (1.0, 0.0), 90: (0.0, 1.0), 180: (-1.0, 0.0), 270: (0.0, -1.0)}
+
+
+def _rotations():
+    table = {}
+    for mirror in ("", "M"):
+        for spin in ("", "S"):
+            for angle in QUARTERS:
+                table["{}{}R{}".format(mirror, spin, angle)] = (bool(mirror), bool(spin), angle)
+    return table
+
+
+# Eagle rotation strings -> (mirror, spin, angle) for every combination schematics use
+ROTATIONS = _rotations()
+
+
+def cos_sin(angle):
+    """
+    (cos, sin) of angle in degrees
+    """
+    exact = QUARTERS.get(angle % 360)
+    if exact is not None:
+        return exact
+    rad = math.radians(angle)
+    return math.cos(rad), math.sin(rad)
+
+
+def half_sine(curve):
+    """
+    sin(curve / 2) of a curve given in degrees, from a table filled as curves are seen
+    """
+    sine = _half_sines.get(curve)
+    if sine is None:
+        sine = _half_sines[curve] = math.sin(math.radians(curve / 2))
+    return sine
+
+
+def vectorized(rows):
+    return numpy is not None and len(rows) >= THRESHOLD
+
+
+def convert(rows):
+    """
+    rows of Eagle values, all of the same length, scaled to SVG units and rounded; returns a list of tuples
+    """
+    if not rows:
+        return []
+    if vectorized(rows):
+        array = numpy.array(rows, dtype=numpy.float64)
+        return [tuple(row) for row in (numpy.rint(array * MM * SCALE) / SCALE).tolist()]
+    return [tuple(round(value * MM * SCALE) / SCALE for value in row) for row in rows]
+
+
+def arc_radii(chords, curves):
+    """
+    radius of each arc over a chord (dx, dy) turning curve degrees; 0.0 where curve is 0
+    """
+    if not chords:
+        return []
+    sines = [half_sine(curve) for curve in curves]
+    if vectorized(chords):
+        chords = numpy.array(chords, dtype=numpy.float64)
+        sines = numpy.array(sines)
+        lengths = numpy.sqrt(chords[:, 0] * chords[:, 0] + chords[:, 1] * chords[:, 1])
+        radii = numpy.abs(lengths / 2 / numpy.where(sines == 0, 1.0, sines))
+        radii[sines == 0] = 0.0
+        return radii.tolist()
+    return [abs(math.sqrt(dx * dx + dy * dy) / 2 / sine) if sine else 0.0 for (dx, dy), sine in zip(chords, sines)]
+
+
+class Batch(object):
+    """
+    primitives of several kinds collected from many containers. add() hands out the objects at once
+    and run() initialises them, every kind with the values of one cls.batch(objs) call
+    """
+
+    def __init__(self):
+        self.pending = {}  # class -> (raw objects, objects handed out)
+
+    def add(self, cls, objs):
+        instances = [cls.__new__(cls) for obj in objs]
+        pending = self.pending.setdefault(cls, ([], []))
+        pending[0].extend(objs)
+        pending[1].extend(instances)
+        return instances
+
+    def run(self):
+        for cls, (objs, instances) in self.pending.items():
+            for obj, instance, values in zip(objs, instances, cls.batch(objs)):
+                instance.__init__(obj, values)
+        self.pending = {}
+
+
+def transform_boxes(boxes, matrices):
+    """
+    boxes (xmin, ymin, xmax, ymax), each through its own SVG matrix (a, b, c, d, e, f),
+    as boxes again around the transformed corners
+    """
+    if not boxes:
+        return []
+    if vectorized(boxes):
+        boxes = numpy.array(boxes, dtype=numpy.float64)
+        a, b, c, d, e, f = numpy.array(matrices, dtype=numpy.float64).T[:, :, None]
+        xs = boxes[:, [0, 2, 0, 2]]
+        ys = boxes[:, [1, 1, 3, 3]]
+        tx = a * xs + c * ys + e
+        ty = b * xs + d * ys + f
+        return [tuple(box) for box in numpy.stack([tx.min(1), ty.min(1), tx.max(1), ty.max(1)], 1).tolist()]
+    result = []
+    for (xmin, ymin, xmax, ymax), (a, b, c, d, e, f) in zip(boxes, matrices):
+        tx = [a * x + c * y + e for x, y in ((xmin, ymin), (xmax, ymin), (xmin, ymax), (xmax, ymax))]
+        ty = [b * x + d * y + f for x, y in ((xmin, ymin), (xmax, ymin), (xmin, ymax), (xmax, ymax))]
+        result.append((min(tx), min(ty), max(tx), max(ty)))
+    return result
@@ -0,0 +1,137 @@
+"""
+opt-in instrumentation for the converter
+
+nothing is collected unless an Instrumentation is activated:
+
+    stats = Instrumentation(callback=print)
+    with activate(stats):
+        ...
+    stats.report()
+
+callback is called as callback(kind, name, elapsed) where kind is "element" for every object
+constructed and "phase" for every phase left
+"""
+
+import contextlib
+import json
+import threading
+import time
+
+
+class _State(threading.local):
+    """
+    the active Instrumentation, per thread, so concurrent conversions are measured separately
+    """
+    current = None
+
+
+_state = _State()
+
+
+class Instrumentation(object):
+    """
+    per element type counts and construction times, and per phase times.
+    element "time" includes nested elements, "self_time" does not;
+    phase times are exclusive so they add up to the total
+    """
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.counts = {}
+        self.times = {}
+        self.self_times = {}
+        self.phases = {}
+        self._elements = []
+        self._phases = []
+
+    def construct(self, name, init, obj, *args, **kwargs):
+        self._elements.append(0.0)
+        start = time.perf_counter()
+        try:
+            init(obj, *args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = self._elements.pop()
+            if self._elements:
+                self._elements[-1] += elapsed
+            self.counts[name] = self.counts.get(name, 0) + 1
+            self.times[name] = self.times.get(name, 0.0) + elapsed
+            self.self_times[name] = self.self_times.get(name, 0.0) + elapsed - nested
+            if self.callback is not None:
+                self.callback("element", name, elapsed)
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        self._phases.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = self._phases.pop()
+            if self._phases:
+                self._phases[-1] += elapsed
+            self.phases[name] = self.phases.get(name, 0.0) + elapsed - nested
+            if self.callback is not None:
+                self.callback("phase", name, elapsed)
+
+    def report(self):
+        return {
+            "phases": dict(self.phases),
+            "elements": {name: {"count": self.counts[name],
+                                "time": self.times[name],
+                                "self_time": self.self_times[name]}
+                         for name in sorted(self.counts)},
+        }
+
+    def dump(self, filename):
+        with open(filename, "w") as f:
+            json.dump(self.report(), f, indent=2, sort_keys=True)
+
+
+def current():
+    return _state.current
+
+
+@contextlib.contextmanager
+def activate(instrumentation):
+    """
+    instrumentation is active in the calling thread only; None measures nothing
+    """
+    previous = _state.current
+    _state.current = instrumentation
+    try:
+        yield instrumentation
+    finally:
+        _state.current = previous
+
+
+@contextlib.contextmanager
+def phase(name):
+    current = _state.current
+    if current is None:
+        yield
+    else:
+        with current.phase(name):
+            yield
+
+
+def instrumented(cls, init):
+    """
+    wraps __init__ of cls so constructions are recorded while instrumentation is active.
+    super().__init__() calls from subclasses are not counted twice
+    """
+
+    def __init__(self, *args, **kwargs):
+        current = _state.current
+        if current is None or type(self) is not cls:
+            init(self, *args, **kwargs)
+        elif cls.phase is None:
+            current.construct(cls.__name__, init, self, *args, **kwargs)
+        else:
+            with current.phase(cls.phase):
+                current.construct(cls.__name__, init, self, *args, **kwargs)
+
+    __init__.__doc__ = init.__doc__
+    __init__.__wrapped__ = init
+    return __init__
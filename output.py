@@ -0,0 +1,265 @@
+"""
+output layouts
+
+a layout is handed to the parser as on_sheet, so it draws every sheet as soon as it has been parsed:
+
+    layout.begin()
+    schematic = streamparser.parse(filename, layout)
+    layout.end(schematic)
+
+with flatten, sheets are drawn through a FlatteningWriter: absolute coordinates, no <use> and no <defs>.
+the parser has indexed the nets of every sheet before the first is drawn, so xref labels are drawn
+with their final text; a sheet is released by schematic.drawn() as soon as it has been drawn
+"""
+
+import html
+import json
+import math
+import os
+import shutil
+
+import spatial
+from writer import FlatteningWriter, open_writer
+
+VIEWBOX = (0, -1000, 1000, 1500)  # used when a sheet has nothing drawn on it
+
+INDEX_HTML = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+body {{ margin: 0; display: flex; height: 100vh; font-family: sans-serif; }}
+nav {{ width: 12em; overflow-y: auto; border-right: 1px solid #ccc; }}
+nav a {{ display: block; padding: 0.3em 0.6em; color: inherit; text-decoration: none; }}
+nav a.current {{ background: #ddd; }}
+main {{ flex: 1; overflow: auto; }}
+main img {{ width: 100%; }}
+</style>
+</head>
+<body>
+<nav id="sheets"></nav>
+<main><img id="sheet" alt=""></main>
+<script>
+var index = {index};
+var nav = document.getElementById("sheets");
+var img = document.getElementById("sheet");
+function show(sheet, link) {{
+    img.src = sheet.file;
+    img.alt = sheet.id;
+    Array.prototype.forEach.call(nav.children, function (a) {{ a.className = ""; }});
+    link.className = "current";
+    location.hash = sheet.id;
+}}
+index.sheets.forEach(function (sheet, number) {{
+    var link = document.createElement("a");
+    link.href = "#" + sheet.id;
+    link.textContent = (number + 1) + " " + (sheet.description || sheet.id);
+    link.onclick = function (event) {{ event.preventDefault(); show(sheet, link); }};
+    nav.appendChild(link);
+}});
+var first = index.sheets.findIndex(function (sheet) {{ return "#" + sheet.id === location.hash; }});
+if (index.sheets.length) {{
+    first = first < 0 ? 0 : first;
+    show(index.sheets[first], nav.children[first]);
+}}
+</script>
+</body>
+</html>
+"""
+
+
+def sheet_description(sheet):
+    description = sheet.description
+    if isinstance(description, dict):
+        description = description.get("#text", "")
+    return description or ""
+
+
+def listed(entries, schematic):
+    """
+    entries keyed by sheet id, in sheet order; sheets drawn earlier but no longer in the schematic are left out
+    """
+    return [entries[sheet.id] for sheet in schematic.sheets if sheet.id in entries]
+
+
+class Document(object):
+    """
+    every sheet in one SVG, symbol definitions at the end
+    """
+
+    def __init__(self, writer, merge_wires=False, flatten=False):
+        self.writer = writer
+        self.merge_wires = merge_wires
+        self.flatten = flatten
+        self.bounds = None
+
+    def begin(self):
+        self.writer.begin(VIEWBOX)
+        self.writer.begin_group()
+
+    def __call__(self, schematic, sheet):
+        writer = FlatteningWriter(self.writer, schematic.symbols) if self.flatten else self.writer
+        sheet.render(writer, merge_wires=self.merge_wires, xref=schematic.xref(sheet))
+        # the sheet is complete, hand it on while later ones are still being read
+        self.writer.flush()
+        self.bounds = spatial.union([self.bounds, sheet.index.bounds])
+        schematic.drawn(sheet)
+
+    def end(self, schematic):
+        self.writer.end_group()
+        if not self.flatten:
+            self.writer.begin_defs()
+            schematic.symbols.render(self.writer)
+            self.writer.end_defs()
+        # sheets are drawn over each other, so the viewBox fits all of them; output which can not be
+        # rewritten, e.g. a pipe, keeps the one given to begin()
+        self.writer.set_viewbox(spatial.viewbox(self.bounds, default=VIEWBOX))
+        self.writer.end()
+
+
+class SheetDocuments(object):
+    """
+    one SVG per sheet in a directory, each with only the symbol definitions that sheet uses,
+    plus index.json and an index.html shell which loads a sheet only when it is opened
+    """
+
+    def __init__(self, directory, backend="stream", title="", merge_wires=False, flatten=False, css=False,
+                 suffix=".svg"):
+        """
+        suffix: ".svgz" writes compressed sheets
+        """
+        self.directory = directory
+        self.backend = backend
+        self.title = title
+        self.merge_wires = merge_wires
+        self.flatten = flatten
+        self.css = css
+        self.suffix = suffix
+        self.sheets = {}
+
+    def begin(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self.sheets = {}
+
+    def __call__(self, schematic, sheet):
+        filename = sheet.id + self.suffix
+        path = os.path.join(self.directory, filename)
+        xref = schematic.xref(sheet)
+        with open_writer(path, self.backend, css=self.css) as writer:
+            writer.begin(sheet.viewbox(VIEWBOX))
+            if self.flatten:
+                sheet.render(FlatteningWriter(writer, schematic.symbols), merge_wires=self.merge_wires, xref=xref)
+            else:
+                sheet.render(writer, merge_wires=self.merge_wires, xref=xref)
+                writer.begin_defs()
+                schematic.symbols.render(writer, sheet.symbols)
+                writer.end_defs()
+            writer.end()
+
+        self.sheets[sheet.id] = {
+            "id": sheet.id,
+            "file": filename,
+            "description": sheet_description(sheet),
+            "instances": len(sheet.instances),
+            "nets": len(sheet.nets),
+            "symbols": len(sheet.symbols),
+            "viewbox": sheet.viewbox(VIEWBOX),
+        }
+        schematic.drawn(sheet)
+
+    def end(self, schematic):
+        index = {"title": self.title, "sheets": listed(self.sheets, schematic)}
+        with open(os.path.join(self.directory, "index.json"), "w") as f:
+            json.dump(index, f, indent=2)
+        with open(os.path.join(self.directory, "index.html"), "w", encoding="utf-8") as f:
+            f.write(INDEX_HTML.format(title=html.escape(self.title), index=json.dumps(index).replace("</", "<\\/")))
+
+
+class Tiles(object):
+    """
+    every sheet cut into square tiles at several zoom levels, so a viewer only loads the tiles in view.
+    level 0 is a single tile over the sheet and each level halves the tile size. a tile holds only the
+    objects whose box intersects it and empty tiles are left out. symbol definitions go to defs.svg once
+    and all tiles refer to it, unless flattened; tiles.json lists everything written:
+
+        directory/defs.svg
+        directory/tiles.json
+        directory/sheet0/2/3_1.svg    level 2, column 3, row 1
+    """
+
+    def __init__(self, directory, backend="stream", levels=3, title="", merge_wires=False, flatten=False,
+                 css=False, suffix=".svg"):
+        """
+        suffix: ".svgz" writes compressed tiles and definitions
+        """
+        self.directory = directory
+        self.backend = backend
+        self.levels = levels
+        self.title = title
+        self.merge_wires = merge_wires
+        self.flatten = flatten
+        self.css = css
+        self.suffix = suffix
+        self.sheets = {}
+
+    def begin(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self.sheets = {}
+
+    def __call__(self, schematic, sheet):
+        # tiles of an earlier drawing of this sheet may be left out now
+        shutil.rmtree(os.path.join(self.directory, sheet.id), ignore_errors=True)
+        x, y, width, height = sheet.viewbox(VIEWBOX)
+        side = max(width, height)
+        xref = schematic.xref(sheet)
+        levels = []
+        for level in range(self.levels):
+            size = side / 2 ** level
+            columns = int(math.ceil(round(width / size, 6)))
+            rows = int(math.ceil(round(height / size, 6)))
+            tiles = []
+            for column in range(columns):
+                for row in range(rows):
+                    box = (x + column * size, y + row * size, x + (column + 1) * size, y + (row + 1) * size)
+                    entries = sheet.index.within(box)
+                    if not entries:
+                        continue
+                    filename = "{}/{}/{}_{}{}".format(sheet.id, level, column, row, self.suffix)
+                    self.write_tile(schematic, sheet, filename, box, {id(obj) for box, kind, name, obj in entries},
+                                    xref)
+                    tiles.append({"column": column, "row": row, "file": filename, "objects": len(entries)})
+            levels.append({"level": level, "size": round(size, 3), "columns": columns, "rows": rows,
+                           "tiles": tiles})
+
+        self.sheets[sheet.id] = {
+            "id": sheet.id,
+            "description": sheet_description(sheet),
+            "viewbox": (x, y, width, height),
+            "levels": levels,
+        }
+        schematic.drawn(sheet)
+
+    def write_tile(self, schematic, sheet, filename, box, only, xref=None):
+        path = os.path.join(self.directory, *filename.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open_writer(path, self.backend, defs="../../defs" + self.suffix, css=self.css) as writer:
+            writer.begin(spatial.viewbox(box, margin=0))
+            if self.flatten:
+                writer = FlatteningWriter(writer, schematic.symbols)
+            sheet.render(writer, only, self.merge_wires, xref)
+            writer.end()
+
+    def end(self, schematic):
+        defs = None
+        if not self.flatten:
+            defs = "defs" + self.suffix
+            with open_writer(os.path.join(self.directory, defs), self.backend) as writer:
+                writer.begin(VIEWBOX)
+                writer.begin_defs()
+                schematic.symbols.render(writer)
+                writer.end_defs()
+                writer.end()
+        manifest = {"title": self.title, "defs": defs, "sheets": listed(self.sheets, schematic)}
+        with open(os.path.join(self.directory, "tiles.json"), "w") as f:
+            json.dump(manifest, f, indent=2)
@@ -3,16 +3,27 @@ based on Eagle 7.5.0 DTD
 """
 
 import attrdict
-import svgwrite
 
+import geometry
+import instrument
+import spatial
+from writer import arc2str
+
+import json
 import re
 import pprint
-import math
+
+
+def selected(objs, only):
+    """
+    objs whose id() is in only; all of them when only is None
+    """
+    return objs if only is None else [obj for obj in objs if id(obj) in only]
 
 
 class BaseObject(object):
     name = ""
-    MM = 10.0
+    MM = geometry.MM
     layer2color = {
         "91": "#4BA54B",  # Nets
         "93": "#9B4646",  # Pins
@@ -25,20 +36,59 @@ class BaseObject(object):
     angle = 0
     get_bool = {"no": False, "yes": True}
     attr = attrdict.AttrDict({})
-    dwg = svgwrite.drawing.Drawing()
+    phase = None  # instrumentation phase the construction is accounted to
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if "__init__" in cls.__dict__:
+            cls.__init__ = instrument.instrumented(cls, cls.__dict__["__init__"])
 
     def val2mm(self, value):
-        value = float(value)
-        ret = "{val:1.5f}".format(val=value * self.MM)
-        return float(ret)
+        # same rounding as geometry.convert()
+        return round(float(value) * self.MM * geometry.SCALE) / geometry.SCALE
 
     def coord2mm(self, position):
         x, y = position
         return (self.val2mm(x), self.val2mm(y))
 
     def rot(self, rotate="R0"):
-        mirror, spin, angle = re.findall(re.compile(r"([M]*)([S]*)R(\d+)"), rotate).pop()
-        return (bool(mirror), bool(spin), int(angle))
+        rotation = geometry.ROTATIONS.get(rotate)
+        if rotation is None:
+            # an angle other than a quarter turn
+            mirror, spin, angle = re.findall(re.compile(r"([M]*)([S]*)R(\d+)"), rotate).pop()
+            rotation = (bool(mirror), bool(spin), int(angle))
+        return rotation
+
+
+class LazyIndex(object):
+    """
+    name -> object mapping over raw xml objects;
+    an object is built by factory on first lookup and kept afterwards
+    """
+
+    def __init__(self, factory, objs):
+        self.factory = factory
+        self.raw = {obj["@name"]: obj for obj in objs}
+        self.built = {}
+
+    def __getitem__(self, name):
+        built = self.built.get(name)
+        if built is None:
+            # when two threads build the same object, both go on with the one stored first
+            built = self.built.setdefault(name, self.factory(self.raw[name]))
+        return built
+
+    def __contains__(self, name):
+        return name in self.raw
+
+    def __iter__(self):
+        return iter(self.raw)
+
+    def __len__(self):
+        return len(self.raw)
+
+    def keys(self):
+        return self.raw.keys()
 
 
 class Polygon(BaseObject):
@@ -62,8 +112,6 @@ class Polygon(BaseObject):
     """
 
     def __init__(self, obj):
-        print(self.__class__.__name__)
-        print(obj.keys())
         width = float(obj["@width"])
         layer = obj["@layer"]
         # "@spacing"
@@ -73,34 +121,39 @@ class Polygon(BaseObject):
         self.stroke_width = self.val2mm(width)
         if obj.get("vertex") is not None:
             vertexes = obj["vertex"]
-            self.vertexes = [Vertex(vertex) for vertex in vertexes]
+            self.vertexes = Vertex.many(vertexes)
             self.vertexes.append(self.vertexes[0])
 
-        for index, vertex in enumerate(self.vertexes[:-1]):
+        edges = list(zip(self.vertexes, self.vertexes[1:]))
+        radii = geometry.arc_radii([(x1 - x2, y1 - y2) for (x1, y1), (x2, y2) in
+                                    [(vertex.coord, next_vertex.coord) for vertex, next_vertex in edges]],
+                                   [vertex.curve for vertex, next_vertex in edges])
+        path = []
+        for index, (vertex, next_vertex) in enumerate(edges):
             x1, y1 = vertex.coord
-            next_vertex = self.vertexes[index + 1]
             x2, y2 = next_vertex.coord
             if index == 0:
-                self.polygon = self.dwg.path(d="M{} {}".format(x1, y1), fill="none", fill_opacity=0.5,
-                                             stroke_width=self.stroke_width, stroke=self.stroke_fill)
+                path.append("M{} {}".format(x1, y1))
             if vertex.curve == 0:
-                self.polygon.push("L{} {}".format(x2, y2))
+                path.append("L{} {}".format(x2, y2))
             else:
                 large_arc = True if abs(vertex.curve) >= 180 else False
                 angle_dir = "+" if vertex.curve > 0 else "-"
-                rad = math.radians(vertex.curve / 2)
-                dx, dy = (abs(x1 - x2), abs(y1 - y2))
-                # print(x1-x2, dx, y1-y2, dy)
-                d = math.sqrt(dx ** 2 + dy ** 2)
-                s = math.sin(rad)
-                r = abs((d / 2) / s)
-                # print(d, s, r)
+                path.append(arc2str(next_vertex.coord, radii[index], large_arc, angle_dir))
 
-                # r = float(self.val2mm(r))
-                self.polygon.push_arc(target=next_vertex.coord, rotation=0, r=r, large_arc=large_arc,
-                                      angle_dir=angle_dir, absolute=True)
+        path.append("Z")
+        self.d = " ".join(path)
 
-        self.polygon.push("Z")
+    def render(self, writer):
+        writer.path(self.d, {"fill": "none", "fill-opacity": 0.5, "stroke-width": self.stroke_width,
+                             "stroke": self.stroke_fill})
+
+    def bbox(self):
+        boxes = [spatial.points_box([vertex.coord for vertex in self.vertexes], self.stroke_width / 2)]
+        for vertex, next_vertex in zip(self.vertexes, self.vertexes[1:]):
+            if vertex.curve != 0:
+                boxes.append(spatial.arc_box(vertex.coord, next_vertex.coord, vertex.curve, self.stroke_width / 2))
+        return spatial.union(boxes)
 
 
 class Vertex(BaseObject):
@@ -114,16 +167,25 @@ class Vertex(BaseObject):
               <!-- curve: The curvature from this vertex to the next one -->
     """
 
-    def __init__(self, obj):
-        print(self.__class__.__name__)
-        print(obj.keys())
-        x = float(obj.get("@x"))
-        y = float(obj.get("@y"))
+    def __init__(self, obj, values=None):
+        """
+        values: the coordinates already converted by batch()
+        """
         curve = obj.get("@curve", "0")
 
-        self.coord = self.coord2mm((x, y))
+        if values is None:
+            values = self.batch([obj])[0]
+        self.coord = values
         self.curve = int(curve)
 
+    @staticmethod
+    def batch(objs):
+        return geometry.convert([[float(obj.get("@x")), float(obj.get("@y"))] for obj in objs])
+
+    @classmethod
+    def many(cls, objs):
+        return [cls(obj, values) for obj, values in zip(objs, cls.batch(objs))]
+
 
 class Wire(BaseObject):
     """
@@ -149,47 +211,74 @@ class Wire(BaseObject):
     }
     stroke_linecap = "round"
 
-    def __init__(self, obj):
-        print(self.__class__.__name__)
-        print(obj.keys())
-        x1 = float(obj.get("@x1"))
-        x2 = float(obj.get("@x2"))
-        y1 = float(obj.get("@y1"))
-        y2 = float(obj.get("@y2"))
-        width = float(obj["@width"])
+    def __init__(self, obj, values=None):
+        """
+        values: (x1, y1, x2, y2, width, r) already converted by batch()
+        """
         layer = obj["@layer"]
         style = obj.get("@style", "continuous")
         curve = obj.get("@curve", "0")
 
-        self.start = self.coord2mm((x1, y1))
-        self.end = self.coord2mm((x2, y2))
+        if values is None:
+            values = self.batch([obj])[0]
+        x1, y1, x2, y2, width, self.r = values
+        self.start = (x1, y1)
+        self.end = (x2, y2)
         self.stroke_fill = self.layer2color[layer]
-        self.stroke_width = self.val2mm(width)
+        self.stroke_width = width
         self.stroke_dasharray = self.style2dasharray[style]
         self.curve = int(curve)
-        if self.curve == 0:
-            self.wire = self.dwg.line(start=self.start, end=self.end, stroke=self.stroke_fill,
-                                      stroke_width=self.stroke_width, stroke_linecap=self.stroke_linecap)
-        #
-        else:
-            x, y = self.start
-            self.wire = self.dwg.path(d="M{} {}".format(x, y), fill="none",
-                                      stroke_width=self.stroke_width, stroke=self.stroke_fill)
+        if self.curve != 0:
             large_arc = True if abs(self.curve) >= 180 else False
             angle_dir = "+" if self.curve > 0 else "-"
-            # (3.7,1.0), (3.8,1.1), theta=100deg
-            # sqrt((3.7-3.8)^2 + (1.0-1.1)^2) /2 = r * sin(theta / 2)
-            # r = sqrt(...) / 2 / sin(theta/2)
-            rad = math.radians(self.curve / 2)
-            dx, dy = self.coord2mm((x1 - x2, y1 - y2))
-            r = abs(math.sqrt(dx ** 2 + dy ** 2) / 2 / math.sin(rad))
-            # r = float(self.val2mm(r))
-            # r = float("{r:1.8f}".format(r=self.val2mm(r)))
+            self.d = "M{} {} {}".format(x1, y1, arc2str(self.end, self.r, large_arc, angle_dir))
+
+    @staticmethod
+    def batch(objs):
+        """
+        (x1, y1, x2, y2, width, r) in SVG units for every wire of objs, converted together.
+        (3.7,1.0), (3.8,1.1), theta=100deg
+        sqrt((3.7-3.8)^2 + (1.0-1.1)^2) /2 = r * sin(theta / 2)
+        r = sqrt(...) / 2 / sin(theta/2)
+        """
+        rows = []
+        for obj in objs:
+            x1, y1, x2, y2 = (float(obj.get(key)) for key in ("@x1", "@y1", "@x2", "@y2"))
+            rows.append([x1, y1, x2, y2, float(obj["@width"]), x1 - x2, y1 - y2])
+        rows = geometry.convert(rows)
+        radii = geometry.arc_radii([row[5:] for row in rows], [int(obj.get("@curve", "0")) for obj in objs])
+        return [row[:5] + (r,) for row, r in zip(rows, radii)]
+
+    @classmethod
+    def many(cls, objs, batch=None):
+        """
+        batch: a geometry.Batch which converts objs together with those of other containers
+        """
+        if batch is not None:
+            return batch.add(cls, objs)
+        return [cls(obj, values) for obj, values in zip(objs, cls.batch(objs))]
+
+    def render(self, writer):
+        if self.curve == 0:
+            writer.line(self.start, self.end, {"stroke": self.stroke_fill, "stroke-width": self.stroke_width,
+                                               "stroke-linecap": self.stroke_linecap})
+        else:
+            writer.path(self.d, {"fill": "none", "stroke-width": self.stroke_width, "stroke": self.stroke_fill})
+
+    def step(self, reverse=False):
+        """
+        path command drawing this wire from the current point at its start, or at its end when reverse
+        """
+        x, y = self.start if reverse else self.end
+        if self.curve == 0:
+            return "L{} {}".format(x, y)
+        curve = -self.curve if reverse else self.curve
+        return arc2str((x, y), self.r, abs(curve) >= 180, "+" if curve > 0 else "-")
 
-            self.wire.push_arc(target=self.end, rotation=0, r=r, large_arc=large_arc,
-                               angle_dir=angle_dir, absolute=True)
-            # print(self.wire.tostring())
-        # return wire
+    def bbox(self):
+        if self.curve == 0:
+            return spatial.points_box([self.start, self.end], self.stroke_width / 2)
+        return spatial.arc_box(self.start, self.end, self.curve, self.stroke_width / 2)
 
 
 class Rect(BaseObject):
@@ -206,8 +295,6 @@ class Rect(BaseObject):
     """
 
     def __init__(self, obj):
-        print(self.__class__.__name__)
-        print(obj.keys())
         x1 = float(obj.get("@x1"))
         x2 = float(obj.get("@x2"))
         y1 = float(obj.get("@y1"))
@@ -219,9 +306,14 @@ class Rect(BaseObject):
         self.size = self.coord2mm((abs(x1 - x2), abs(y1 - y2)))
         self.stroke_fill = self.layer2color[layer]
         self.mirror, self.spin, self.angle = self.rot(rot)
-        self.rect = self.dwg.rect(insert=self.insert, size=self.size, stroke=self.stroke_fill, fill_opacity=0.95,
-                                  fill=self.stroke_fill, stroke_linecap="round")
-        # print(rect.tostring())
+
+    def render(self, writer):
+        writer.rect(self.insert, self.size, {"stroke": self.stroke_fill, "fill-opacity": 0.95,
+                                             "fill": self.stroke_fill, "stroke-linecap": "round"})
+
+    def bbox(self):
+        (x, y), (width, height) = self.insert, self.size
+        return (x, y, x + width, y + height)
 
 
 class Text(BaseObject):
@@ -255,8 +347,6 @@ class Text(BaseObject):
                 "fixed": "monospace"}
 
     def __init__(self, obj):
-        print(self.__class__.__name__)
-        print(obj.keys())
         x1 = float(obj.get("@x"))
         y1 = float(obj.get("@y"))
         size = float(obj.get("@size"))
@@ -266,15 +356,30 @@ class Text(BaseObject):
         align = obj.get("@align", "bottom-left")
         text = obj.get("#text", "")
 
-        fontfamily = self.get_font[font]
+        self.font_family = self.get_font[font]
         self.insert = self.coord2mm((x1, -y1))
         self.font_size = int(self.val2mm(size * 1.4))
         self.fill = self.layer2color[layer]
         self.mirror, self.spin, angle = self.rot(rot)
         self.dominant_baseline, self.text_anchor, self.angle = self.align(align, self.mirror, angle)
-        self.text = self.dwg.text(text=text, insert=self.insert, fill=self.fill, font_size=self.font_size,
-                                  font_family=fontfamily, text_anchor=self.text_anchor,
-                                  dominant_baseline=self.dominant_baseline)
+        self.text = text
+
+    def render(self, writer, text=None, insert=None, transform=None):
+        """
+        text, insert and transform override the ones read from the schematic
+        """
+        writer.text(self.text if text is None else text, self.insert if insert is None else insert,
+                    {"fill": self.fill, "font-size": self.font_size, "font-family": self.font_family,
+                     "text-anchor": self.text_anchor, "dominant-baseline": self.dominant_baseline},
+                    transform)
+
+    def bbox(self, text=None, insert=None, transform=None):
+        """
+        estimated extent of what render() draws with the same arguments
+        """
+        box = spatial.text_box(self.text if text is None else text, self.insert if insert is None else insert,
+                               self.font_size, self.text_anchor, self.dominant_baseline)
+        return spatial.transform_box(box, transform)
 
     def align(self, align, mirror, rotate):
         align = align.split("-")
@@ -303,8 +408,7 @@ class Text(BaseObject):
 
 class Dimension(BaseObject):
     def __init__(self, obj):
-        print(self.__class__.__name__)
-        print(obj.keys())
+        pass
 
 
 class Circle(BaseObject):
@@ -319,23 +423,39 @@ class Circle(BaseObject):
               >
     """
 
-    def __init__(self, obj):
-        print(self.__class__.__name__)
-        print(obj.keys())
-        x = float(obj["@x"])
-        y = float(obj["@y"])
-        radius = float(obj["@radius"])
-        width = obj["@width"]
+    def __init__(self, obj, values=None):
+        """
+        values: (x, y, radius, width) already converted by batch()
+        """
         layer = obj["@layer"]
 
-        self.center = self.coord2mm((x, y))
-        self.r = self.val2mm(radius)
+        if values is None:
+            values = self.batch([obj])[0]
+        x, y, self.r, self.stroke_width = values
+        self.center = (x, y)
         self.stroke_fill = self.layer2color[layer]
-        self.stroke_width = self.val2mm(width)
-        fill = self.stroke_fill if self.stroke_width == 0 else "none"
-        self.circle = self.dwg.circle(center=self.center, stroke=self.stroke_fill,
-                                      stroke_width=self.stroke_width, r=self.r, fill=fill)
-        # print(circle.tostring())
+        self.fill = self.stroke_fill if self.stroke_width == 0 else "none"
+
+    @staticmethod
+    def batch(objs):
+        return geometry.convert([[float(obj["@x"]), float(obj["@y"]), float(obj["@radius"]), float(obj["@width"])]
+                                 for obj in objs])
+
+    @classmethod
+    def many(cls, objs, batch=None):
+        """
+        batch: a geometry.Batch which converts objs together with those of other containers
+        """
+        if batch is not None:
+            return batch.add(cls, objs)
+        return [cls(obj, values) for obj, values in zip(objs, cls.batch(objs))]
+
+    def render(self, writer):
+        writer.circle(self.center, self.r, {"stroke": self.stroke_fill, "stroke-width": self.stroke_width,
+                                            "fill": self.fill})
+
+    def bbox(self):
+        return spatial.points_box([self.center], self.r + self.stroke_width / 2)
 
 
 class Pin(BaseObject):
@@ -359,9 +479,6 @@ class Pin(BaseObject):
     get_length = {"point": 0, "short": 2.54, "middle": 5.08, "long": 7.62}
 
     def __init__(self, obj):
-        print(self.__class__.__name__)
-        print(obj.keys())
-
         self.name = obj["@name"]
         x = float(obj["@x"])
         y = float(obj["@y"])
@@ -381,34 +498,52 @@ class Pin(BaseObject):
         self.stroke_width = self.val2mm(0.1524)
         self.mirror, self.spin, self.angle = self.rot(rot)
 
-        self.shape = self.dwg.g(id="{}-pin".format(self.name))
         self.dot, self.clk = self.get_func[func]
         self.get_pin(length)
 
-        self.pin = self.dwg.g(id=self.name)
-        self.pin.add(self.shape)
-        self.pin.rotate(self.angle, self.start)
-
     def get_pin(self, length):
+        """
+        computes the shapes a pin is drawn with; a list of ("circle"|"line", args...)
+        """
+        self.shapes = []
         offset = self.get_length[length]
         x, y = self.start
         if self.dot and offset > 0:
             offset = offset - (2.032)
-            self.shape.add(
-                self.dwg.circle(center=(x + self.val2mm(offset + 2.032 / 2.0), y), r=self.val2mm(1.0),
-                                stroke_width=self.stroke_width,
-                                stroke=self.stroke, fill="none"))
+            self.shapes.append(("circle", (x + self.val2mm(offset + 2.032 / 2.0), y), self.val2mm(1.0),
+                                {"stroke-width": self.stroke_width, "stroke": self.stroke, "fill": "none"}))
         if self.clk:
             ex, ey = self.end
             end = (ex + self.val2mm(2.032), ey)
-            self.shape.add(self.dwg.line(start=(ex, ey + self.val2mm(1.016)), end=end, stroke_width=self.stroke_width,
-                                         stroke=self.stroke))
-            self.shape.add(self.dwg.line(start=(ex, ey + self.val2mm(-1.016)), end=end, stroke_width=self.stroke_width,
-                                         stroke=self.stroke))
+            style = {"stroke-width": self.stroke_width, "stroke": self.stroke}
+            self.shapes.append(("line", (ex, ey + self.val2mm(1.016)), end, style))
+            self.shapes.append(("line", (ex, ey + self.val2mm(-1.016)), end, style))
 
         x += self.val2mm(offset)
-        self.shape.add(self.dwg.line(id=self.name, start=self.start, end=(x, y), stroke=self.stroke,
-                                     stroke_width=self.val2mm(0.1524), stroke_linecap="round"))
+        self.shapes.append(("line", self.start, (x, y),
+                            {"stroke": self.stroke, "stroke-width": self.val2mm(0.1524), "stroke-linecap": "round"},
+                            self.name))
+
+    def render(self, writer):
+        sx, sy = self.start
+        writer.begin_group(id=self.name, transform=[("rotate", self.angle, sx, sy)], **{"data-pin": self.name})
+        writer.begin_group(id="{}-pin".format(self.name))
+        for kind, *args in self.shapes:
+            getattr(writer, kind)(*args)
+        writer.end_group()
+        writer.end_group()
+
+    def bbox(self):
+        boxes = []
+        for kind, *args in self.shapes:
+            if kind == "circle":
+                center, r, style = args[:3]
+                boxes.append(spatial.points_box([center], r + style["stroke-width"] / 2))
+            else:
+                start, end, style = args[:3]
+                boxes.append(spatial.points_box([start, end], style["stroke-width"] / 2))
+        sx, sy = self.start
+        return spatial.transform_box(spatial.union(boxes), [("rotate", self.angle, sx, sy)])
 
 
 class Attribute(Text):
@@ -431,14 +566,12 @@ class Attribute(Text):
               <!-- constant:Only in <device> context -->
     """
     get_disp = {"off": "",
-                "value": "{}",
-                "name": "{}",
-                "both": "{} = {}"
+                "value": "{1}",
+                "name": "{0}",
+                "both": "{0} = {1}"
                 }
 
     def __init__(self, obj):
-        print(self.__class__.__name__)
-        print(obj.keys())
         self.name = obj["@name"]
         obj["#text"] = self.name
         self.value = obj.get("@value")
@@ -462,10 +595,9 @@ class Instance(BaseObject):
     symbol = None
     attributes = []
     texts = None
+    nets = None  # pin name -> net name, filled by Sheet.populate()
 
     def __init__(self, obj):
-        print(self.__class__.__name__)
-        print(obj.keys())
         x = float(obj["@x"])
         y = float(obj["@y"])
         rot = obj.get("@rot", "R0")
@@ -473,7 +605,7 @@ class Instance(BaseObject):
 
         self.gate = obj["@gate"]
         self.part = obj["@part"]
-        self.name = self.dwg.text(self.part, insert=self.coord2mm((x, -y)))
+        self.name = self.part
         self.center = self.coord2mm((x, y))
         self.smashed = self.get_bool[smashed]
         self.mirror, self.spin, self.angle = self.rot(rot)
@@ -485,62 +617,98 @@ class Instance(BaseObject):
             else:
                 self.attributes = [Attribute(attributes)]
 
-    def populate(self, libraries, parts):
+    def populate(self, libraries, parts, registry):
         self.part = parts[self.part]
         library = libraries[self.part.library]
         self.deviceset = library.devicesets[self.part.deviceset]
         self.gate = self.deviceset.gates[self.gate]
 
-        symbol = library.symbols[self.gate.symbol]
-        self.pop_texts(symbol)
-
-        self.symbol = symbol.symbol.copy()
-        self.symbol["id"] = symbol.symbol.get_id()
-        self.instance = self.dwg.use("#{}".format(symbol.name), insert=self.center, id=self.part.name)
-        self.shape = symbol.shape
+        self.symbol = library.symbols[self.gate.symbol]
+        self.pop_texts(self.symbol)
 
-        rot = -1 if self.mirror else 1
-        if self.mirror:
-            mirrored_id = "{}F".format(self.symbol.get_id())
-            self.symbol["id"] = mirrored_id
-            self.symbol.scale(-1, 1)
-            self.instance.href = "#{}".format(mirrored_id)
-        if self.angle:
-            self.instance.rotate(rot * self.angle, self.center)
+        self.href = registry.get(library, self.symbol, self.mirror)
 
     def pop_texts(self, symbol):
-        self.texts = self.dwg.g(id="{}-text".format(self.name.text))
+        """
+        collects texts drawn for this instance as (Text, text, insert, transform)
+        """
+        self.texts = []
         if not self.deviceset.uservalue:
             self.part.generate_value()
         for attr in self.attributes:
-            attr.text.rotate(attr.angle, attr.insert)
             if self.smashed:
+                text = attr.text
                 if attr.name == "NAME":
-                    attr.text.text = self.part.name
+                    text = self.part.name
                 elif attr.name == "VALUE":
-                    attr.text.text = self.part.value
+                    text = self.part.value
                 else:
-                    attr.get_disp[attr.display].format(attr.name, attr.value)
-                self.texts.add(attr.text)
+                    text = attr.get_disp[attr.display].format(attr.name, self.attribute_value(attr))
+                    if not text:
+                        # display="off"
+                        continue
+                ax, ay = attr.insert
+                self.texts.append((attr, text, attr.insert, [("rotate", attr.angle, ax, ay)]))
         if not self.smashed:
             for text in symbol.texts:
                 tx, ty = text.insert
                 cx, cy = self.center
                 newx = tx + cx
                 newy = -cy + ty
-                _text = text.text.copy()
-                _text["x"] = newx
-                _text["y"] = newy
-                if _text.text == ">NAME":
-                    _text.text = self.part.name
-                elif _text.text == ">VALUE":
-                    _text.text = self.part.value
+                _text = text.text
+                if _text == ">NAME":
+                    _text = self.part.name
+                elif _text == ">VALUE":
+                    _text = self.part.value
                 rot = 1 if self.mirror else -1
-                _text.rotate(rot * self.angle, (cx, -cy))
+                transform = [("rotate", rot * self.angle, cx, -cy)]
                 rot = -1 if text.mirror else 1
-                _text.rotate(rot * text.angle, (newx, newy))
+                transform.append(("rotate", rot * text.angle, newx, newy))
 
-                self.texts.add(_text)
+                self.texts.append((text, _text, (newx, newy), transform))
+
+    def attribute_value(self, attr):
+        """
+        value of an attribute of this instance; a smashed attribute usually leaves it to the part
+        """
+        if attr.value is not None:
+            return attr.value
+        return self.part.attributes.get(attr.name, "")
+
+    def render(self, writer):
+        rot = -1 if self.mirror else 1
+        cx, cy = self.center
+        transform = [("rotate", rot * self.angle, cx, cy)] if self.angle else None
+        attrs = {"data-part": self.part.name, "data-gate": self.gate.name}
+        if self.nets:
+            attrs["data-nets"] = json.dumps(self.nets, separators=(",", ":"))
+        writer.use(self.href, insert=self.center, id=self.part.name, transform=transform, **attrs)
+
+    def render_texts(self, writer, only=None):
+        texts = selected(self.texts, only)
+        if not texts and only is not None:
+            return
+        writer.begin_group(id="{}-text".format(self.name))
+        for text, _text, insert, transform in texts:
+            text.render(writer, _text, insert, transform)
+        writer.end_group()
+
+    def placement(self):
+        """
+        transform from symbol to sheet coordinates, the sheet's scale(1, -1) group not included
+        """
+        rot = -1 if self.mirror else 1
+        cx, cy = self.center
+        transform = [("rotate", rot * self.angle, cx, cy), ("translate", cx, cy)]
+        if self.mirror:
+            transform.append(("scale", -1, 1))
+        return transform
+
+    def bbox(self):
+        """
+        extent of the symbol as placed on the sheet, in the coordinates of the sheet's scale(1, -1) group
+        """
+        return spatial.transform_box(self.symbol.bbox(), self.placement())
 
 
 class Part(BaseObject):
@@ -555,13 +723,11 @@ class Part(BaseObject):
               value         %String;       #IMPLIED
               >
     """
-    attributes = []
+    attributes = {}
     variants = []
     deviceset = None
 
     def __init__(self, obj):
-        print(self.__class__.__name__)
-        print(obj.keys())
         self.name = obj["@name"]
         self.library = obj["@library"]
         self.deviceset = obj["@deviceset"]
@@ -570,12 +736,13 @@ class Part(BaseObject):
         # self.attribute = obj.get("@attribute", "")
         self.value = obj.get("@value", "")
 
-        if obj.get("@attribute") is not None:
-            attributes = obj["@attribute"]
+        # name -> value; a part's attributes are not drawn themselves, so they have no position
+        if obj.get("attribute") is not None:
+            attributes = obj["attribute"]
             if isinstance(attributes, list):
-                self.attributes = [Attribute(attr) for attr in attributes]
+                self.attributes = {attr["@name"]: attr.get("@value", "") for attr in attributes}
             else:
-                self.attributes = [Attribute(attributes)]
+                self.attributes = {attributes["@name"]: attributes.get("@value", "")}
 
     def generate_value(self):
         if self.deviceset.count("*") > 0:
@@ -600,33 +767,37 @@ class Library(BaseObject):
               >
               <!-- name: Only in libraries used inside boards or schematics -->
     """
+    phase = "library"
     description = ""
     packages = None  # this matters with brd/lbr files but not with sch
     symbols = []
     devicesets = []
 
     def __init__(self, obj):
-        print(self.__class__.__name__)
-        print(obj.keys())
         # libraries = list(obj.libraries.library) if obj["libraries"] is not None else []
         self.name = obj["@name"]
         self.description = obj.get("description", "")
 
-        if obj["symbols"] is not None:
+        # symbols and devicesets are built only when an instance asks for them
+        if obj.get("symbols") is not None:
             symbols = obj["symbols"]["symbol"]
             if isinstance(symbols, list):
-                self.symbols = [Symbol(symbol) for symbol in symbols]
+                self.symbols = LazyIndex(Symbol, symbols)
             else:
-                self.symbols = [Symbol(symbols)]
-            self.symbols = {symbol.name: symbol for symbol in self.symbols}
+                self.symbols = LazyIndex(Symbol, [symbols])
 
-        if obj["devicesets"] is not None:
+        if obj.get("devicesets") is not None:
             devicesets = obj["devicesets"]["deviceset"]
             if isinstance(devicesets, list):
-                devicesets = [Deviceset(deviceset) for deviceset in devicesets]
+                self.devicesets = LazyIndex(Deviceset, devicesets)
             else:
-                devicesets = [Deviceset(devicesets)]
-            self.devicesets = {deviceset.name: deviceset for deviceset in devicesets}
+                self.devicesets = LazyIndex(Deviceset, [devicesets])
+
+    def built(self):
+        """
+        number of symbols and devicesets built so far
+        """
+        return sum(len(index.built) for index in (self.symbols, self.devicesets) if isinstance(index, LazyIndex))
 
 
 class Deviceset(BaseObject):
@@ -638,13 +809,12 @@ class Deviceset(BaseObject):
               uservalue     %Bool;         "no"
               >
     """
+    phase = "library"
     description = None
     gates = []
     devices = []
 
     def __init__(self, obj):
-        print(self.__class__.__name__)
-        print(obj.keys())
         # libraries = list(obj.libraries.library) if obj["libraries"] is not None else []
         self.name = obj["@name"]
         self.description = obj.get("description", "")
@@ -684,8 +854,6 @@ class Connect(BaseObject):
     """
 
     def __init__(self, obj):
-        print(self.__class__.__name__)
-        print(obj.keys())
         self.gate = obj["@gate"]
         self.pin = obj["@pin"]
         self.pad = obj["@pad"]
@@ -705,8 +873,6 @@ class Device(BaseObject):
     technologies = None
 
     def __init__(self, obj):
-        print(self.__class__.__name__)
-        print(obj.keys())
         self.name = obj.get("@name", "")
         self.package = obj.get("@package")
         self.connects = obj.get("connects")
@@ -730,8 +896,6 @@ class Technology(BaseObject):
     attributes = []
 
     def __init__(self, obj):
-        print(self.__class__.__name__)
-        print(obj.keys())
         self.name = obj["@name"]
         attributes = obj.get("attribute")
         self.attributes = [Attribute(attribute) for attribute in attributes]
@@ -751,8 +915,6 @@ class Gate(BaseObject):
     """
 
     def __init__(self, obj):
-        print(self.__class__.__name__)
-        print(obj.keys())
         self.name = obj["@name"]
         self.symbol = obj["@symbol"]
         x = float(obj["@x"])
@@ -779,11 +941,9 @@ class Frame(BaseObject):
               >
     """
 
-    border = attrdict.AttrDict({})
+    border = None
 
     def __init__(self, obj):
-        print(self.__class__.__name__)
-        print(obj.keys())
         x1 = float(obj.get("@x1"))
         x2 = float(obj.get("@x2"))
         y1 = float(obj.get("@y1"))
@@ -798,12 +958,29 @@ class Frame(BaseObject):
 
         self.insert = self.coord2mm((x1, y1))
         self.size = self.coord2mm((x1 - x2, y1 - y2))
+        self.box = spatial.points_box([self.coord2mm((x1, y1)), self.coord2mm((x2, y2))])
+        self.columns = int(columns)
+        self.rows = int(raws)
         self.stroke_fill = self.layer2color[layer]
+        self.border = attrdict.AttrDict({})
         self.border.left = self.get_bool[border_left]
         self.border.top = self.get_bool[border_top]
         self.border.right = self.get_bool[border_right]
         self.border.bottom = self.get_bool[border_bottom]
 
+    def cell(self, point):
+        """
+        (column, row) of the frame grid at point, as Eagle labels them: columns are numbered from
+        the left starting at 1, rows are lettered from the top starting at A; None outside the frame
+        """
+        x, y = point
+        xmin, ymin, xmax, ymax = self.box
+        if not spatial.contains(self.box, x, y) or xmax == xmin or ymax == ymin:
+            return None
+        column = min(int((x - xmin) / (xmax - xmin) * self.columns), self.columns - 1)
+        row = min(int((ymax - y) / (ymax - ymin) * self.rows), self.rows - 1)
+        return str(column + 1), chr(ord("A") + row)
+
 
 class Net(BaseObject):
     """
@@ -815,55 +992,128 @@ class Net(BaseObject):
     """
     segments = []
 
-    def __init__(self, obj):
-        print(self.__class__.__name__)
-        print(obj.keys())
+    def __init__(self, obj, batch=None):
+        """
+        batch: see Wire.many()
+        """
         self.name = obj["@name"]
-        self.net = self.dwg.g(id=self.name)
 
         if obj.get("segment") is not None:
             segments = obj["segment"]
             if isinstance(segments, list):
-                self.segments = [Segment(segment) for segment in segments]
+                self.segments = [Segment(segment, batch) for segment in segments]
             else:
-                self.segments = [Segment(segments)]
-            [self.net.add(segment.segment) for segment in self.segments]
+                self.segments = [Segment(segments, batch)]
             for segment in self.segments:
                 for label in segment.labels:
-                    label.label.text.text = self.name
-                    angle = label.label.angle
-                    insert = label.label.insert
-                    label.label.text.rotate(angle, insert)
+                    label.label.text = self.name
+
+    def pins(self):
+        """
+        (part, gate, pin) of every pin on this net, in order of appearance
+        """
+        return list(dict.fromkeys((pinref.part, pinref.gate, pinref.pin)
+                                  for segment in self.segments for pinref in segment.pinrefs))
+
+    def ports(self):
+        """
+        (moduleinst, port) of every module port on this net
+        """
+        return list(dict.fromkeys((portref.moduleinst, portref.port)
+                                  for segment in self.segments for portref in segment.portrefs))
+
+    def render(self, writer, only=None, merge_wires=False):
+        """
+        the group is tagged with data-net and the pins on the net as a JSON list in data-pins
+        """
+        segments = [segment for segment in self.segments if segment.drawn(only)]
+        if not segments:
+            return
+        attrs = {"data-net": self.name}
+        pins = self.pins()
+        if pins:
+            attrs["data-pins"] = json.dumps(pins, separators=(",", ":"))
+        writer.begin_group(id=self.name, **attrs)
+        [segment.render(writer, only, merge_wires) for segment in segments]
+        writer.end_group()
+
+    def render_labels(self, writer, only=None, xref=None):
+        """
+        xref(net name): text of this net's xref labels, None for the plain net name
+        """
+        text = xref(self.name) if xref is not None and self.has_xrefs() else None
+        for segment in self.segments:
+            for label in selected(segment.labels, only):
+                label.render(writer, text if label.xref else None)
+
+    def has_xrefs(self):
+        return any(label.xref for segment in self.segments for label in segment.labels)
+
+    def anchor(self):
+        """
+        where a cross-reference to this net points: its first xref label, else its first label or wire
+        """
+        labels = [label for segment in self.segments for label in segment.labels]
+        for label in sorted(labels, key=lambda label: not label.xref):
+            return label.position
+        for segment in self.segments:
+            for wire in segment.wires:
+                return wire.start
+        return None
+
+    def index(self, index):
+        """
+        adds wires and junctions (flipped like the sheet draws them) and labels to a spatial index
+        """
+        flip = [("scale", 1, -1)]
+        for segment in self.segments:
+            for shape in segment.wires + segment.junctions:
+                index.insert(spatial.transform_box(shape.bbox(), flip), "net", self.name, shape)
+            for label in segment.labels:
+                index.insert(label.bbox(), "net", self.name, label)
 
 
 class Segment(BaseObject):
     """
     <!ELEMENT segment (pinref | portref | wire | junction | label)*>
     """
+    pinrefs = []
+    portrefs = []
     wires = []
     junctions = []
     labels = []
 
-    def __init__(self, obj):
-        print(self.__class__.__name__)
-        print(obj.keys())
-        self.segment = self.dwg.g()
+    def __init__(self, obj, batch=None):
+        """
+        batch: see Wire.many()
+        """
+        if obj.get("pinref") is not None:
+            pinrefs = obj["pinref"]
+            if isinstance(pinrefs, list):
+                self.pinrefs = [Pinref(pinref) for pinref in pinrefs]
+            else:
+                self.pinrefs = [Pinref(pinrefs)]
+
+        if obj.get("portref") is not None:
+            portrefs = obj["portref"]
+            if isinstance(portrefs, list):
+                self.portrefs = [Portref(portref) for portref in portrefs]
+            else:
+                self.portrefs = [Portref(portrefs)]
 
         if obj.get("wire") is not None:
             wires = obj["wire"]
             if isinstance(wires, list):
-                self.wires = [Wire(wire) for wire in wires]
+                self.wires = Wire.many(wires, batch)
             else:
-                self.wires = [Wire(wires)]
-            [self.segment.add(wire.wire) for wire in self.wires]
+                self.wires = Wire.many([wires], batch)
 
         if obj.get("junction") is not None:
             junctions = obj["junction"]
             if isinstance(junctions, list):
-                self.junctions = [Junction(junction) for junction in junctions]
+                self.junctions = Junction.many(junctions, batch)
             else:
-                self.junctions = [Junction(junctions)]
-            [self.segment.add(junction.junction) for junction in self.junctions]
+                self.junctions = Junction.many([junctions], batch)
 
         if obj.get("label") is not None:
             labels = obj["label"]
@@ -872,6 +1122,135 @@ class Segment(BaseObject):
             else:
                 self.labels = [Label(labels)]
 
+    def drawn(self, only):
+        return only is None or any(id(shape) in only for shape in self.wires + self.junctions)
+
+    def infer_junctions(self, cell=50.0):
+        """
+        adds a Junction where three or more wires meet and the file has none: wire ends are counted in a dict
+        and a wire end on the span of a straight wire, a T-join, counts that wire twice. spans are looked up
+        in a grid, so no two wires are compared unless they share a cell. returns the junctions added
+        """
+        ends = {}
+        spans = spatial.GridIndex(cell)
+        for wire in self.wires:
+            ends[wire.start] = ends.get(wire.start, 0) + 1
+            ends[wire.end] = ends.get(wire.end, 0) + 1
+            if wire.curve == 0:
+                spans.insert(spatial.points_box([wire.start, wire.end]), "net", obj=wire)
+
+        drawn = {(round(x, 3), round(y, 3)) for x, y in (junction.center for junction in self.junctions)}
+        added = []
+        for point, count in ends.items():
+            x, y = point
+            if (round(x, 3), round(y, 3)) in drawn:
+                continue
+            count += 2 * sum(1 for box, kind, name, wire in spans.at(x, y)
+                             if spatial.inside_span(point, wire.start, wire.end))
+            if count >= 3:
+                added.append(Junction(None, point))
+        self.junctions = self.junctions + added
+        return added
+
+    def render(self, writer, only=None, merge_wires=False):
+        """
+        merge_wires: draw wires joined end to end as one path each
+        """
+        writer.begin_group()
+        if merge_wires:
+            for chain in self.chains(selected(self.wires, only)):
+                if len(chain) == 1:
+                    chain[0][0].render(writer)
+                    continue
+                wire = chain[0][0]
+                writer.path(self.chain2d(chain), {"fill": "none", "stroke": wire.stroke_fill,
+                                                  "stroke-width": wire.stroke_width, "stroke-linecap": "round",
+                                                  "stroke-linejoin": "round"})
+        else:
+            [wire.render(writer) for wire in selected(self.wires, only)]
+        [junction.render(writer) for junction in selected(self.junctions, only)]
+        writer.end_group()
+
+    @staticmethod
+    def chains(wires):
+        """
+        wires split into chains of the same stroke joined end to end; a chain is a list of (wire, reverse)
+        """
+        groups = {}
+        for wire in wires:
+            groups.setdefault((wire.stroke_fill, wire.stroke_width), []).append(wire)
+
+        chains = []
+        for group in groups.values():
+            ends = {}
+            for index, wire in enumerate(group):
+                ends.setdefault(wire.start, []).append(index)
+                ends.setdefault(wire.end, []).append(index)
+            used = [False] * len(group)
+
+            def walk(point):
+                chain = []
+                while True:
+                    following = [index for index in ends[point] if not used[index]]
+                    if not following:
+                        return chain
+                    used[following[0]] = True
+                    wire = group[following[0]]
+                    reverse = wire.start != point
+                    chain.append((wire, reverse))
+                    point = wire.start if reverse else wire.end
+
+            # chains start at dead ends where there are any, so they are not cut in the middle
+            order = sorted(range(len(group)),
+                           key=lambda index: min(len(ends[group[index].start]), len(ends[group[index].end])))
+            for index in order:
+                if used[index]:
+                    continue
+                used[index] = True
+                wire = group[index]
+                reverse = len(ends[wire.end]) == 1 and len(ends[wire.start]) != 1
+                start, end = (wire.end, wire.start) if reverse else (wire.start, wire.end)
+                back = walk(start)
+                chain = [(other, not flipped) for other, flipped in reversed(back)] + [(wire, reverse)] + walk(end)
+                chains.append(chain)
+        return chains
+
+    @staticmethod
+    def chain2d(chain):
+        wire, reverse = chain[0]
+        x, y = wire.end if reverse else wire.start
+        return " ".join(["M{} {}".format(x, y)] + [wire.step(reverse) for wire, reverse in chain])
+
+
+class Pinref(BaseObject):
+    """
+    <!ELEMENT pinref EMPTY>
+    <!ATTLIST pinref
+              part          %String;       #REQUIRED
+              gate          %String;       #REQUIRED
+              pin           %String;       #REQUIRED
+              >
+    """
+
+    def __init__(self, obj):
+        self.part = obj["@part"]
+        self.gate = obj["@gate"]
+        self.pin = obj["@pin"]
+
+
+class Portref(BaseObject):
+    """
+    <!ELEMENT portref EMPTY>
+    <!ATTLIST portref
+              moduleinst    %String;       #REQUIRED
+              port          %String;       #REQUIRED
+              >
+    """
+
+    def __init__(self, obj):
+        self.moduleinst = obj["@moduleinst"]
+        self.port = obj["@port"]
+
 
 class Label(BaseObject):
     """
@@ -890,11 +1269,27 @@ class Label(BaseObject):
               <!-- xref: Only in <net> context -->
     """
 
+    xref = False
+
     def __init__(self, obj):
-        print(self.__class__.__name__)
-        print(obj.keys())
         obj["#text"] = ""
         self.label = Text(obj)
+        self.xref = self.get_bool[obj.get("@xref", "no")]
+        # where the label is, in the same coordinates as wires
+        self.position = self.coord2mm((float(obj["@x"]), float(obj["@y"])))
+
+    def render(self, writer, text=None):
+        """
+        text: instead of the net name, e.g. the cross-reference of an xref label
+        """
+        x, y = self.label.insert
+        self.label.render(writer, text, transform=[("rotate", self.label.angle, x, y)])
+
+    def bbox(self):
+        x, y = self.label.insert
+        # room for a cross-reference like "/12.4C", which is not known before all sheets are read
+        text = self.label.text + "/00.0A" if self.xref else None
+        return self.label.bbox(text, transform=[("rotate", self.label.angle, x, y)])
 
 
 class Junction(BaseObject):
@@ -906,18 +1301,37 @@ class Junction(BaseObject):
               >
     """
 
-    def __init__(self, obj):
-        print(self.__class__.__name__)
-        print(obj.keys())
-        x = float(obj["@x"])
-        y = float(obj["@y"])
-        self.center = self.coord2mm((x, y))
+    def __init__(self, obj, values=None):
+        """
+        values: (x, y) already converted by batch()
+        """
+        if values is None:
+            values = self.batch([obj])[0]
+        self.center = values
         self.r = self.val2mm(0.5)
         self.stroke_fill = self.layer2color["91"]
         self.stroke_width = self.val2mm(0)
-        fill = self.stroke_fill if self.stroke_width == 0 else "none"
-        self.junction = self.dwg.circle(center=self.center, stroke=self.stroke_fill,
-                                        stroke_width=self.stroke_width, r=self.r, fill=fill)
+        self.fill = self.stroke_fill if self.stroke_width == 0 else "none"
+
+    @staticmethod
+    def batch(objs):
+        return geometry.convert([[float(obj["@x"]), float(obj["@y"])] for obj in objs])
+
+    @classmethod
+    def many(cls, objs, batch=None):
+        """
+        batch: a geometry.Batch which converts objs together with those of other containers
+        """
+        if batch is not None:
+            return batch.add(cls, objs)
+        return [cls(obj, values) for obj, values in zip(objs, cls.batch(objs))]
+
+    def render(self, writer):
+        writer.circle(self.center, self.r, {"stroke": self.stroke_fill, "stroke-width": self.stroke_width,
+                                            "fill": self.fill})
+
+    def bbox(self):
+        return spatial.points_box([self.center], self.r + self.stroke_width / 2)
 
 
 class Symbol(BaseObject):
@@ -927,6 +1341,7 @@ class Symbol(BaseObject):
               name          %String;       #REQUIRED
               >
     """
+    phase = "library"
     description = None
     polygons = []
     wires = []
@@ -936,15 +1351,14 @@ class Symbol(BaseObject):
     circles = []
     rectangles = []
     frames = []
+    extent = None
 
     def __init__(self, obj):
-        print(self.__class__.__name__)
-        print(obj.keys())
         self.name = obj["@name"]
 
         self.description = obj.get("description", "")
         if obj.get("polygon") is not None:
-            polygons = obj.polygon
+            polygons = obj["polygon"]
             if isinstance(polygons, list):
                 self.polygons = [Polygon(polygon) for polygon in polygons]
             else:
@@ -953,7 +1367,7 @@ class Symbol(BaseObject):
         if obj.get("wire") is not None:
             wires = obj["wire"]
             if isinstance(wires, list):
-                self.wires = [Wire(wire) for wire in wires]
+                self.wires = Wire.many(wires)
             else:
                 self.wires = [Wire(wires)]
         #
@@ -981,7 +1395,7 @@ class Symbol(BaseObject):
         if obj.get("circle") is not None:
             circles = obj["circle"]
             if isinstance(circles, list):
-                self.circles = [Circle(circle) for circle in circles]
+                self.circles = Circle.many(circles)
             else:
                 self.circles = [Circle(circles)]
         #
@@ -999,25 +1413,233 @@ class Symbol(BaseObject):
             else:
                 self.frames = [Frame(frames)]
         #
-        self.shape = self.dwg.g(id="{}-shape".format(self.name))
+
+    def render(self, writer):
         # symbol.scale(1, -1)
+        writer.begin_group(id="origin")
+        style = {"stroke": "maroon", "stroke-linecap": "round"}
+        writer.line(self.coord2mm((-1, 0)), self.coord2mm((1, 0)), style)
+        writer.line(self.coord2mm((0, -1)), self.coord2mm((0, 1)), style)
+        writer.end_group()
+
+        [polygon.render(writer) for polygon in self.polygons]
+        [wire.render(writer) for wire in self.wires]
+        # [dimension.render(writer) for dimension in self.dimension]
+        [pin.render(writer) for pin in self.pins]
+        [circle.render(writer) for circle in self.circles]
+        [rectangle.render(writer) for rectangle in self.rectangles]
+
+    def bbox(self):
+        """
+        extent of what render() draws, origin mark included; computed once
+        """
+        if self.extent is None:
+            origin = spatial.points_box([self.coord2mm((-1, -1)), self.coord2mm((1, 1))])
+            self.extent = spatial.union([origin] + [shape.bbox() for shape in
+                                                    self.polygons + self.wires + self.pins + self.circles +
+                                                    self.rectangles])
+        return self.extent
+
+
+class SymbolRegistry(object):
+    """
+    symbol definitions for <defs>; every (library, symbol, mirror) is defined only once
+    and all instances of it refer to the same definition
+    """
 
-        origin = self.dwg.g(id="origin")
-        origin.add(self.dwg.line(start=self.coord2mm((-1, 0)), end=self.coord2mm((1, 0)), stroke="maroon",
-                                 stroke_linecap="round"))
-        origin.add(self.dwg.line(start=self.coord2mm((0, -1)), end=self.coord2mm((0, 1)), stroke="maroon",
-                                 stroke_linecap="round"))
-        self.shape.add(origin)
+    def __init__(self):
+        self.shapes = {}
+        self.definitions = {}
+        self.elements = []
+        self.ids = {}
+        self.stale = set()
+
+    def get(self, library, symbol, mirror):
+        """
+        returns id of the definition, adding it on first use
+        """
+        key = (library.name, symbol.name, mirror)
+        definition_id = self.definitions.get(key)
+        if definition_id is None:
+            symbol_id = "{}.{}".format(library.name, symbol.name)
+            shape_id = self.shapes.get(key[:2])
+            if shape_id is None:
+                shape_id = "{}-shape".format(symbol_id)
+                self.shapes[key[:2]] = shape_id
+                self.add((shape_id, symbol, None))
+
+            definition_id = "{}F".format(symbol_id) if mirror else symbol_id
+            self.definitions[key] = definition_id
+            self.add((definition_id, shape_id, mirror))
+        return definition_id
+
+    def forget(self, library_name):
+        """
+        drops the definitions of a library, so they are added again from its symbols on next use.
+        they keep their place; those not added again are no longer drawn
+        """
+        for table in (self.shapes, self.definitions):
+            for key in [key for key in table if key[0] == library_name]:
+                self.stale.add(table.pop(key))
+
+    def add(self, element):
+        element_id = element[0]
+        if element_id in self.ids:
+            self.elements[self.ids[element_id]] = element
+            self.stale.discard(element_id)
+        else:
+            self.ids[element_id] = len(self.elements)
+            self.elements.append(element)
+
+    def render(self, writer, ids=None):
+        """
+        ids: only draw these definitions and the shapes they refer to
+        """
+        if ids is not None:
+            ids = set(ids)
+            ids.update([target for element_id, target, mirror in self.elements
+                        if mirror is not None and element_id in ids])
+        for element_id, target, mirror in self.elements:
+            if ids is not None and element_id not in ids or element_id in self.stale:
+                continue
+            self.render_element(writer, element_id, target, mirror)
+
+    def render_one(self, writer, element_id):
+        self.render_element(writer, *self.elements[self.ids[element_id]])
+
+    @staticmethod
+    def render_element(writer, element_id, target, mirror):
+        if mirror is None:
+            writer.begin_group(id=element_id)
+            target.render(writer)
+        else:
+            writer.begin_group(id=element_id, transform=[("scale", -1, 1)] if mirror else None)
+            writer.use(target)
+        writer.end_group()
 
-        [self.shape.add(polygon.polygon) for polygon in self.polygons]
-        [self.shape.add(wire.wire) for wire in self.wires]
-        # [self.shape.add(dimension.dimension) for dimension in self.dimension]
-        [self.shape.add(pin.pin) for pin in self.pins]
-        [self.shape.add(circle.circle) for circle in self.circles]
-        [self.shape.add(rectangle.rect) for rectangle in self.rectangles]
+    def __len__(self):
+        return len(self.elements) - len(self.stale)
 
-        self.symbol = self.dwg.g(id=self.name)
-        self.symbol.add(self.dwg.use("#{}".format(self.shape.get_id())))
+
+class Connectivity(object):
+    """
+    which part pins and module ports are on which net, looked up either way in constant time.
+    nets of the same name on different sheets are one net. a sheet added again replaces what it added before
+    """
+
+    def __init__(self):
+        self.net_pins = {}  # net name -> {(part, gate, pin): sheet id}
+        self.net_ports = {}  # net name -> {(moduleinst, port): sheet id}
+        self.pin_nets = {}  # (part, gate, pin) -> net name
+        self.sheets = {}  # sheet id -> (net name, pin, port) rows it added
+
+    def add_sheet(self, sheet):
+        self.remove_sheet(sheet.id)
+        rows = []
+        for net in sheet.nets:
+            for pin in net.pins():
+                self.net_pins.setdefault(net.name, {})[pin] = sheet.id
+                self.pin_nets[pin] = net.name
+                rows.append((net.name, pin, None))
+            for port in net.ports():
+                self.net_ports.setdefault(net.name, {})[port] = sheet.id
+                rows.append((net.name, None, port))
+        self.sheets[sheet.id] = rows
+
+    def remove_sheet(self, sheet_id):
+        for name, pin, port in self.sheets.pop(sheet_id, ()):
+            table, key = (self.net_pins, pin) if pin is not None else (self.net_ports, port)
+            table[name].pop(key, None)
+            if not table[name]:
+                del table[name]
+            if pin is not None and self.pin_nets.get(pin) == name:
+                del self.pin_nets[pin]
+
+    def net(self, part, gate, pin):
+        """
+        name of the net a pin is on, None if it is not connected
+        """
+        return self.pin_nets.get((part, gate, pin))
+
+    def pins(self, name):
+        """
+        (part, gate, pin) on net name
+        """
+        return list(self.net_pins.get(name, ()))
+
+    def ports(self, name):
+        """
+        (moduleinst, port) on net name
+        """
+        return list(self.net_ports.get(name, ()))
+
+    def report(self):
+        """
+        nets with their pins and ports, for JSON
+        """
+        return {name: {"pins": self.pins(name), "ports": self.ports(name)}
+                for name in dict.fromkeys(list(self.net_pins) + list(self.net_ports))}
+
+
+class XrefIndex(object):
+    """
+    on which sheets each net is drawn and where, so xref labels are resolved by one lookup instead of
+    scanning the other sheets. a sheet added again replaces what it added before
+    """
+
+    def __init__(self):
+        self.nets = {}  # net name -> {sheet number: (column, row) of the frame, or None}
+        self.sheets = {}  # sheet number -> net names it added
+
+    def add_sheet(self, sheet, number):
+        frame = sheet.plain.frames[0] if sheet.plain is not None and sheet.plain.frames else None
+        self.add_anchors(number, [(net.name, net.anchor()) for net in sheet.nets], frame)
+
+    def add_anchors(self, number, anchors, frame=None):
+        """
+        (net name, Net.anchor()) of every net of sheet number, located by the cells of frame when it has one
+        """
+        self.remove_sheet(number)
+        for name, anchor in anchors:
+            entries = self.nets.setdefault(name, {})
+            if number in entries:
+                continue
+            entries[number] = frame.cell(anchor) if frame is not None and anchor is not None else None
+        self.sheets[number] = [name for name, anchor in anchors]
+
+    def remove_sheet(self, number):
+        for name in self.sheets.pop(number, ()):
+            entries = self.nets.get(name, {})
+            entries.pop(number, None)
+            if not entries:
+                self.nets.pop(name, None)
+
+    def next(self, name, number):
+        """
+        (sheet number, cell) of the next sheet after number with net name on it, going round to the first;
+        None when the net is on no other sheet
+        """
+        others = [other for other in self.nets.get(name, ()) if other != number]
+        if not others:
+            return None
+        following = [other for other in others if other > number]
+        other = min(following) if following else min(others)
+        return other, self.nets[name][other]
+
+    def label(self, fmt, name, number):
+        """
+        text of an xref label of net name on sheet number, after Eagle's xreflabel format:
+        %N net name, %S sheet, %C column and %R row of the frame there, %F flag, which is not drawn
+        """
+        found = self.next(name, number)
+        if found is None:
+            return name
+        other, cell = found
+        column, row = cell if cell is not None else ("", "")
+        fields = {"%N": name, "%S": str(other), "%C": column, "%R": row, "%F": "", "%%": "%"}
+        text = re.sub(r"%[NSCRF%]", lambda match: fields[match.group(0)], fmt)
+        # no frame on that sheet: no separator before the empty column and row
+        return text if cell is not None else text.rstrip(".")
 
 
 class Sheet(BaseObject):
@@ -1030,49 +1652,133 @@ class Sheet(BaseObject):
     instances = []
     busses = []
     nets = []
-    shapes = None
+    id = None
+    number = None
+    symbols = []
+    index = None
+    batch = None
 
     def __init__(self, obj):
-        print(self.__class__.__name__)
-        print(obj.keys())
+        """
+        the wires, junctions and circles of the sheet's nets and plain are converted together, see geometry.Batch;
+        those of nets and plain added later once populate() is called
+        """
         self.description = obj.get("description", "")
-        self.sheet = self.dwg.g()
-        self.shapes = self.dwg.g(transform="scale(1,-1)")
-        self.sheet.add(self.shapes)
+        self.plain = None
+        self.instances = []
+        self.nets = []
+        self.batch = geometry.Batch()
 
         if obj.get("plain") is not None:
-            plain = Plain(obj["plain"])
-            self.sheet.add(plain.shapes)
-            self.sheet.add(plain.texts)
+            self.add_plain(Plain(obj["plain"], self.batch))
         #
 
         if obj.get("instances") is not None:
             instances = obj["instances"]["instance"]
             if isinstance(instances, list):
-                self.instances = [Instance(instance) for instance in instances]
+                [self.add_instance(Instance(instance)) for instance in instances]
             else:
-                self.instances = [Instance(instances)]
-
-            for instance in self.instances:
-                if instance.smashed:
-                    [self.sheet.add(attr.text) for attr in instance.attributes]
+                self.add_instance(Instance(instances))
 
         if obj.get("nets") is not None:
             nets = obj["nets"]["net"]
             if isinstance(nets, list):
-                self.nets = [Net(net) for net in nets]
+                [self.add_net(Net(net, self.batch)) for net in nets]
             else:
-                self.nets = [Net(nets)]
-            [self.shapes.add(net.net) for net in self.nets]
-            [[[self.sheet.add(label.label.text) for label in segment.labels] for segment in net.segments] for net in
-             self.nets]
-
-    def populate(self, libraries, parts):
+                self.add_net(Net(nets, self.batch))
+        self.batch.run()
+
+    def add_plain(self, plain):
+        self.plain = plain
+
+    def add_instance(self, instance):
+        self.instances.append(instance)
+
+    def add_net(self, net):
+        self.nets.append(net)
+
+    def release(self):
+        """
+        drops everything drawn on this sheet once it has been drawn for good; id, number and description
+        stay, and the schematic's Connectivity and XrefIndex keep what they took from it
+        """
+        self.plain = None
+        self.instances = []
+        self.nets = []
+        self.symbols = []
+        self.index = None
+
+    def populate(self, libraries, parts, registry):
+        self.batch.run()
+        for instance in self.instances:
+            instance.populate(libraries, parts, registry)
+        connections = {}
+        for net in self.nets:
+            for part, gate, pin in net.pins():
+                connections.setdefault((part, gate), {})[pin] = net.name
         for instance in self.instances:
-            instance.populate(libraries, parts)
-            self.shapes.add(instance.instance)
-            self.sheet.add(instance.texts)
-            self.shapes.add(instance.instance)
+            instance.nets = connections.get((instance.name, instance.gate.name), {})
+        # symbol definitions this sheet refers to, in order of first use
+        self.symbols = list(dict.fromkeys(instance.href for instance in self.instances))
+        self.build_index()
+
+    def build_index(self):
+        """
+        spatial index of everything drawn on this sheet, in the sheet's SVG coordinates;
+        entries are (box, kind, name, obj) with kind "part", "net" or "plain"
+        """
+        self.index = spatial.GridIndex()
+        flip = [("scale", 1, -1)]
+        for net in self.nets:
+            net.index(self.index)
+        boxes = geometry.transform_boxes([instance.symbol.bbox() for instance in self.instances],
+                                         [spatial.matrix(flip + instance.placement()) for instance in self.instances])
+        for instance, box in zip(self.instances, boxes):
+            self.index.insert(box, "part", instance.name, instance)
+            for entry in instance.texts:
+                text, _text, insert, transform = entry
+                self.index.insert(text.bbox(_text, insert, transform), "part", instance.name, entry)
+        if self.plain is not None:
+            self.plain.index(self.index)
+
+    def infer_junctions(self):
+        """
+        adds the junctions every net segment is missing, see Segment.infer_junctions(), also to the index
+        """
+        flip = [("scale", 1, -1)]
+        for net in self.nets:
+            for segment in net.segments:
+                for junction in segment.infer_junctions():
+                    self.index.insert(spatial.transform_box(junction.bbox(), flip), "net", net.name, junction)
+
+    def viewbox(self, default=None):
+        """
+        (x, y, width, height) fitting everything drawn on this sheet
+        """
+        if self.index is None:
+            return default
+        return self.index.viewbox(default=default)
+
+    def render(self, writer, only=None, merge_wires=False, xref=None):
+        """
+        only: id() of the objects to draw, as found in index entries; everything by default.
+        merge_wires: draw net wires joined end to end as one path each.
+        xref: text of xref labels, see Schematic.xref(); the plain net name without it
+        """
+        writer.begin_group(id=self.id)
+        writer.begin_group(transform=[("scale", 1, -1)])
+        [net.render(writer, only, merge_wires) for net in self.nets]
+        [instance.render(writer) for instance in selected(self.instances, only)]
+        writer.end_group()
+
+        if self.plain is not None:
+            self.plain.render(writer, only)
+        [net.render_labels(writer, only, xref) for net in self.nets]
+        [instance.render_texts(writer, only) for instance in self.instances]
+        writer.end_group()
+
+    def has_xrefs(self):
+        return any(net.has_xrefs() for net in self.nets)
 
 
 class Plain(BaseObject):
@@ -1088,10 +1794,10 @@ class Plain(BaseObject):
     rectangles = []
     frames = []
 
-    def __init__(self, obj):
-        print(self.__class__.__name__)
-        print(obj.keys())
-
+    def __init__(self, obj, batch=None):
+        """
+        batch: see Wire.many()
+        """
         if obj.get("polygon") is not None:
             polygons = obj["polygon"]
             if isinstance(polygons, list):
@@ -1102,9 +1808,9 @@ class Plain(BaseObject):
         if obj.get("wire") is not None:
             wires = obj["wire"]
             if isinstance(wires, list):
-                self.wires = [Wire(wire) for wire in wires]
+                self.wires = Wire.many(wires, batch)
             else:
-                self.wires = [Wire(wires)]
+                self.wires = Wire.many([wires], batch)
         #
         if obj.get("text") is not None:
             texts = obj["text"]
@@ -1124,9 +1830,9 @@ class Plain(BaseObject):
         if obj.get("circle") is not None:
             circles = obj["circle"]
             if isinstance(circles, list):
-                self.circles = [Circle(circle) for circle in circles]
+                self.circles = Circle.many(circles, batch)
             else:
-                self.circles = [Circle(circles)]
+                self.circles = Circle.many([circles], batch)
         #
         if obj.get("rectangle") is not None:
             rectangles = obj["rectangle"]
@@ -1136,32 +1842,36 @@ class Plain(BaseObject):
                 self.rectangles = [Rect(rectangles)]
         #
         if obj.get("frame") is not None:
-            frames = list(obj["frame"])
+            frames = obj["frame"]
             if isinstance(frames, list):
                 self.frames = [Frame(frame) for frame in frames]
             else:
                 self.frames = [Frame(frames)]
         #
-        shape = self.dwg.g(id="plain_objects")
-        texts = self.dwg.g(id="plain_texts")
-
-        [shape.add(polygon.polygon) for polygon in self.polygons]
-        [shape.add(wire.wire) for wire in self.wires]
-        # [shape.add(dimension.dimension) for dimension in self.dimension]
 
+    def render(self, writer, only=None):
+        writer.begin_group(id="plain_objects", transform=[("scale", 1, -1)])
+        [polygon.render(writer) for polygon in selected(self.polygons, only)]
+        [wire.render(writer) for wire in selected(self.wires, only)]
+        # [dimension.render(writer) for dimension in self.dimension]
+        [pin.render(writer) for pin in selected(self.pins, only)]
+        [circle.render(writer) for circle in selected(self.circles, only)]
+        [rectangle.render(writer) for rectangle in selected(self.rectangles, only)]
+        writer.end_group()
+
+        writer.begin_group(id="plain_texts")
+        for text in selected(self.texts, only):
+            x, y = text.insert
+            text.render(writer, transform=[("rotate", text.angle, x, y)])
+        writer.end_group()
+
+    def index(self, index):
+        flip = [("scale", 1, -1)]
+        for shape in self.polygons + self.wires + self.circles + self.rectangles:
+            index.insert(spatial.transform_box(shape.bbox(), flip), "plain", None, shape)
         for text in self.texts:
-            angle = text.angle
-            insert = text.insert
-            text = text.text
-            text.rotate(angle, insert)
-            texts.add(text)
-        [shape.add(pin.pin) for pin in self.pins]
-        [shape.add(circle.circle) for circle in self.circles]
-        [shape.add(rectangle.rect) for rectangle in self.rectangles]
-        shape.scale(1, -1)
-
-        self.shapes = shape
-        self.texts = texts
+            x, y = text.insert
+            index.insert(text.bbox(transform=[("rotate", text.angle, x, y)]), "plain", text.text, text)
 
 
 class Schematic(BaseObject):
@@ -1181,53 +1891,128 @@ class Schematic(BaseObject):
     parts = []
     sheets = []
     errors = []
-    symbols = []
-
-    def __init__(self, obj):
-        print(self.__class__.__name__)
-        print(obj.keys())
-        self.schematic = self.dwg.g()
+    symbols = None
+    connectivity = None
+    xrefs = None
+    xreflabel = "%F%N/%S.%C%R"
+
+    def __init__(self, obj, on_sheet=None, library_cache=None, release_sheets=False):
+        """
+        on_sheet(schematic, sheet) is called as soon as each sheet has been added and populated,
+        e.g. to draw it. with a library_cache, libraries compiled by earlier conversions are reused.
+        release_sheets: drop the objects of every sheet once a layout has drawn it, see drawn(),
+        so memory does not grow with the number of sheets
+        """
+        self.on_sheet = on_sheet
+        self.release_sheets = release_sheets
+        self.library_cache = library_cache
+        self.library_keys = {}
         self.description = attrdict.AttrDict(obj.get("description", {}))
-
-        if obj["libraries"] is not None:
+        self.libraries = {}
+        self.attributes = []
+        self.parts = {}
+        self.sheets = []
+        self.symbols = SymbolRegistry()
+        self.connectivity = Connectivity()
+        self.xrefs = XrefIndex()
+        self.xreflabel = obj.get("@xreflabel", self.xreflabel)
+
+        if obj.get("libraries") is not None:
             libraries = obj["libraries"]["library"]
             if isinstance(libraries, list):
-                libraries = [Library(library) for library in libraries]
+                [self.load_library(library) for library in libraries]
             else:
-                libraries = [Library(libraries)]
-            self.libraries = {library.name: library for library in libraries}
+                self.load_library(libraries)
 
-        if obj["attributes"] is not None:
+        if obj.get("attributes") is not None:
             attributes = obj["attributes"]["attribute"]
             if isinstance(attributes, list):
-                self.attributes = [Attribute(attribute) for attribute in attributes]
+                [self.add_attribute(Attribute(attribute)) for attribute in attributes]
             else:
-                self.attributes = [Attribute(attributes)]
+                self.add_attribute(Attribute(attributes))
 
-        if obj["parts"] is not None:
+        if obj.get("parts") is not None:
             parts = obj["parts"]["part"]
             if isinstance(parts, list):
-                parts = [Part(part) for part in parts]
+                [self.add_part(Part(part)) for part in parts]
             else:
-                parts = [Part(parts)]
-            self.parts = {part.name: part for part in parts}
+                self.add_part(Part(parts))
 
-        if obj["sheets"] is not None:
+        if obj.get("sheets") is not None:
             sheets = obj["sheets"]["sheet"]
-            if isinstance(sheets, list):
-                self.sheets = [Sheet(sheet) for sheet in sheets]
-            else:
-                self.sheets = [Sheet(sheets)]
-            for index, sheet in enumerate(self.sheets):
-                sheet.populate(self.libraries, self.parts)
-
-                for instance in sheet.instances:
-                    self.symbols.append(instance.symbol)
-                    self.symbols.append(instance.shape)
-                    id = instance.symbol.get_id()
-                    print(id)
-
-                sheet = sheet.sheet
-                sheet["id"] = "sheet{}".format(index)
-
-                self.schematic.add(sheet)
+            sheets = [Sheet(sheet) for sheet in sheets] if isinstance(sheets, list) else [Sheet(sheets)]
+            # xref labels may name later sheets, so all of them are indexed before the first is drawn
+            [self.xrefs.add_sheet(sheet, number) for number, sheet in enumerate(sheets, 1)]
+            [self.add_sheet(sheet) for sheet in sheets]
+
+    def load_library(self, obj):
+        """
+        builds a Library from its raw object, or takes it from library_cache when it has the same content
+        """
+        if self.library_cache is None:
+            self.add_library(Library(obj))
+            return
+
+        key = self.library_cache.key(obj)
+        with instrument.phase("library"):
+            library = self.library_cache.load(key)
+        if library is None:
+            library = Library(obj)
+            built = None
+        else:
+            built = library.built()
+        self.library_keys[library.name] = (key, built)
+        self.add_library(library)
+
+    def store_libraries(self):
+        """
+        writes libraries back to library_cache when they are new or got more symbols or devicesets built
+        """
+        for name, (key, built) in self.library_keys.items():
+            library = self.libraries[name]
+            if library.built() != built:
+                self.library_cache.store(key, library)
+                self.library_keys[name] = (key, library.built())
+
+    def add_library(self, library):
+        self.libraries[library.name] = library
+
+    def add_attribute(self, attribute):
+        self.attributes.append(attribute)
+
+    def add_part(self, part):
+        self.parts[part.name] = part
+
+    def xref(self, sheet):
+        """
+        net name -> text of its xref labels on sheet; needs every sheet in xrefs, see streamparser.scan_xrefs()
+        """
+        return lambda name: self.xrefs.label(self.xreflabel, name, sheet.number)
+
+    def drawn(self, sheet):
+        """
+        called by a layout when it will not draw sheet again
+        """
+        if self.release_sheets:
+            sheet.release()
+
+    def add_sheet(self, sheet, index=None):
+        """
+        populates the sheet with libraries and parts already added, so all of them must come before.
+        index: replace the sheet at this position instead of appending
+        """
+        if index is None:
+            index = len(self.sheets)
+            self.sheets.append(sheet)
+        else:
+            self.sheets[index] = sheet
+        sheet.id = "sheet{}".format(index)
+        sheet.number = index + 1
+        with instrument.phase("populate"):
+            sheet.populate(self.libraries, self.parts, self.symbols)
+            self.connectivity.add_sheet(sheet)
+            self.xrefs.add_sheet(sheet, sheet.number)
+
+        if self.on_sheet is not None:
+            with instrument.phase("serialize"):
+                self.on_sheet(self, sheet)
@@ -0,0 +1,104 @@
+"""
+search index written next to the drawing, so a viewer can find parts, nets and texts without walking the SVG
+
+a SearchIndex wraps a layout and reads every sheet's spatial index as the sheet is drawn:
+
+    layout = SearchIndex(Document(writer), "a.search.json")
+
+the file lists rows of the fields named in "fields"; sheet is a position in "sheets" and
+x, y, width and height are the box of the match in that sheet's SVG coordinates.
+"connectivity" has the part pins and module ports of every net, see Connectivity.report()
+"""
+
+import json
+import os
+
+import spatial
+from output import listed, sheet_description
+from schematic import Attribute
+from writer import remove_existing
+
+FIELDS = {
+    "parts": ["name", "value", "sheet", "x", "y", "width", "height"],
+    "nets": ["name", "sheet", "x", "y", "width", "height"],
+    "texts": ["text", "sheet", "x", "y", "width", "height"],
+    "attributes": ["part", "name", "value", "sheet", "x", "y", "width", "height"],
+}
+
+
+def sidecar(output, directory=False):
+    """
+    name of the search index for an output file, or in an output directory; None for stdout
+    """
+    if directory:
+        return os.path.join(output, "search.json")
+    if output == "-":
+        return None
+    return os.path.splitext(output)[0] + ".search.json"
+
+
+def box(bbox):
+    xmin, ymin, xmax, ymax = bbox
+    return [round(xmin, 2), round(ymin, 2), round(xmax - xmin, 2), round(ymax - ymin, 2)]
+
+
+def sheet_rows(sheet):
+    """
+    rows of one sheet by FIELDS name, with None where the sheet position goes
+    """
+    rows = {name: [] for name in FIELDS}
+    instances = {instance.name: instance for instance in sheet.instances}
+    nets = {}
+    for bbox, kind, name, obj in sheet.index.entries:
+        if kind == "net":
+            nets[name] = spatial.union([nets.get(name), bbox])
+        elif kind == "plain":
+            if name:
+                rows["texts"].append([name, None] + box(bbox))
+        elif obj is not None and not isinstance(obj, tuple):
+            # the instance itself; every gate of a part is found where it is placed
+            rows["parts"].append([obj.part.name, obj.part.value, None] + box(bbox))
+        else:
+            text, _text, insert, transform = obj
+            if isinstance(text, Attribute):
+                value = instances[name].attribute_value(text)
+                if text.name not in ("NAME", "VALUE") and value:
+                    rows["attributes"].append([name, text.name, value, None] + box(bbox))
+            elif text.text not in (">NAME", ">VALUE") and _text:
+                rows["texts"].append([_text, None] + box(bbox))
+    rows["nets"] = [[name, None] + box(bbox) for name, bbox in nets.items()]
+    return rows
+
+
+class SearchIndex(object):
+    """
+    layout which passes every call on to layout and writes the search index of all sheets at end()
+    """
+
+    def __init__(self, layout, filename):
+        self.layout = layout
+        self.filename = filename
+        self.sheets = {}
+
+    def begin(self):
+        self.layout.begin()
+        self.sheets = {}
+
+    def __call__(self, schematic, sheet):
+        self.sheets[sheet.id] = (sheet, sheet_rows(sheet))
+        self.layout(schematic, sheet)
+
+    def end(self, schematic):
+        self.layout.end(schematic)
+        index = {"fields": FIELDS, "sheets": [], **{name: [] for name in FIELDS}}
+        for position, (sheet, rows) in enumerate(listed(self.sheets, schematic)):
+            index["sheets"].append({"id": sheet.id, "description": sheet_description(sheet)})
+            for name, table in rows.items():
+                column = FIELDS[name].index("sheet")
+                for row in table:
+                    row[column] = position
+                index[name].extend(table)
+        index["connectivity"] = schematic.connectivity.report()
+        remove_existing(self.filename)
+        with open(self.filename, "w", encoding="utf-8") as f:
+            json.dump(index, f, separators=(",", ":"))
@@ -0,0 +1,219 @@
+"""
+bounding boxes and a grid spatial index over drawn primitives
+
+boxes are (xmin, ymin, xmax, ymax) tuples in SVG user units;
+transforms are lists like [("rotate", angle, cx, cy), ("scale", sx, sy), ("translate", tx, ty)]
+which apply right to left, the same way as a transform attribute
+"""
+
+import math
+
+import geometry
+
+IDENTITY = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+MARGIN = 20.0  # around a viewBox, 2 mm
+
+
+def multiply(m, n):
+    """
+    m x n of SVG matrices (a, b, c, d, e, f)
+    """
+    a1, b1, c1, d1, e1, f1 = m
+    a2, b2, c2, d2, e2, f2 = n
+    return (a1 * a2 + c1 * b2, b1 * a2 + d1 * b2,
+            a1 * c2 + c1 * d2, b1 * c2 + d1 * d2,
+            a1 * e2 + c1 * f2 + e1, b1 * e2 + d1 * f2 + f1)
+
+
+def to_matrix(operation):
+    name, *args = operation
+    if name == "translate":
+        tx, ty = args
+        return (1.0, 0.0, 0.0, 1.0, tx, ty)
+    if name == "scale":
+        sx, sy = args
+        return (sx, 0.0, 0.0, sy, 0.0, 0.0)
+    if name == "rotate":
+        angle, cx, cy = args
+        cos, sin = geometry.cos_sin(angle)
+        return (cos, sin, -sin, cos, cx - cos * cx + sin * cy, cy - sin * cx - cos * cy)
+    if name == "matrix":
+        return tuple(args)
+    raise ValueError("unknown transform {}".format(name))
+
+
+def matrix(transform):
+    m = IDENTITY
+    for operation in transform or ():
+        m = multiply(m, to_matrix(operation))
+    return m
+
+
+def matrix_determinant(m):
+    a, b, c, d, e, f = m
+    return a * d - b * c
+
+
+def apply(m, point):
+    a, b, c, d, e, f = m
+    x, y = point
+    return (a * x + c * y + e, b * x + d * y + f)
+
+
+def points_box(points, pad=0.0):
+    xs = [x for x, y in points]
+    ys = [y for x, y in points]
+    return (min(xs) - pad, min(ys) - pad, max(xs) + pad, max(ys) + pad)
+
+
+def union(boxes):
+    boxes = [box for box in boxes if box is not None]
+    if not boxes:
+        return None
+    return (min(box[0] for box in boxes), min(box[1] for box in boxes),
+            max(box[2] for box in boxes), max(box[3] for box in boxes))
+
+
+def transform_box(box, transform):
+    if box is None or not transform:
+        return box
+    m = matrix(transform)
+    xmin, ymin, xmax, ymax = box
+    return points_box([apply(m, point) for point in ((xmin, ymin), (xmax, ymin), (xmin, ymax), (xmax, ymax))])
+
+
+def viewbox(box, margin=MARGIN, default=None):
+    """
+    SVG viewBox (x, y, width, height) around box with a margin
+    """
+    if box is None:
+        return default
+    xmin, ymin, xmax, ymax = box
+    return (round(xmin - margin, 3), round(ymin - margin, 3),
+            round(xmax - xmin + 2 * margin, 3), round(ymax - ymin + 2 * margin, 3))
+
+
+def intersects(a, b):
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+def contains(box, x, y):
+    return box[0] <= x <= box[2] and box[1] <= y <= box[3]
+
+
+def inside_span(point, start, end, tolerance=1e-3):
+    """
+    is point on the straight line from start to end, but not at either end?
+    """
+    if point == start or point == end:
+        return False
+    (x, y), (x1, y1), (x2, y2) = point, start, end
+    dx, dy = x2 - x1, y2 - y1
+    length = math.hypot(dx, dy)
+    if length == 0 or abs(dx * (y - y1) - dy * (x - x1)) > tolerance * length:
+        return False
+    along = (x - x1) * dx + (y - y1) * dy
+    return 0 < along < length * length
+
+
+def arc_center(start, end, curve):
+    """
+    center and radius of an arc from start to end turning curve degrees counterclockwise
+    """
+    (x1, y1), (x2, y2) = start, end
+    dx, dy = x2 - x1, y2 - y1
+    chord = math.hypot(dx, dy)
+    half = math.radians(curve) / 2
+    r = abs(chord / 2 / math.sin(half))
+    h = chord / 2 / math.tan(half)
+    return ((x1 + x2) / 2 - dy / chord * h, (y1 + y2) / 2 + dx / chord * h), r
+
+
+def arc_box(start, end, curve, pad=0.0):
+    if start == end:
+        return points_box([start], pad)
+    (cx, cy), r = arc_center(start, end, curve)
+    begin = math.degrees(math.atan2(start[1] - cy, start[0] - cx))
+    points = [start, end]
+    for quadrant in range(0, 360, 90):
+        # is the axis direction swept by the arc?
+        offset = (quadrant - begin) % 360 if curve > 0 else (begin - quadrant) % 360
+        if offset < abs(curve):
+            rad = math.radians(quadrant)
+            points.append((cx + r * math.cos(rad), cy + r * math.sin(rad)))
+    return points_box(points, pad)
+
+
+def text_box(text, insert, font_size, anchor="start", baseline="alphabetic"):
+    """
+    rough extent of a text; glyphs are taken as 0.6 em wide
+    """
+    x, y = insert
+    width = len(text) * font_size * 0.6
+    if anchor == "middle":
+        x -= width / 2
+    elif anchor == "end":
+        x -= width
+    if baseline in ("hanging", "text-before-edge"):
+        top = y
+    elif baseline in ("middle", "central"):
+        top = y - font_size / 2
+    else:
+        top = y - font_size
+    return (x, top, x + width, top + font_size)
+
+
+class GridIndex(object):
+    """
+    uniform grid over boxes; every entry is listed in each cell its box touches.
+    entries are (box, kind, name, obj) where kind is "part", "net" or "plain" and obj is what is drawn
+    """
+
+    def __init__(self, cell=100.0):
+        self.cell = cell
+        self.cells = {}
+        self.entries = []
+        self.bounds = None
+
+    def cell_range(self, box):
+        xmin, ymin, xmax, ymax = box
+        return (range(int(math.floor(xmin / self.cell)), int(math.floor(xmax / self.cell)) + 1),
+                range(int(math.floor(ymin / self.cell)), int(math.floor(ymax / self.cell)) + 1))
+
+    def insert(self, box, kind, name=None, obj=None):
+        if box is None:
+            return
+        index = len(self.entries)
+        self.entries.append((box, kind, name, obj))
+        self.bounds = union([self.bounds, box])
+        columns, rows = self.cell_range(box)
+        for column in columns:
+            for row in rows:
+                self.cells.setdefault((column, row), []).append(index)
+
+    def candidates(self, box):
+        found = set()
+        columns, rows = self.cell_range(box)
+        for column in columns:
+            for row in rows:
+                found.update(self.cells.get((column, row), ()))
+        return sorted(found)
+
+    def at(self, x, y):
+        """
+        entries whose box contains x, y
+        """
+        return [self.entries[index] for index in self.candidates((x, y, x, y))
+                if contains(self.entries[index][0], x, y)]
+
+    def within(self, box):
+        """
+        entries whose box intersects box
+        """
+        return [self.entries[index] for index in self.candidates(box) if intersects(self.entries[index][0], box)]
+
+    def viewbox(self, margin=MARGIN, default=None):
+        """
+        (x, y, width, height) around everything indexed
+        """
+        return viewbox(self.bounds, margin, default)
@@ -0,0 +1,214 @@
+"""
+incremental schematic parser based on ElementTree iterparse
+
+Library, Part, Instance, Net and Sheet objects are built as soon as their end tags arrive
+and each XML subtree is dropped right after it has been consumed.
+
+when sheets are drawn as they are read, their xref labels may name sheets further on, so the file
+is read twice: scan_xrefs() first reads only the frames and net anchors of every sheet into an XrefIndex
+"""
+
+import shutil
+import tempfile
+from xml.etree import ElementTree
+
+import attrdict
+
+from schematic import BaseObject, Schematic, Attribute, Part, Sheet, Plain, Instance, Net, Frame, XrefIndex
+
+SPOOL_SIZE = 16 * 1024 * 1024  # a source which can not be read twice is kept in memory up to this size
+
+
+def element2dict(elem):
+    """
+    converts an element into the same shape xmltodict.parse() gives;
+    attributes become "@name" keys, repeated children become lists, text goes to "#text"
+    """
+    obj = {"@{}".format(key): value for key, value in elem.attrib.items()}
+    for child in elem:
+        value = element2dict(child)
+        if child.tag not in obj:
+            obj[child.tag] = value
+        elif isinstance(obj[child.tag], list):
+            obj[child.tag].append(value)
+        else:
+            obj[child.tag] = [obj[child.tag], value]
+
+    text = elem.text.strip() if elem.text is not None else ""
+    if text:
+        if not obj:
+            return text
+        obj["#text"] = text
+    return obj if obj else None
+
+
+class StreamParser(object):
+    """
+    walks <schematic> with iterparse and feeds a Schematic object one subtree at a time.
+    paths are relative to <schematic>
+    """
+
+    def __init__(self, on_sheet=None, library_cache=None, release_sheets=False, xrefs=None):
+        """
+        xrefs: XrefIndex of every sheet, read ahead by scan_xrefs()
+        """
+        self.callback = on_sheet
+        self.library_cache = library_cache
+        self.release_sheets = release_sheets
+        self.xrefs = xrefs
+        self.schematic = None
+        self.sheet = None
+        self.handlers = {
+            ("description",): self.on_description,
+            ("libraries", "library"): self.on_library,
+            ("attributes", "attribute"): self.on_attribute,
+            ("parts", "part"): self.on_part,
+            ("sheets", "sheet", "description"): self.on_sheet_description,
+            ("sheets", "sheet", "plain"): self.on_plain,
+            ("sheets", "sheet", "instances", "instance"): self.on_instance,
+            ("sheets", "sheet", "nets", "net"): self.on_net,
+            ("sheets", "sheet"): self.on_sheet,
+        }
+        # handled elements whose children are consumed by handlers of their own
+        self.containers = {("sheets", "sheet")}
+
+    def parse(self, source):
+        """
+        source: filename or file object
+        """
+        elements = []
+        path = None
+        for event, elem in ElementTree.iterparse(source, events=("start", "end")):
+            if event == "start":
+                elements.append(elem)
+                if path is not None:
+                    path = path + (elem.tag,)
+                    if path == ("sheets", "sheet"):
+                        self.sheet = Sheet({})
+                elif elem.tag == "schematic":
+                    path = ()
+                    attributes = {"@{}".format(key): value for key, value in elem.attrib.items()}
+                    self.schematic = Schematic(attrdict.AttrDict(attributes), self.callback, self.library_cache,
+                                               self.release_sheets)
+                    if self.xrefs is not None:
+                        self.schematic.xrefs = self.xrefs
+                continue
+
+            elements.pop()
+            parent = elements[-1] if elements else None
+            if path is None or path == ():
+                # outside <schematic> (settings, layers, ...) or <schematic> itself
+                path = None
+                self.free(elem, parent)
+                continue
+
+            handler = self.handlers.get(path)
+            if handler is not None:
+                handler(elem)
+                self.free(elem, parent)
+            elif not any(path[:depth] in self.handlers and path[:depth] not in self.containers
+                         for depth in range(1, len(path))):
+                # not a part of any subtree handled later; e.g. <classes>, <busses>
+                self.free(elem, parent)
+            path = path[:-1]
+
+        return self.schematic
+
+    @staticmethod
+    def free(elem, parent):
+        elem.clear()
+        if parent is not None and len(parent) and parent[-1] is elem:
+            del parent[-1]
+
+    def on_description(self, elem):
+        self.schematic.description = element2dict(elem) or ""
+
+    def on_library(self, elem):
+        self.schematic.load_library(element2dict(elem))
+
+    def on_attribute(self, elem):
+        self.schematic.add_attribute(Attribute(element2dict(elem)))
+
+    def on_part(self, elem):
+        self.schematic.add_part(Part(element2dict(elem)))
+
+    def on_sheet_description(self, elem):
+        self.sheet.description = element2dict(elem) or ""
+
+    def on_plain(self, elem):
+        self.sheet.add_plain(Plain(element2dict(elem) or {}, self.sheet.batch))
+
+    def on_instance(self, elem):
+        self.sheet.add_instance(Instance(element2dict(elem)))
+
+    def on_net(self, elem):
+        self.sheet.add_net(Net(element2dict(elem), self.sheet.batch))
+
+    def on_sheet(self, elem):
+        self.schematic.add_sheet(self.sheet)
+        self.sheet = None
+
+
+def net_anchor(elem):
+    """
+    Net.anchor() of a <net> element, without building the net
+    """
+    first = None
+    for label in elem.iter("label"):
+        if BaseObject.get_bool[label.get("xref", "no")]:
+            first = label
+            break
+        first = first if first is not None else label
+    if first is not None:
+        return BaseObject().coord2mm((first.get("x"), first.get("y")))
+    wire = next(elem.iter("wire"), None)
+    if wire is not None:
+        return BaseObject().coord2mm((wire.get("x1"), wire.get("y1")))
+    return None
+
+
+def scan_xrefs(source):
+    """
+    XrefIndex of every sheet of source, a filename or file object, which is left where it was
+    """
+    start = None if isinstance(source, str) else source.tell()
+    xrefs = XrefIndex()
+    path = []
+    frame = None
+    anchors = []
+    for event, elem in ElementTree.iterparse(source, events=("start", "end")):
+        if event == "start":
+            path.append(elem.tag)
+            continue
+        path.pop()
+        if path[2:] == ["schematic", "sheets", "sheet", "nets"]:
+            anchors.append((elem.get("name"), net_anchor(elem)))
+        elif path[2:] == ["schematic", "sheets", "sheet", "plain"] and elem.tag == "frame" and frame is None:
+            frame = Frame(element2dict(elem))
+        elif path[2:] == ["schematic", "sheets"]:
+            xrefs.add_anchors(len(xrefs.sheets) + 1, anchors, frame)
+            frame = None
+            anchors = []
+        if len(path) < 7:
+            # nothing deeper than a <net> is needed after its end tag
+            elem.clear()
+    if start is not None:
+        source.seek(start)
+    return xrefs
+
+
+def parse(source, on_sheet=None, library_cache=None, release_sheets=False):
+    """
+    parses an Eagle schematic incrementally and returns a populated Schematic.
+    on_sheet(schematic, sheet) is called as soon as the end tag of each sheet has been read,
+    when its xref labels can already be drawn, see Schematic.xref(); release_sheets: see Schematic
+    """
+    if on_sheet is None:
+        return StreamParser(on_sheet, library_cache, release_sheets).parse(source)
+    if isinstance(source, str) or source.seekable():
+        return StreamParser(on_sheet, library_cache, release_sheets, scan_xrefs(source)).parse(source)
+    # e.g. a pipe, which is read once into a temporary file
+    with tempfile.SpooledTemporaryFile(SPOOL_SIZE) as spooled:
+        shutil.copyfileobj(source, spooled)
+        spooled.seek(0)
+        return StreamParser(on_sheet, library_cache, release_sheets, scan_xrefs(spooled)).parse(spooled)
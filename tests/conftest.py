@@ -0,0 +1,31 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+EXAMPLE = os.path.join(DATA, "example.sch")
+
+
+@pytest.fixture
+def example():
+    """
+    two sheets: R1, R2 and C1 on the first, R3 on the second, net N$1 on both with an xref label
+    on each, a framed second sheet, a smashed R1 with a PARTNO attribute and a library symbol nothing uses
+    """
+    return EXAMPLE
+
+
+@pytest.fixture
+def example_copy(tmp_path):
+    """
+    the example in a directory of its own, for tests which change it
+    """
+    path = str(tmp_path / "example.sch")
+    shutil.copy(EXAMPLE, path)
+    return path
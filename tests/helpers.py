@@ -0,0 +1,62 @@
+"""
+reading the SVG the converter writes
+"""
+
+from xml.etree import ElementTree
+
+SVG = "{http://www.w3.org/2000/svg}"
+HREF = "{http://www.w3.org/1999/xlink}href"
+
+
+def parse(data):
+    """
+    root element of SVG bytes or text
+    """
+    return ElementTree.fromstring(data)
+
+
+def canonical(element, skip_defs=True):
+    """
+    (tag, attributes, text) of element and everything below it in document order;
+    attribute order and whitespace do not matter
+    """
+    rows = []
+    for child in element.iter():
+        if skip_defs and child.tag == SVG + "defs":
+            break
+        rows.append((child.tag, tuple(sorted(child.attrib.items())), (child.text or "").strip()))
+    return rows
+
+
+def body(root):
+    """
+    canonical() of everything outside <defs>
+    """
+    rows = []
+    for child in root:
+        if child.tag != SVG + "defs":
+            rows.extend(canonical(child))
+    return rows
+
+
+def definitions(root):
+    return [row for defs in root.iter(SVG + "defs") for child in defs for row in canonical(child, False)]
+
+
+def texts(root):
+    return [text.text for text in root.iter(SVG + "text")]
+
+
+def group(root, **attrs):
+    """
+    first <g> whose attributes include attrs; names use _ for -
+    """
+    wanted = {name.replace("_", "-"): value for name, value in attrs.items()}
+    for element in root.iter(SVG + "g"):
+        if all(element.get(name) == value for name, value in wanted.items()):
+            return element
+    return None
+
+
+def tags(element, tag):
+    return [child for child in element.iter(SVG + tag)]
@@ -0,0 +1,72 @@
+import os
+import shutil
+
+import pytest
+
+import batch
+
+
+@pytest.fixture
+def tree(tmp_path, example):
+    """
+    a/x.sch, b/x.sch and b/c/y.sch
+    """
+    for name in ("a/x.sch", "b/x.sch", "b/c/y.sch"):
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy(example, str(path))
+    return tmp_path
+
+
+def test_directories_are_named_below_themselves(tree):
+    jobs = batch.collect([str(tree / "b")])
+    assert [name for path, name in jobs] == ["x.sch", os.path.join("c", "y.sch")]
+
+
+def test_glob_matches_are_named_below_the_pattern(tree):
+    jobs = batch.collect([str(tree / "b" / "**" / "*.sch")])
+    assert sorted(name for path, name in jobs) == [os.path.join("c", "y.sch"), "x.sch"]
+    assert batch.glob_base("b/**/*.sch") == "b"
+    assert batch.glob_base("*.sch") == "."
+
+
+def test_files_of_the_same_name_are_told_apart(tree):
+    jobs = batch.collect([str(tree / "a" / "x.sch"), str(tree / "b" / "x.sch")])
+    assert [name for path, name in jobs] == [os.path.join("a", "x.sch"), os.path.join("b", "x.sch")]
+
+
+def test_duplicates_are_converted_once(tree):
+    path = str(tree / "a" / "x.sch")
+    assert batch.collect([path, path, str(tree / "a")]) == [(path, "x.sch")]
+
+
+def test_names_which_still_clash_are_an_error():
+    with pytest.raises(ValueError):
+        # both would be written to x.svg
+        batch.unique_names([("a/x.sch", "x.sch"), ("a/x.SCH", "x.SCH")])
+
+
+def test_manifest_paths_are_relative_to_it(tree):
+    manifest = tree / "list.txt"
+    manifest.write_text("# inputs\na/x.sch\n\nb/c/y.sch\n")
+    jobs = batch.collect(manifest=str(manifest))
+    assert [name for path, name in jobs] == ["x.sch", "y.sch"]
+
+
+def test_run_writes_every_output(tree, tmp_path):
+    jobs = batch.collect([str(tree / "a"), str(tree / "b")])
+    output = str(tmp_path / "out")
+    summary = batch.run(jobs, output, processes=1)
+    assert (summary["total"], summary["failed"]) == (3, 0)
+    assert sorted(os.path.relpath(result["output"], output) for result in summary["files"]) == \
+        sorted([os.path.join("a", "x.svg"), os.path.join("b", "x.svg"), os.path.join("c", "y.svg")])
+    assert all(os.path.getsize(result["output"]) for result in summary["files"])
+
+
+def test_failures_are_reported_not_raised(tmp_path):
+    broken = tmp_path / "broken.sch"
+    broken.write_text("<eagle>")
+    summary = batch.run([(str(broken), "broken.sch")], str(tmp_path / "out"), processes=1)
+    assert summary["failed"] == 1
+    assert "Error" in summary["files"][0]["error"]
+    assert not os.path.exists(summary["files"][0]["output"])
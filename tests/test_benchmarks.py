@@ -0,0 +1,29 @@
+import io
+
+import streamparser
+from converter import Converter
+from generate import Generator
+
+
+def generated(seed=0, **sizes):
+    f = io.StringIO()
+    Generator(seed=seed, **sizes).write(f)
+    return f.getvalue()
+
+
+def test_the_same_seed_gives_the_same_file():
+    assert generated(1) == generated(1)
+    assert generated(1) != generated(2)
+
+
+def test_generated_schematics_have_the_sizes_asked_for():
+    text = generated(sheets=3, instances=12, nets=5, texts=2)
+    schematic = streamparser.parse(io.BytesIO(text.encode("utf-8")))
+    assert len(schematic.sheets) == 3
+    assert [len(sheet.instances) for sheet in schematic.sheets] == [12, 12, 12]
+    assert [len(sheet.nets) for sheet in schematic.sheets] == [5, 5, 5]
+
+
+def test_generated_schematics_convert():
+    data = generated(sheets=2, instances=20, nets=10).encode("utf-8")
+    assert Converter(parser="stream").convert(data) == Converter(parser="dom").convert(data)
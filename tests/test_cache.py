@@ -0,0 +1,112 @@
+import os
+import re
+import time
+
+import eaglesch2svg
+from cache import LibraryCache, ResultCache
+from converter import Converter
+
+
+def test_result_cache_round_trip(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"))
+    output = tmp_path / "a.svg"
+    output.write_text("<svg/>")
+    key = cache.key(b"data", "1", {"css": False})
+    assert not cache.fetch(key, str(tmp_path / "b.svg"))
+    cache.store(key, str(output))
+    assert cache.fetch(key, str(tmp_path / "b.svg"))
+    assert (tmp_path / "b.svg").read_text() == "<svg/>"
+
+
+def test_result_keys_depend_on_data_version_and_options():
+    key = ResultCache.key(b"data", "1", {"css": False})
+    assert key == ResultCache.key(b"data", "1", {"css": False})
+    assert key != ResultCache.key(b"other", "1", {"css": False})
+    assert key != ResultCache.key(b"data", "2", {"css": False})
+    assert key != ResultCache.key(b"data", "1", {"css": True})
+
+
+def test_evict_drops_least_recently_used(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"), max_bytes=150)
+    output = tmp_path / "a.svg"
+    output.write_bytes(b"x" * 100)
+    cache.store("aa" * 32, str(output))
+    old = time.time() - 100
+    os.utime(cache.path("aa" * 32), (old, old))
+    cache.store("bb" * 32, str(output))
+    cache.evict()
+    assert not os.path.exists(cache.path("aa" * 32))
+    assert os.path.exists(cache.path("bb" * 32))
+
+
+def test_convert_reuses_cached_results(example, tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"))
+    output = str(tmp_path / "a.svg")
+    assert not eaglesch2svg.convert(example, output, cache=cache, search_index=True)
+    with open(output, "rb") as f:
+        svg = f.read()
+    os.remove(output)
+    os.remove(str(tmp_path / "a.search.json"))
+    assert eaglesch2svg.convert(example, output, cache=cache, search_index=True)
+    with open(output, "rb") as f:
+        assert f.read() == svg
+    assert os.path.exists(str(tmp_path / "a.search.json"))
+    # other options are another result
+    assert not eaglesch2svg.convert(example, output, cache=cache, css=True)
+
+
+def test_linked_results_are_not_overwritten(example, tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"), link=True)
+    output = str(tmp_path / "a.svg")
+    sidecar = str(tmp_path / "a.search.json")
+    eaglesch2svg.convert(example, output, cache=cache, search_index=True)
+    with open(output, "rb") as f:
+        svg = f.read()
+    with open(sidecar, "rb") as f:
+        index = f.read()
+    assert eaglesch2svg.convert(example, output, cache=cache, search_index=True)
+    assert os.stat(output).st_nlink == 2
+
+    # a miss writes the same files again
+    assert not eaglesch2svg.convert(example, output, cache=cache, search_index=True, merge_wires=True)
+    with open(output, "rb") as f:
+        assert f.read() != svg
+    assert eaglesch2svg.convert(example, output, cache=cache, search_index=True)
+    with open(output, "rb") as f:
+        assert f.read() == svg
+    with open(sidecar, "rb") as f:
+        assert f.read() == index
+
+
+def test_code_version_names_the_sources():
+    assert re.match(r"^\d+\.\d+\.\d+\+[0-9a-f]{16}$", eaglesch2svg.code_version())
+    assert eaglesch2svg.code_version().startswith(eaglesch2svg.__version__ + "+")
+
+
+def test_library_cache_round_trip(example, tmp_path):
+    directory = str(tmp_path / "libraries")
+    first = LibraryCache(directory, "1")
+    svg = Converter(library_cache=first).convert(example)
+    assert (first.hits, first.misses) == (0, 2)
+
+    second = LibraryCache(directory, "1")
+    assert Converter(library_cache=second).convert(example) == svg
+    assert (second.hits, second.misses) == (2, 0)
+
+    other = LibraryCache(directory, "2")
+    assert Converter(library_cache=other).convert(example) == svg
+    assert (other.hits, other.misses) == (0, 2)
+
+
+def test_unreadable_libraries_are_misses(example, tmp_path):
+    directory = str(tmp_path / "libraries")
+    Converter(library_cache=LibraryCache(directory, "1")).convert(example)
+    for root, dirs, files in os.walk(directory):
+        for name in files:
+            with open(os.path.join(root, name), "wb") as f:
+                f.write(b"not a library")
+
+    cache = LibraryCache(directory, "1")
+    svg = Converter(library_cache=cache).convert(example)
+    assert (cache.hits, cache.misses) == (0, 2)
+    assert svg == Converter().convert(example)
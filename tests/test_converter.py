@@ -0,0 +1,49 @@
+import io
+import threading
+
+from converter import Converter
+from helpers import parse, texts
+from output import Document
+from writer import StreamWriter
+
+
+def test_sources_give_the_same_svg(example):
+    converter = Converter()
+    svg = converter.convert(example)
+    with open(example, "rb") as f:
+        data = f.read()
+    assert converter.convert(data) == svg
+    assert converter.convert(io.BytesIO(data)) == svg
+    assert converter.stream(example).read() == svg
+
+
+def test_text_files_are_written_as_text(example):
+    f = io.StringIO()
+    Converter().write(example, f)
+    assert f.getvalue().encode("utf-8") == Converter().convert(example)
+
+
+def test_a_converter_is_used_again_with_the_same_result(example):
+    converter = Converter(merge_wires=True, css=True)
+    assert converter.convert(example) == converter.convert(example)
+
+
+def test_threads_share_a_converter(example):
+    converter = Converter()
+    expected = converter.convert(example)
+    results = [None] * 8
+
+    def convert(number):
+        results[number] = converter.convert(example)
+
+    threads = [threading.Thread(target=convert, args=(number,)) for number in range(len(results))]
+    [thread.start() for thread in threads]
+    [thread.join() for thread in threads]
+    assert results == [expected] * len(results)
+
+
+def test_run_returns_the_schematic(example):
+    f = io.StringIO()
+    schematic = Converter().run(example, Document(StreamWriter(f)))
+    assert [sheet.id for sheet in schematic.sheets] == ["sheet0", "sheet1"]
+    assert "N$1/1" in texts(parse(f.getvalue()))
@@ -0,0 +1,129 @@
+import json
+import os
+import socket
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+import daemon
+from cache import LibraryCache
+
+
+class Pool(object):
+    """
+    runs requests in the calling thread, in place of a multiprocessing pool
+    """
+
+    def apply(self, function, args):
+        return function(*args)
+
+
+@pytest.fixture
+def server():
+    daemon.init_worker({"library_cache": LibraryCache(None, "test")})
+    server = daemon.Server(("127.0.0.1", 0), Pool())
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield "http://127.0.0.1:{}".format(server.server_address[1])
+    server.shutdown()
+    server.server_close()
+    daemon.init_worker({})
+
+
+def post(url, obj):
+    request = urllib.request.Request(url, json.dumps(obj).encode("utf-8"), {"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as e:
+        return e.code, json.load(e)
+
+
+def test_parse_request():
+    request = daemon.parse_request(b'{"input": "a.sch", "output": "a.svg", "options": {"css": true}}')
+    assert request == {"input": "a.sch", "output": "a.svg", "options": {"css": True}}
+    assert daemon.parse_request(b'{"input": "a.sch", "output": "a.svg"}')["options"] == {}
+    for body in (b"[]", b'{"input": "a.sch"}', b'{"input": "a.sch", "output": "-"}',
+                 b'{"input": "a.sch", "output": "a.svg", "options": ["css"]}',
+                 b'{"input": "a.sch", "output": "a.svg", "options": {"cache": "/tmp"}}'):
+        with pytest.raises(ValueError):
+            daemon.parse_request(body)
+
+
+def test_parse_address():
+    assert daemon.parse_address("localhost:8080") == ("localhost", 8080)
+    assert daemon.parse_address(":8080") == ("127.0.0.1", 8080)
+    assert daemon.parse_address("/run/eaglesch2svg.sock") == "/run/eaglesch2svg.sock"
+
+
+def test_convert_and_metrics(server, example, tmp_path):
+    output = str(tmp_path / "a.svg")
+    status, result = post(server + "/convert", {"input": example, "output": output, "options": {"css": True}})
+    assert status == 200 and result["error"] is None
+    assert result["library_misses"] == 2
+    assert os.path.getsize(output)
+
+    status, result = post(server + "/convert", {"input": example, "output": output})
+    assert result["library_hits"] == 2 and result["library_misses"] == 0
+
+    status, result = post(server + "/convert", {"input": str(tmp_path / "missing.sch"), "output": output})
+    assert status == 500 and "FileNotFoundError" in result["error"]
+
+    status, result = post(server + "/convert", {"input": example})
+    assert status == 400
+
+    with urllib.request.urlopen(server + "/metrics") as response:
+        metrics = json.load(response)
+    assert (metrics["requests"], metrics["failed"]) == (3, 1)
+    assert metrics["libraries"] == {"hits": 2, "misses": 2, "hit_rate": 0.5}
+    assert metrics["latency"]["count"] == 3
+
+
+def test_metrics_window():
+    metrics = daemon.Metrics(window=2)
+    for latency in (1.0, 2.0, 3.0):
+        metrics.record({"error": None, "cached": latency > 2}, latency)
+    report = metrics.report()
+    assert report["requests"] == 3
+    assert report["results"]["hits"] == 1
+    assert report["latency"]["count"] == 2 and report["latency"]["max"] == 3.0
+    assert daemon.Metrics().report()["latency"]["mean"] is None
+
+
+def test_evict_periodically_runs_until_stopped():
+    class Cache(object):
+        evicted = 0
+
+        def evict(self):
+            self.evicted += 1
+            if self.evicted == 3:
+                stop.set()
+
+    cache = Cache()
+    stop = threading.Event()
+    thread = threading.Thread(target=daemon.evict_periodically, args=(cache, stop, 0.01))
+    thread.start()
+    thread.join(5)
+    assert not thread.is_alive()
+    # once more after stop is set
+    assert cache.evicted == 4
+
+
+def test_only_sockets_are_removed(tmp_path):
+    path = str(tmp_path / "service.sock")
+    with open(path, "w") as f:
+        f.write("not a socket")
+    with pytest.raises(ValueError):
+        daemon.serve(path, processes=1)
+    with open(path) as f:
+        assert f.read() == "not a socket"
+
+    os.remove(path)
+    left = socket.socket(socket.AF_UNIX)
+    left.bind(path)
+    left.close()
+    daemon.remove_socket(path)
+    assert not os.path.exists(path)
+    daemon.remove_socket(path)
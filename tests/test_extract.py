@@ -0,0 +1,38 @@
+import io
+import json
+
+import extract
+import streamparser
+
+
+def test_parts_and_values_match_the_drawing(example):
+    metadata = extract.extract(example)
+    schematic = streamparser.parse(example)
+    assert [part["name"] for part in metadata["parts"]] == list(schematic.parts)
+    values = {part["name"]: part["value"] for part in metadata["parts"]}
+    assert values == {"R1": "10k", "R2": "4k7", "R3": "1k", "C1": "C-EU025-024X044", "GND1": "GND", "GND2": "GND"}
+    r1 = metadata["parts"][0]
+    assert (r1["library"], r1["deviceset"], r1["device"], r1["prefix"]) == ("rcl", "R-EU_", "0204/7", "R")
+
+
+def test_nets_match_connectivity(example):
+    metadata = extract.extract(example)
+    connectivity = streamparser.parse(example).connectivity
+    assert set(metadata["nets"]) == {"N$1", "GND"}
+    for name, net in metadata["nets"].items():
+        assert sorted(tuple(pin) for pin in net["pins"]) == sorted(connectivity.pins(name))
+        assert net["sheets"] == [1, 2]
+
+
+def test_write_is_json(example, tmp_path, capsys):
+    metadata = extract.extract(example)
+    output = tmp_path / "a.json"
+    extract.write(metadata, str(output))
+    assert json.loads(output.read_text()) == json.loads(json.dumps(metadata))
+    extract.write(metadata, "-")
+    assert json.loads(capsys.readouterr().out) == json.loads(output.read_text())
+
+
+def test_file_objects_are_read(example):
+    with open(example, "rb") as f:
+        assert extract.extract(io.BytesIO(f.read())) == extract.extract(example)
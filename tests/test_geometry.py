@@ -0,0 +1,74 @@
+import math
+
+import pytest
+
+import geometry
+import spatial
+
+TRANSFORMS = [
+    [("translate", 10.5, -3.25), ("rotate", 90, 0, 0)],
+    [("rotate", 30, 1, 2), ("scale", -1, 1)],
+    [("matrix", 0.5, 0.1, -0.2, 2.0, 3.0, 4.0)],
+]
+BOXES = [(0, 0, 1, 2), (-3.5, 1.25, 4, 8), (2, 2, 2, 2)]
+
+
+def test_convert_scales_and_rounds():
+    assert geometry.convert([(1.27, -2.54), (0.1234567, 0)]) == [(12.7, -25.4), (1.23457, 0.0)]
+    assert geometry.convert([]) == []
+
+
+def test_quarter_turns_are_exact():
+    assert geometry.cos_sin(90) == (0.0, 1.0)
+    assert geometry.cos_sin(-90) == (0.0, -1.0)
+    assert geometry.cos_sin(30) == pytest.approx((math.sqrt(3) / 2, 0.5))
+    assert geometry.ROTATIONS["MSR270"] == (True, True, 270)
+
+
+def test_arc_radii():
+    assert geometry.arc_radii([(2, 0), (3, 4), (1, 1)], [180, 90, 0]) == \
+        pytest.approx([1.0, 5 / math.sqrt(2), 0.0])
+
+
+def test_transform_boxes_match_transform_box():
+    matrices = [spatial.matrix(transform) for transform in TRANSFORMS]
+    expected = [spatial.transform_box(box, transform) for box, transform in zip(BOXES, TRANSFORMS)]
+    assert geometry.transform_boxes(BOXES, matrices) == pytest.approx(expected)
+
+
+def test_numpy_gives_the_same_floats(monkeypatch):
+    pytest.importorskip("numpy")
+    rows = [(i * 0.127, -i * 2.54321) for i in range(100)]
+    boxes = BOXES * 20
+    matrices = [spatial.matrix(transform) for transform in TRANSFORMS] * 20
+    chords, curves = [(i + 1.0, i * 0.5) for i in range(60)], [(i * 7) % 181 for i in range(60)]
+    vectorized = geometry.convert(rows), geometry.transform_boxes(boxes, matrices), geometry.arc_radii(chords, curves)
+    monkeypatch.setattr(geometry, "numpy", None)
+    plain = geometry.convert(rows), geometry.transform_boxes(boxes, matrices), geometry.arc_radii(chords, curves)
+    assert vectorized[0] == plain[0]
+    assert vectorized[1] == pytest.approx(plain[1])
+    assert vectorized[2] == pytest.approx(plain[2])
+
+
+def test_batch_initialises_what_it_handed_out():
+    from schematic import Junction, Wire
+    wires = [{"@x1": "0", "@y1": "0", "@x2": "2.54", "@y2": "0", "@width": "0.1524", "@layer": "91",
+              "@curve": "90"}]
+    junctions = [{"@x": "1.27", "@y": "-2.54"}, {"@x": "0", "@y": "0"}]
+    batch = geometry.Batch()
+    batched = Wire.many(wires, batch) + Junction.many(junctions, batch)
+    batch.run()
+    assert [vars(obj) for obj in batched] == [vars(obj) for obj in Wire.many(wires) + Junction.many(junctions)]
+    assert batch.pending == {}
+
+
+def test_a_sheet_converts_its_wires_together(example, monkeypatch):
+    import streamparser
+    from schematic import Wire
+    sizes = []
+    batch = Wire.batch
+    monkeypatch.setattr(Wire, "batch", staticmethod(lambda objs: sizes.append(len(objs)) or batch(objs)))
+    for sheet in streamparser.parse(example).sheets:
+        wires = [wire for net in sheet.nets for segment in net.segments for wire in segment.wires]
+        wires += sheet.plain.wires if sheet.plain is not None else []
+        assert len(wires) in sizes
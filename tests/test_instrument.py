@@ -0,0 +1,66 @@
+import json
+import sys
+
+import pytest
+
+import eaglesch2svg
+import instrument
+from converter import Converter
+from instrument import Instrumentation
+
+
+def test_nothing_is_recorded_unless_activated(example):
+    assert instrument.current() is None
+    Converter().convert(example)
+    assert instrument.current() is None
+
+
+def test_phases_and_elements_are_recorded(example, tmp_path):
+    events = []
+    with instrument.activate(Instrumentation(callback=lambda *event: events.append(event[:2]))) as stats:
+        assert instrument.current() is stats
+        Converter().convert(example)
+    assert instrument.current() is None
+
+    report = stats.report()
+    assert {"parse", "library", "populate", "serialize"} <= set(report["phases"])
+    elements = report["elements"]
+    assert elements["Instance"]["count"] == 6
+    assert elements["Part"]["count"] == 6
+    assert elements["Sheet"]["count"] == 2
+    assert elements["Library"]["count"] == 2
+    assert all(element["self_time"] <= element["time"] for element in elements.values())
+    assert ("element", "Instance") in events and ("phase", "parse") in events
+
+    stats.dump(str(tmp_path / "stats.json"))
+    assert (tmp_path / "stats.json").read_text().startswith("{")
+
+
+def test_phase_times_are_exclusive():
+    stats = Instrumentation()
+    with instrument.activate(stats):
+        with instrument.phase("outer"):
+            with instrument.phase("inner"):
+                sum(range(100000))
+    assert set(stats.phases) == {"outer", "inner"}
+    assert stats.phases["outer"] < stats.phases["inner"]
+
+
+def test_stats_cover_extraction(example, tmp_path, monkeypatch):
+    stats = str(tmp_path / "stats.json")
+    monkeypatch.setattr(sys, "argv", ["eaglesch2svg", "-I", example, "-O", str(tmp_path / "a.json"), "--extract",
+                                      "--stats", stats])
+    eaglesch2svg.main()
+    with open(stats) as f:
+        report = json.load(f)
+    assert "parse" in report["phases"]
+    assert report["elements"]["Part"]["count"] == 6
+
+
+@pytest.mark.parametrize("mode", [["--batch", "a.sch"], ["--manifest", "list.txt"], ["--serve", ":8080"]])
+def test_stats_are_refused_for_worker_processes(mode, tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(sys, "argv", ["eaglesch2svg", "--stats", str(tmp_path / "stats.json")] + mode)
+    with pytest.raises(SystemExit):
+        eaglesch2svg.main()
+    assert "--stats" in capsys.readouterr().err
+    assert not (tmp_path / "stats.json").exists()
@@ -0,0 +1,39 @@
+import streamparser
+from cache import LibraryCache
+from helpers import HREF, SVG, parse, tags
+from converter import Converter
+
+
+def test_only_symbols_and_devicesets_in_use_are_built(example):
+    schematic = streamparser.parse(example)
+    rcl = schematic.libraries["rcl"]
+    assert "UNUSED" in rcl.symbols and "UNUSED" in rcl.devicesets
+    assert sorted(rcl.symbols.built) == ["C-EU", "R-EU"]
+    assert sorted(rcl.devicesets.built) == ["C-EU", "R-EU_"]
+    assert rcl.built() == 4
+
+
+def test_every_symbol_and_mirror_is_defined_once(example):
+    root = parse(Converter().convert(example))
+    ids = [group.get("id") for defs in tags(root, "defs") for group in defs]
+    assert ids == ["rcl.R-EU-shape", "rcl.R-EU", "rcl.C-EU-shape", "rcl.C-EUF", "supply.GND-shape", "supply.GND",
+                   "rcl.R-EUF"]
+    # the mirrored definition only refers to the shape
+    mirrored = next(group for group in root.iter(SVG + "g") if group.get("id") == "rcl.C-EUF")
+    assert [use.get(HREF) for use in tags(mirrored, "use")] == ["#rcl.C-EU-shape"]
+
+
+def test_instances_refer_to_their_definitions(example):
+    root = parse(Converter().convert(example))
+    refs = [use.get(HREF) for use in tags(root, "use")]
+    assert refs.count("#rcl.R-EU") == 2 and refs.count("#rcl.R-EUF") == 1
+    assert refs.count("#rcl.C-EUF") == 1 and refs.count("#supply.GND") == 2
+
+
+def test_library_cache_reuses_built_libraries(example):
+    cache = LibraryCache(None, "test")
+    first = Converter(library_cache=cache).convert(example)
+    assert (cache.hits, cache.misses) == (0, 2)
+    second = Converter(library_cache=cache).convert(example)
+    assert (cache.hits, cache.misses) == (2, 2)
+    assert first == second
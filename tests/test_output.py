@@ -0,0 +1,83 @@
+import gzip
+import json
+import os
+
+import eaglesch2svg
+from converter import Converter
+from helpers import HREF, SVG, body, parse, tags, texts
+
+
+def read(path):
+    opener = gzip.open if path.endswith(".svgz") else open
+    with opener(path, "rb") as f:
+        return parse(f.read())
+
+
+def count(rows, tag):
+    return sum(1 for row in rows if row[0] == SVG + tag)
+
+
+def test_per_sheet_writes_a_file_and_index_entry_per_sheet(example, tmp_path):
+    directory = str(tmp_path / "out")
+    eaglesch2svg.convert(example, directory, per_sheet=True)
+    assert sorted(os.listdir(directory)) == ["index.html", "index.json", "sheet0.svg", "sheet1.svg"]
+    with open(os.path.join(directory, "index.json")) as f:
+        index = json.load(f)
+    assert index["title"] == "example"
+    assert [(sheet["id"], sheet["file"], sheet["instances"], sheet["nets"]) for sheet in index["sheets"]] == \
+        [("sheet0", "sheet0.svg", 4, 2), ("sheet1", "sheet1.svg", 2, 2)]
+
+
+def test_per_sheet_files_define_only_the_symbols_they_use(example, tmp_path):
+    directory = str(tmp_path / "out")
+    eaglesch2svg.convert(example, directory, per_sheet=True)
+    ids = {}
+    for sheet in ("sheet0", "sheet1"):
+        root = read(os.path.join(directory, sheet + ".svg"))
+        ids[sheet] = {group.get("id") for defs in tags(root, "defs") for group in defs}
+        refs = {use.get(HREF)[1:] for use in tags(root, "use")}
+        assert refs <= ids[sheet]
+    assert ids["sheet1"] == {"rcl.R-EU-shape", "rcl.R-EUF", "supply.GND-shape", "supply.GND"}
+
+
+def test_per_sheet_xref_labels_name_the_other_sheet(example, tmp_path):
+    directory = str(tmp_path / "out")
+    eaglesch2svg.convert(example, directory, per_sheet=True, svgz=True)
+    assert "N$1/2.3D" in texts(read(os.path.join(directory, "sheet0.svgz")))
+    assert "N$1/1" in texts(read(os.path.join(directory, "sheet1.svgz")))
+
+
+def test_tiles_cover_every_level(example, tmp_path):
+    directory = str(tmp_path / "out")
+    eaglesch2svg.convert(example, directory, tiles=2)
+    with open(os.path.join(directory, "tiles.json")) as f:
+        manifest = json.load(f)
+    assert manifest["defs"] == "defs.svg"
+    for sheet in manifest["sheets"]:
+        assert [level["level"] for level in sheet["levels"]] == [0, 1]
+        assert len(sheet["levels"][0]["tiles"]) == 1
+        for level in sheet["levels"]:
+            for tile in level["tiles"]:
+                root = read(os.path.join(directory, *tile["file"].split("/")))
+                assert tile["objects"] > 0
+                assert all(use.get(HREF).startswith("../../defs.svg#") for use in tags(root, "use"))
+    defs = read(os.path.join(directory, "defs.svg"))
+    assert len([group for group in tags(defs, "defs")[0]]) == 7
+
+
+def test_tiles_hold_only_what_they_show(example, tmp_path):
+    directory = str(tmp_path / "out")
+    eaglesch2svg.convert(example, directory, tiles=2)
+    whole = read(os.path.join(directory, "sheet0", "0", "0_0.svg"))
+    quarters = [read(os.path.join(directory, "sheet0", "1", name))
+                for name in os.listdir(os.path.join(directory, "sheet0", "1"))]
+    assert all(len(tags(quarter, "use")) < len(tags(whole, "use")) for quarter in quarters)
+
+
+def test_flatten_leaves_out_use_and_defs(example):
+    flat = parse(Converter(flatten=True).convert(example))
+    assert not tags(flat, "use") and not tags(flat, "defs")
+    normal = parse(Converter().convert(example))
+    # every symbol drawn in place: its texts and shapes all appear
+    assert sorted(texts(flat)) == sorted(texts(normal))
+    assert count(body(flat), "line") > count(body(normal), "line")
@@ -0,0 +1,136 @@
+import pytest
+
+import streamparser
+from converter import Converter
+from helpers import group, parse, tags, texts
+from schematic import XrefIndex
+
+
+def without(path, line):
+    with open(path) as f:
+        text = f.read()
+    assert line in text
+    with open(path, "w") as f:
+        f.write(text.replace(line, ""))
+
+
+def test_merged_wires_are_one_path(example):
+    separate = parse(Converter().convert(example))
+    merged = parse(Converter(merge_wires=True).convert(example))
+    assert len(tags(separate, "line")) - len(tags(merged, "line")) == 5
+    net = group(merged, data_net="N$1")
+    assert [path.get("d") for path in tags(net, "path")] == \
+        ["M254.0 406.4 L304.8 406.4 L304.8 304.8 L406.4 304.8 L406.4 355.6"]
+    # the branch off the chain is still a line and the junction is still drawn
+    assert len(tags(net, "line")) == 1 and len(tags(net, "circle")) == 1
+
+
+def test_connectivity_looks_up_nets_and_pins(example):
+    connectivity = streamparser.parse(example).connectivity
+    assert connectivity.net("R1", "G$1", "2") == "N$1"
+    assert connectivity.net("R3", "G$1", "2") == "GND"
+    assert connectivity.net("R1", "G$1", "1") is None
+    assert sorted(connectivity.pins("N$1")) == [("R1", "G$1", "2"), ("R2", "G$1", "1"), ("R3", "G$1", "1")]
+    assert sorted(connectivity.pins("GND")) == [("C1", "G$1", "2"), ("GND1", "1", "GND"), ("GND2", "1", "GND"),
+                                                ("R3", "G$1", "2")]
+
+
+def test_connectivity_forgets_a_replaced_sheet(example):
+    schematic = streamparser.parse(example)
+    connectivity = schematic.connectivity
+    connectivity.remove_sheet("sheet1")
+    assert connectivity.net("R3", "G$1", "1") is None
+    assert sorted(connectivity.pins("N$1")) == [("R1", "G$1", "2"), ("R2", "G$1", "1")]
+    connectivity.add_sheet(schematic.sheets[1])
+    assert connectivity.net("R3", "G$1", "1") == "N$1"
+
+
+def test_junctions_are_inferred_where_the_file_has_none(example_copy):
+    without(example_copy, '<junction x="30.48" y="40.64"/>')
+    sheet = streamparser.parse(example_copy).sheets[0]
+    segment, = next(net for net in sheet.nets if net.name == "N$1").segments
+    assert segment.junctions == []
+    added = segment.infer_junctions()
+    assert [junction.center for junction in added] == [pytest.approx((304.8, 406.4))]
+    assert segment.infer_junctions() == []
+
+
+def test_junctions_in_the_file_are_not_doubled(example):
+    sheet = streamparser.parse(example).sheets[0]
+    assert all(segment.infer_junctions() == [] for net in sheet.nets for segment in net.segments)
+
+
+def test_inferred_junctions_are_drawn(example_copy):
+    without(example_copy, '<junction x="30.48" y="40.64"/>')
+    plain = parse(Converter().convert(example_copy))
+    inferred = parse(Converter(infer_junctions=True).convert(example_copy))
+    assert len(tags(group(plain, data_net="N$1"), "circle")) == 0
+    assert len(tags(group(inferred, data_net="N$1"), "circle")) == 1
+
+
+def test_xref_labels_name_the_next_sheet_and_frame_cell(example):
+    labels = texts(parse(Converter().convert(example)))
+    assert "N$1/2.3D" in labels
+    assert "N$1/1" in labels
+
+
+def test_xref_label_format_is_the_schematic_s(example_copy):
+    with open(example_copy) as f:
+        text = f.read()
+    with open(example_copy, "w") as f:
+        f.write(text.replace('xreflabel="%F%N/%S.%C%R"', 'xreflabel="%N:%S%C%R"'))
+    assert "N$1:23D" in texts(parse(Converter().convert(example_copy)))
+
+
+def test_frame_cells_are_lettered_from_the_top(example):
+    frame = streamparser.parse(example).sheets[1].plain.frames[0]
+    xmin, ymin, xmax, ymax = frame.box
+    assert frame.cell((xmin + 1, ymax - 1)) == ("1", "A")
+    assert frame.cell((xmax - 1, ymin + 1)) == ("8", "E")
+    assert frame.cell((xmax + 1, ymin + 1)) is None
+
+
+def test_xref_index_goes_round_to_the_first_sheet():
+    class Net(object):
+        def __init__(self, name):
+            self.name = name
+
+        def anchor(self):
+            return None
+
+    class Sheet(object):
+        plain = None
+
+        def __init__(self, *names):
+            self.nets = [Net(name) for name in names]
+
+    xrefs = XrefIndex()
+    xrefs.add_sheet(Sheet("A", "B"), 1)
+    xrefs.add_sheet(Sheet("A"), 2)
+    xrefs.add_sheet(Sheet("A"), 3)
+    assert xrefs.next("A", 1) == (2, None)
+    assert xrefs.next("A", 3) == (1, None)
+    assert xrefs.next("B", 1) is None
+    assert xrefs.label("%F%N/%S.%C%R", "A", 3) == "A/1"
+    assert xrefs.label("%F%N/%S.%C%R", "B", 1) == "B"
+    xrefs.remove_sheet(1)
+    assert xrefs.next("A", 3) == (2, None)
+
+
+def test_attributes_are_drawn_with_their_part_values(example):
+    assert "PARTNO = ABC-123" in texts(parse(Converter().convert(example)))
+    instance = next(instance for instance in streamparser.parse(example).sheets[0].instances
+                    if instance.part.name == "R1")
+    partno = next(attribute for attribute in instance.attributes if attribute.name == "PARTNO")
+    assert instance.attribute_value(partno) == "ABC-123"
+    assert instance.part.attributes == {"PARTNO": "ABC-123"}
+
+
+def test_attributes_displayed_off_are_not_drawn(example_copy):
+    with open(example_copy) as f:
+        text = f.read()
+    with open(example_copy, "w") as f:
+        f.write(text.replace('layer="96" display="both"/>', 'layer="96" display="off"/>'))
+    drawn = texts(parse(Converter().convert(example_copy)))
+    assert not any("PARTNO" in text or "ABC-123" in text for text in drawn)
+    assert all(drawn)
@@ -0,0 +1,54 @@
+import json
+import os
+
+import eaglesch2svg
+import search
+
+
+def index(example, tmp_path, **options):
+    output = str(tmp_path / "a.svg")
+    eaglesch2svg.convert(example, output, search_index=True, **options)
+    with open(str(tmp_path / "a.search.json")) as f:
+        return json.load(f)
+
+
+def rows(index, table, *fields):
+    columns = [index["fields"][table].index(field) for field in fields]
+    return sorted(tuple(row[column] for column in columns) for row in index[table])
+
+
+def test_sidecar_names():
+    assert search.sidecar(os.path.join("out", "a.svg")) == os.path.join("out", "a.search.json")
+    assert search.sidecar("out", directory=True) == os.path.join("out", "search.json")
+    assert search.sidecar("-") is None
+
+
+def test_parts_nets_and_texts_are_listed_with_their_sheets(example, tmp_path):
+    found = index(example, tmp_path)
+    assert [sheet["id"] for sheet in found["sheets"]] == ["sheet0", "sheet1"]
+    assert rows(found, "parts", "name", "value", "sheet") == [
+        ("C1", "C-EU025-024X044", 0), ("GND1", "GND", 0), ("GND2", "GND", 1), ("R1", "10k", 0), ("R2", "4k7", 0),
+        ("R3", "1k", 1)]
+    assert rows(found, "nets", "name", "sheet") == [("GND", 0), ("GND", 1), ("N$1", 0), ("N$1", 1)]
+    assert ("Sheet one", 0) in rows(found, "texts", "text", "sheet")
+    assert all(row[-1] >= 0 and row[-2] >= 0 for table in search.FIELDS for row in found[table])
+
+
+def test_attributes_are_listed_with_their_part_values(example, tmp_path):
+    found = index(example, tmp_path)
+    assert rows(found, "attributes", "part", "name", "value", "sheet") == [("R1", "PARTNO", "ABC-123", 0)]
+
+
+def test_connectivity_is_listed(example, tmp_path):
+    connectivity = index(example, tmp_path)["connectivity"]
+    assert sorted(map(tuple, connectivity["N$1"]["pins"])) == [("R1", "G$1", "2"), ("R2", "G$1", "1"),
+                                                             ("R3", "G$1", "1")]
+    assert connectivity["GND"]["ports"] == []
+
+
+def test_per_sheet_index_is_in_the_directory(example, tmp_path):
+    directory = str(tmp_path / "out")
+    eaglesch2svg.convert(example, directory, per_sheet=True, search_index=True)
+    with open(os.path.join(directory, "search.json")) as f:
+        found = json.load(f)
+    assert rows(found, "parts", "name", "sheet")[-1] == ("R3", 1)
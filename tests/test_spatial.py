@@ -0,0 +1,56 @@
+import io
+
+import pytest
+
+import spatial
+import streamparser
+from converter import Converter
+from output import Document
+from spatial import GridIndex
+from writer import StreamWriter
+
+
+def test_transforms_apply_right_to_left():
+    m = spatial.matrix([("translate", 10, 0), ("rotate", 90, 0, 0)])
+    assert spatial.apply(m, (1, 0)) == pytest.approx((10, 1))
+    assert spatial.transform_box((0, 0, 2, 1), [("scale", -1, 1)]) == (-2, 0, 0, 1)
+
+
+def test_arc_box_covers_the_bulge():
+    # a half circle from (0, 0) to (2, 0) reaches one unit to the side
+    xmin, ymin, xmax, ymax = spatial.arc_box((0, 0), (2, 0), 180)
+    assert (xmin, xmax) == pytest.approx((0, 2))
+    assert ymax - ymin == pytest.approx(1)
+
+
+def test_grid_index_lookups():
+    index = GridIndex(cell=10)
+    index.insert((0, 0, 5, 5), "part", "A")
+    index.insert((20, 20, 45, 25), "net", "B")
+    index.insert(None, "plain")
+    assert [name for box, kind, name, obj in index.at(3, 3)] == ["A"]
+    assert [name for box, kind, name, obj in index.at(40, 22)] == ["B"]
+    assert index.at(10, 10) == []
+    assert [name for box, kind, name, obj in index.within((4, 4, 21, 21))] == ["A", "B"]
+    assert index.bounds == (0, 0, 45, 25)
+    assert index.viewbox(margin=1) == (-1, -1, 47, 27)
+    assert GridIndex().viewbox(default=(0, 0, 1, 1)) == (0, 0, 1, 1)
+
+
+def test_sheets_index_what_they_draw(example):
+    schematic = streamparser.parse(example)
+    index = schematic.sheets[0].index
+    kinds = {}
+    for box, kind, name, obj in index.entries:
+        kinds.setdefault(kind, set()).add(name)
+    assert kinds["net"] == {"N$1", "GND"}
+    assert kinds["part"] == {"R1", "R2", "C1", "GND1"}
+    # the junction of N$1
+    assert {name for box, kind, name, obj in index.at(304.8, -406.4)} == {"N$1"}
+    assert schematic.sheets[0].viewbox((0, 0, 1, 1)) == spatial.viewbox(index.bounds)
+
+
+def test_converted_sheets_keep_their_index(example):
+    schematic = Converter().run(example, Document(StreamWriter(io.StringIO())))
+    index = schematic.sheets[1].index
+    assert {name for box, kind, name, obj in index.within(index.bounds) if kind == "part"} == {"R3", "GND2"}
@@ -0,0 +1,69 @@
+import io
+
+from converter import Converter
+from output import Document
+import streamparser
+from streamparser import element2dict
+from xml.etree import ElementTree
+
+import xmltodict
+
+
+def test_element2dict_matches_xmltodict():
+    text = '<net name="N$1"><segment><pinref part="R1" gate="G$1" pin="1"/><wire x1="0" y1="0" x2="1" y2="0"/>' \
+           '<wire x1="1" y1="0" x2="1" y2="1"/></segment></net>'
+    assert element2dict(ElementTree.fromstring(text)) == xmltodict.parse(text)["net"]
+
+
+def test_stream_and_dom_parsers_draw_the_same(example):
+    assert Converter(parser="stream").convert(example) == Converter(parser="dom").convert(example)
+
+
+def test_sheets_are_handed_out_in_order_as_they_are_read(example):
+    seen = []
+    schematic = streamparser.parse(example, lambda schematic, sheet: seen.append((sheet.id, len(sheet.instances))))
+    assert seen == [("sheet0", 4), ("sheet1", 2)]
+    assert [sheet.id for sheet in schematic.sheets] == ["sheet0", "sheet1"]
+
+
+def test_converted_sheets_are_released_once_drawn(example):
+    class Layout(Document):
+        def __call__(self, schematic, sheet):
+            assert sheet.instances and sheet.index is not None
+            super().__call__(schematic, sheet)
+
+    from writer import StreamWriter
+    layout = Layout(StreamWriter(io.StringIO()))
+    schematic = Converter(release_sheets=True).run(example, layout)
+    for sheet in schematic.sheets:
+        assert sheet.instances == [] and sheet.nets == [] and sheet.index is None
+    # what later lookups need is kept
+    assert schematic.connectivity.net("R3", "G$1", "1") == "N$1"
+
+
+def test_sheets_are_kept_without_release(example):
+    schematic = streamparser.parse(example)
+    assert all(sheet.instances for sheet in schematic.sheets)
+
+
+def test_xrefs_are_scanned_ahead_of_the_sheets(example):
+    assert streamparser.scan_xrefs(example).nets == streamparser.parse(example).xrefs.nets
+    labels = []
+    streamparser.parse(example, lambda schematic, sheet: labels.append(schematic.xref(sheet)("N$1")))
+    assert labels == ["N$1/2.3D", "N$1/1"]
+
+
+def test_sources_read_once_are_scanned_too(example):
+    class Pipe(io.RawIOBase):
+        def __init__(self, data):
+            self.data = io.BytesIO(data)
+
+        def readable(self):
+            return True
+
+        def readinto(self, buffer):
+            return self.data.readinto(buffer)
+
+    with open(example, "rb") as f:
+        data = f.read()
+    assert Converter().convert(Pipe(data)) == Converter().convert(data)
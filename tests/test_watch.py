@@ -0,0 +1,99 @@
+import io
+
+import pytest
+
+from converter import Converter
+from helpers import body, parse, texts
+from output import Document
+from watch import Watcher
+from writer import StreamWriter
+
+
+def edit(path, old, new):
+    with open(path) as f:
+        text = f.read()
+    assert old in text
+    with open(path, "w") as f:
+        f.write(text.replace(old, new))
+
+
+def draw(schematic):
+    f = io.StringIO()
+    document = Document(StreamWriter(f))
+    document.begin()
+    [document(schematic, sheet) for sheet in schematic.sheets]
+    document.end(schematic)
+    return parse(f.getvalue())
+
+
+def test_first_update_builds_everything(example):
+    watcher = Watcher(example)
+    assert watcher.changed()
+    assert [sheet.id for sheet in watcher.update()] == ["sheet0", "sheet1"]
+    assert not watcher.changed()
+    assert watcher.update() == []
+    assert body(draw(watcher.schematic)) == body(parse(Converter().convert(example)))
+
+
+def test_only_changed_sheets_are_rebuilt(example_copy):
+    edit(example_copy, ' xref="yes"', "")
+    watcher = Watcher(example_copy)
+    watcher.update()
+    first = watcher.schematic.sheets[0]
+
+    edit(example_copy, '<part name="R3" library="rcl" deviceset="R-EU_" device="0204/7" value="1k"/>',
+         '<part name="R3" library="rcl" deviceset="R-EU_" device="0204/7" value="2k2"/>')
+    assert [sheet.id for sheet in watcher.update()] == ["sheet1"]
+    assert watcher.schematic.sheets[0] is first
+    drawn = draw(watcher.schematic)
+    assert "2k2" in texts(drawn)
+    assert body(drawn) == body(parse(Converter().convert(example_copy)))
+
+
+def test_changed_libraries_rebuild_the_sheets_using_them(example_copy):
+    edit(example_copy, ' xref="yes"', "")
+    watcher = Watcher(example_copy)
+    watcher.update()
+    edit(example_copy, '<deviceset name="C-EU" prefix="C">', '<deviceset name="C-EU" prefix="CX">')
+    # R3 on the second sheet is of that library too
+    assert [sheet.id for sheet in watcher.update()] == ["sheet0", "sheet1"]
+    assert body(draw(watcher.schematic)) == body(parse(Converter().convert(example_copy)))
+
+
+def test_sheets_with_xrefs_to_a_changed_sheet_are_redrawn(example_copy):
+    watcher = Watcher(example_copy)
+    watcher.update()
+    edit(example_copy, '<label x="63.5" y="63.5" size="1.778" layer="95" xref="yes" rot="R0"/>',
+         '<label x="200" y="20" size="1.778" layer="95" xref="yes" rot="R0"/>')
+    assert [sheet.id for sheet in watcher.update()] == ["sheet0", "sheet1"]
+    assert "N$1/2.7E" in texts(draw(watcher.schematic))
+
+
+def test_removed_sheets_are_dropped(example_copy):
+    watcher = Watcher(example_copy)
+    watcher.update()
+    with open(example_copy) as f:
+        text = f.read()
+    start = text.index("<sheet>", text.index("</sheet>"))
+    end = text.index("</sheet>", start) + len("</sheet>")
+    with open(example_copy, "w") as f:
+        f.write(text[:start] + text[end:])
+    # sheet0 names N$1 on sheet 2 in its xref label
+    assert [sheet.id for sheet in watcher.update()] == ["sheet0"]
+    assert len(watcher.schematic.sheets) == 1
+    assert watcher.schematic.connectivity.net("R3", "G$1", "1") is None
+    assert "N$1" in texts(draw(watcher.schematic))
+
+
+def test_a_broken_file_rebuilds_everything_next_time(example_copy):
+    watcher = Watcher(example_copy)
+    watcher.update()
+    with open(example_copy) as f:
+        text = f.read()
+    with open(example_copy, "w") as f:
+        f.write(text[:len(text) // 2])
+    with pytest.raises(Exception):
+        watcher.update()
+    with open(example_copy, "w") as f:
+        f.write(text)
+    assert len(watcher.update()) == 2
@@ -0,0 +1,124 @@
+import gzip
+import io
+
+import eaglesch2svg
+from converter import Converter
+from helpers import body, definitions, parse, tags
+from output import VIEWBOX
+from writer import StreamWriter, StyleSheet
+
+
+def viewbox(root):
+    return tuple(float(value) for value in root.get("viewBox").split(","))
+
+
+def test_stream_and_svgwrite_backends_draw_the_same(example):
+    stream = parse(Converter(backend="stream").convert(example))
+    drawing = parse(Converter(backend="svgwrite").convert(example))
+    assert body(stream) == body(drawing)
+    assert definitions(stream) == definitions(drawing)
+    assert len(body(stream)) == 55
+
+
+def test_viewbox_fits_the_drawing(example):
+    root = parse(Converter().convert(example))
+    x, y, width, height = viewbox(root)
+    assert (x, y, width, height) != VIEWBOX
+    assert width > 0 and height > 0
+
+
+def test_viewbox_is_rewritten_in_place():
+    f = io.StringIO()
+    writer = StreamWriter(f)
+    writer.begin(VIEWBOX)
+    writer.end()
+    assert writer.set_viewbox((1, 2, 3, 4))
+    assert parse(f.getvalue()).get("viewBox") == "1,2,3,4"
+    assert not StreamWriter(io.StringIO(), rewritable=False).set_viewbox((1, 2, 3, 4))
+
+
+def test_css_writes_each_style_once(example):
+    plain = parse(Converter().convert(example))
+    styled = parse(Converter(css=True).convert(example))
+    style = tags(styled, "style")
+    assert len(style) == 1
+    rules = style[0].text.strip().splitlines()
+    assert len(rules) == len(set(rules))
+    assert all(element.get("class") for element in tags(styled, "line"))
+    assert not any(element.get("stroke") for element in tags(styled, "line"))
+    assert len(tags(styled, "line")) == len(tags(plain, "line"))
+
+
+def test_stylesheet_names_styles_in_order_of_first_use():
+    stylesheet = StyleSheet()
+    assert stylesheet.name({"stroke": "#000", "stroke-width": 1.5}) == "s0"
+    assert stylesheet.name({"fill": "none"}) == "s1"
+    assert stylesheet.name({"stroke": "#000", "stroke-width": 1.5}) == "s0"
+    assert stylesheet.css() == ".s0{stroke:#000;stroke-width:1.5px}\n.s1{fill:none}"
+
+
+def test_svgz_output_is_compressed_as_it_is_written(example, tmp_path):
+    svg, svgz = str(tmp_path / "a.svg"), str(tmp_path / "a.svgz")
+    eaglesch2svg.convert(example, svg)
+    eaglesch2svg.convert(example, svgz)
+    with open(svg, "rb") as f, gzip.open(svgz, "rb") as z:
+        plain, compressed = parse(f.read()), parse(z.read())
+    assert body(compressed) == body(plain)
+    assert viewbox(compressed) == VIEWBOX
+
+
+def test_svgz_output_fits_its_viewbox_on_request(example, tmp_path):
+    svg, svgz = str(tmp_path / "a.svg"), str(tmp_path / "a.svgz")
+    eaglesch2svg.convert(example, svg)
+    eaglesch2svg.convert(example, svgz, fit_viewbox=True)
+    with open(svg, "rb") as f, gzip.open(svgz, "rb") as z:
+        assert z.read() == f.read()
+
+
+def test_stdout_output_is_written_as_it_comes(example, tmp_path, capsysbinary):
+    svg = str(tmp_path / "a.svg")
+    eaglesch2svg.convert(example, svg)
+    eaglesch2svg.convert(example, "-")
+    written = parse(capsysbinary.readouterr().out)
+    with open(svg, "rb") as f:
+        assert body(written) == body(parse(f.read()))
+    assert viewbox(written) == VIEWBOX
+
+    eaglesch2svg.convert(example, "-", fit_viewbox=True)
+    with open(svg, "rb") as f:
+        assert capsysbinary.readouterr().out == f.read()
+
+
+class Socket(io.BytesIO):
+    """
+    an append-only sink which remembers what had been written at each flush
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.flushed = []
+
+    def seekable(self):
+        return False
+
+    def flush(self):
+        self.flushed.append(self.getvalue())
+
+
+def test_write_to_an_append_only_file(example):
+    f = Socket()
+    Converter().write(example, f)
+    written = parse(f.getvalue())
+    assert body(written) == body(parse(Converter().convert(example)))
+    assert viewbox(written) == VIEWBOX
+
+    f = Socket()
+    Converter(fit_viewbox=True).write(example, f)
+    assert f.getvalue() == Converter().convert(example)
+
+
+def test_each_sheet_is_handed_on_once_drawn(example):
+    f = Socket()
+    Converter().write(example, f)
+    first = next(data for data in f.flushed if b'id="sheet0"' in data)
+    assert b'id="sheet1"' not in first
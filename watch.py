@@ -0,0 +1,168 @@
+"""
+watch mode: a schematic kept in memory and updated incrementally when its file changes
+
+on every save the file is parsed again, but only into ElementTree elements. each <library>, <part>
+and <sheet> element is hashed, and only those whose hash changed are built again:
+
+- a changed library is rebuilt and its symbol definitions are dropped from the registry
+- a changed part is rebuilt, and so are the parts of a changed library
+- a sheet is rebuilt and populated again when its own element changed or when one of its instances
+  refers to a changed part or library
+
+unchanged sheets keep their populated objects, so only the rebuilt ones need drawing again, and the
+sheets whose xref labels name a net drawn on a rebuilt or removed sheet
+"""
+
+import hashlib
+import os
+import sys
+import time
+import traceback
+from xml.etree import ElementTree
+
+import instrument
+from schematic import Schematic, Part, Sheet
+from streamparser import element2dict
+
+
+def digest(elem):
+    return hashlib.sha256(ElementTree.tostring(elem)).hexdigest()
+
+
+def children(elem, container, tag):
+    found = elem.find(container)
+    return [] if found is None else found.findall(tag)
+
+
+class Watcher(object):
+    """
+    holds the Schematic of filename between updates; update() returns the sheets drawn again
+    """
+
+    def __init__(self, filename, library_cache=None, infer_junctions=False):
+        self.filename = filename
+        self.library_cache = library_cache
+        self.infer_junctions = infer_junctions
+        self.stamp = None
+        self.reset()
+
+    def reset(self):
+        self.schematic = Schematic({}, library_cache=self.library_cache)
+        self.libraries = {}
+        self.parts = {}
+        self.sheets = []
+
+    def changed(self):
+        """
+        True when the file has a new modification time or size since the last call
+        """
+        try:
+            stat = os.stat(self.filename)
+        except OSError:
+            return False
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp == self.stamp:
+            return False
+        self.stamp = stamp
+        return True
+
+    def update(self):
+        """
+        reads the file again and rebuilds what changed; returns the sheets to draw again in order.
+        on an error, e.g. a file read while it is being saved, everything is rebuilt next time
+        """
+        try:
+            with instrument.phase("parse"):
+                root = ElementTree.parse(self.filename).getroot()
+            element = root.find("drawing/schematic")
+            if element is None:
+                raise ValueError("{} has no schematic".format(self.filename))
+            return self.apply(element)
+        except Exception:
+            self.reset()
+            raise
+
+    def apply(self, element):
+        schematic = self.schematic
+
+        libraries = {elem.get("name"): elem for elem in children(element, "libraries", "library")}
+        hashes = {name: digest(elem) for name, elem in libraries.items()}
+        changed_libraries = {name for name in set(hashes) | set(self.libraries)
+                             if hashes.get(name) != self.libraries.get(name)}
+        for name in changed_libraries:
+            schematic.symbols.forget(name)
+            schematic.libraries.pop(name, None)
+            schematic.library_keys.pop(name, None)
+            if name in libraries:
+                schematic.load_library(element2dict(libraries[name]))
+        self.libraries = hashes
+
+        parts = {elem.get("name"): elem for elem in children(element, "parts", "part")}
+        hashes = {name: digest(elem) for name, elem in parts.items()}
+        # parts of a changed library too, as their generated values depend on its devicesets
+        changed_parts = {name for name in set(hashes) | set(self.parts)
+                         if hashes.get(name) != self.parts.get(name)
+                         or name in parts and parts[name].get("library") in changed_libraries}
+        for name in changed_parts:
+            schematic.parts.pop(name, None)
+            if name in parts:
+                schematic.add_part(Part(element2dict(parts[name])))
+        self.parts = hashes
+
+        xreflabel = element.get("xreflabel", Schematic.xreflabel)
+        # nets whose xref labels may read differently now
+        xref_nets = set()
+        sheets = children(element, "sheets", "sheet")
+        hashes = [digest(elem) for elem in sheets]
+        for sheet in schematic.sheets[len(sheets):]:
+            schematic.connectivity.remove_sheet(sheet.id)
+            schematic.xrefs.remove_sheet(sheet.number)
+            xref_nets.update(net.name for net in sheet.nets)
+        del schematic.sheets[len(sheets):]
+        rebuilt = []
+        for index, (elem, sheet_hash) in enumerate(zip(sheets, hashes)):
+            if index < len(schematic.sheets) and sheet_hash == self.sheets[index]:
+                sheet = schematic.sheets[index]
+                if not any(instance.part.name in changed_parts or instance.part.library in changed_libraries
+                           for instance in sheet.instances):
+                    continue
+            sheet = Sheet(element2dict(elem) or {})
+            if index < len(schematic.sheets):
+                xref_nets.update(net.name for net in schematic.sheets[index].nets)
+                schematic.add_sheet(sheet, index)
+            else:
+                schematic.add_sheet(sheet)
+            if self.infer_junctions:
+                sheet.infer_junctions()
+            xref_nets.update(net.name for net in sheet.nets)
+            rebuilt.append(sheet)
+        self.sheets = hashes
+
+        changed_format = xreflabel != schematic.xreflabel
+        schematic.xreflabel = xreflabel
+        redrawn = [sheet for sheet in schematic.sheets if sheet not in rebuilt and
+                   any(net.has_xrefs() and (changed_format or net.name in xref_nets) for net in sheet.nets)]
+        rebuilt = [sheet for sheet in schematic.sheets if sheet in rebuilt or sheet in redrawn]
+
+        if self.library_cache is not None:
+            schematic.store_libraries()
+        return rebuilt
+
+    def run(self, render, interval=0.5):
+        """
+        polls the file every interval seconds and calls render(schematic, sheets) with the sheets
+        rebuilt after each change, the first time with all of them; runs until interrupted
+        """
+        while True:
+            if self.changed():
+                start = time.perf_counter()
+                try:
+                    sheets = self.update()
+                    render(self.schematic, sheets)
+                except Exception:
+                    print("{} failed:\n{}".format(self.filename, traceback.format_exc()), file=sys.stderr)
+                else:
+                    print("{}: {} redrawn ({:.2f}s)".format(self.filename, " ".join(sheet.id for sheet in sheets)
+                                                            or "nothing", time.perf_counter() - start),
+                          file=sys.stderr)
+            time.sleep(interval)
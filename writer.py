@@ -0,0 +1,485 @@
+"""
+SVG output backends
+
+schematic objects draw themselves through the same small set of calls on either backend:
+
+- StreamWriter writes SVG text to a file object as soon as each element is given
+- SvgwriteWriter builds an svgwrite.Drawing as before and saves it at the end
+
+transforms are given as lists of tuples like ("rotate", angle, cx, cy) or ("scale", sx, sy)
+and styles as dicts of presentation attributes, e.g. {"stroke": "#4BA54B", "stroke-width": 1.524}.
+with defs="defs.svg" every <use> refers to symbol definitions kept in that file instead of the document itself.
+with css=True each distinct style becomes a class in a <style> block and elements only carry the class name.
+
+open_writer() picks the sink from the file name: "-" is stdout and names ending in .svgz are gzip compressed
+as they are written. neither can be seeked back to, so their viewBox stays the one begin() is given
+unless fit_viewbox writes them to a temporary file first
+"""
+
+import contextlib
+import gzip
+import io
+import math
+import os
+import re
+import shutil
+import sys
+import tempfile
+import svgwrite
+from xml.sax.saxutils import escape, quoteattr
+
+import geometry
+import spatial
+
+
+def transform2str(transform):
+    return " ".join("{}({})".format(name, ",".join(str(arg) for arg in args)) for name, *args in transform)
+
+
+def arc2str(target, r, large_arc, angle_dir):
+    """
+    same format svgwrite's Path.push_arc() gives with absolute=True
+    """
+    x, y = target
+    return "A {r} {r} 0 {large},{sweep} {x} {y}".format(r=r, large=int(large_arc), sweep=1 if angle_dir == "+" else 0,
+                                                        x=x, y=y)
+
+
+class StyleSheet(object):
+    """
+    distinct styles as CSS classes named s0, s1, ... in order of first use
+    """
+    lengths = ("stroke-width", "font-size")  # these need a unit in CSS, user units are px
+
+    def __init__(self):
+        self.classes = {}
+
+    def name(self, style):
+        key = tuple((prop, value) for prop, value in style.items() if value is not None)
+        name = self.classes.get(key)
+        if name is None:
+            name = self.classes[key] = "s{}".format(len(self.classes))
+        return name
+
+    def css(self):
+        rules = []
+        for key, name in self.classes.items():
+            declarations = ";".join("{}:{}{}".format(prop, value, "px" if prop in self.lengths else "")
+                                    for prop, value in key)
+            rules.append(".{}{{{}}}".format(name, declarations))
+        return "\n".join(rules)
+
+
+class StreamWriter(object):
+    """
+    writes SVG text directly to a file object; nothing is kept after an element is written
+    except the style classes, which are written at the end
+    """
+    header = '<?xml version="1.0" encoding="utf-8" ?>\n'
+    viewbox_width = 64
+
+    def __init__(self, f, defs="", css=False, rewritable=True):
+        """
+        rewritable: f may be seeked back to replace the viewBox, see set_viewbox()
+        """
+        self.f = f
+        self.defs = defs
+        self.stylesheet = StyleSheet() if css else None
+        self.rewritable = rewritable
+        self.viewbox_at = None
+
+    def style(self, attrs, style):
+        if self.stylesheet is None:
+            attrs.update(style)
+        else:
+            attrs["class"] = self.stylesheet.name(style)
+        return attrs
+
+    def write(self, tag, attrs, content=None, close=True):
+        items = " ".join("{}={}".format(key, quoteattr(str(value))) for key, value in attrs.items()
+                         if value is not None)
+        if content is not None:
+            self.f.write("<{} {}>{}</{}>\n".format(tag, items, escape(content), tag))
+        elif close:
+            self.f.write("<{} {}/>\n".format(tag, items))
+        else:
+            self.f.write("<{} {}>\n".format(tag, items) if items else "<{}>\n".format(tag))
+
+    def begin(self, viewbox):
+        self.f.write(self.header)
+        self.f.write('<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" '
+                     'baseProfile="full" version="1.1" width="100%" height="100%" ')
+        self.viewbox_at = self.f.tell() if self.rewritable and self.f.seekable() else None
+        text = self.viewbox2str(viewbox)
+        # room is kept after the viewBox so set_viewbox() can rewrite it in place
+        self.f.write(text if self.viewbox_at is None else text.ljust(self.viewbox_width))
+        self.f.write(">\n")
+
+    @staticmethod
+    def viewbox2str(viewbox):
+        return 'viewBox="{}"'.format(",".join(str(value) for value in viewbox))
+
+    def set_viewbox(self, viewbox):
+        """
+        replaces the viewBox given to begin(); returns False when the file can not be rewritten
+        """
+        text = self.viewbox2str(viewbox)
+        if self.viewbox_at is None or len(text) > self.viewbox_width:
+            return False
+        position = self.f.tell()
+        self.f.seek(self.viewbox_at)
+        self.f.write(text.ljust(self.viewbox_width))
+        self.f.seek(position)
+        return True
+
+    def end(self):
+        if self.stylesheet is not None and self.stylesheet.classes:
+            # a style sheet applies to the whole document wherever it is
+            self.write("style", {"type": "text/css"}, content="\n{}\n".format(self.stylesheet.css()))
+        self.f.write("</svg>\n")
+
+    def flush(self):
+        """
+        pushes everything written so far to the sink, e.g. after each sheet
+        """
+        self.f.flush()
+
+    def begin_defs(self):
+        self.write("defs", {}, close=False)
+
+    def end_defs(self):
+        self.f.write("</defs>\n")
+
+    def begin_group(self, id=None, transform=None, **attrs):
+        attrs = dict({"id": id, "transform": transform2str(transform) if transform else None}, **attrs)
+        self.write("g", attrs, close=False)
+
+    def end_group(self):
+        self.f.write("</g>\n")
+
+    def line(self, start, end, style, id=None):
+        (x1, y1), (x2, y2) = start, end
+        self.write("line", self.style({"id": id, "x1": x1, "y1": y1, "x2": x2, "y2": y2}, style))
+
+    def circle(self, center, r, style):
+        cx, cy = center
+        self.write("circle", self.style({"cx": cx, "cy": cy, "r": r}, style))
+
+    def rect(self, insert, size, style):
+        (x, y), (width, height) = insert, size
+        self.write("rect", self.style({"x": x, "y": y, "width": width, "height": height}, style))
+
+    def path(self, d, style):
+        self.write("path", self.style({"d": d}, style))
+
+    def text(self, text, insert, style, transform=None):
+        x, y = insert
+        attrs = {"x": x, "y": y, "transform": transform2str(transform) if transform else None}
+        self.write("text", self.style(attrs, style), content=text)
+
+    def use(self, href, insert=None, id=None, transform=None, **attrs):
+        attrs = dict({"id": id, "xlink:href": "{}#{}".format(self.defs, href),
+                      "transform": transform2str(transform) if transform else None}, **attrs)
+        if insert is not None:
+            attrs["x"], attrs["y"] = insert
+        self.write("use", attrs)
+
+
+class SvgwriteWriter(object):
+    """
+    builds the whole drawing with svgwrite and writes it to f at the end; kept for compatibility
+    """
+
+    def __init__(self, f, debug=True, pretty=True, defs="", css=False):
+        self.f = f
+        self.dwg = svgwrite.Drawing(debug=debug)
+        self.unchecked = svgwrite.Drawing(debug=False)
+        self.pretty = pretty
+        self.defs = defs
+        self.stylesheet = StyleSheet() if css else None
+        self.stack = []
+
+    def style(self, style):
+        if self.stylesheet is None:
+            return style
+        return {"class_": self.stylesheet.name(style)}
+
+    def add(self, element):
+        self.stack[-1].add(element)
+        return element
+
+    def create(self, name, attrs, *args, **kwargs):
+        """
+        element made by the drawing, or with data-* attributes, which svgwrite's validator does not know,
+        by a drawing which does not validate
+        """
+        factory = self.unchecked if any(key.startswith("data-") for key in attrs) else self.dwg
+        element = getattr(factory, name)(*args, **kwargs)
+        for key, value in attrs.items():
+            element[key] = value
+        return element
+
+    def begin(self, viewbox):
+        self.dwg.viewbox(*viewbox)
+        self.stack.append(self.dwg)
+
+    def set_viewbox(self, viewbox):
+        self.dwg.viewbox(*viewbox)
+        return True
+
+    def end(self):
+        self.stack.pop()
+        if self.stylesheet is not None and self.stylesheet.classes:
+            self.dwg.embed_stylesheet(self.stylesheet.css())
+        self.dwg.write(self.f, pretty=self.pretty)
+
+    def flush(self):
+        pass
+
+    def begin_defs(self):
+        self.stack.append(self.dwg.defs)
+
+    def end_defs(self):
+        self.stack.pop()
+
+    def begin_group(self, id=None, transform=None, **attrs):
+        group = self.add(self.create("g", attrs))
+        if id is not None:
+            group["id"] = id
+        if transform:
+            group["transform"] = transform2str(transform)
+        self.stack.append(group)
+
+    def end_group(self):
+        self.stack.pop()
+
+    def line(self, start, end, style, id=None):
+        line = self.add(self.dwg.line(start=start, end=end, **self.style(style)))
+        if id is not None:
+            line["id"] = id
+
+    def circle(self, center, r, style):
+        self.add(self.dwg.circle(center=center, r=r, **self.style(style)))
+
+    def rect(self, insert, size, style):
+        self.add(self.dwg.rect(insert=insert, size=size, **self.style(style)))
+
+    def path(self, d, style):
+        self.add(self.dwg.path(d=d, **self.style(style)))
+
+    def text(self, text, insert, style, transform=None):
+        text = self.add(self.dwg.text(text, insert=insert, **self.style(style)))
+        if transform:
+            text["transform"] = transform2str(transform)
+
+    def use(self, href, insert=None, id=None, transform=None, **attrs):
+        use = self.add(self.create("use", attrs, "{}#{}".format(self.defs, href), insert=insert))
+        if id is not None:
+            use["id"] = id
+        if transform:
+            use["transform"] = transform2str(transform)
+
+
+class FlatteningWriter(object):
+    """
+    wraps another writer and hands it absolute geometry: group transforms are composed into one matrix
+    which is applied to the coordinates, and every <use> is replaced by what it refers to, drawn by
+    definitions.render_one(writer, id). texts keep a single matrix() when they are rotated.
+    symbol definitions are not written, nothing refers to them
+    """
+    path_tokens = re.compile(r"[MLAZ]|[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+
+    def __init__(self, writer, definitions):
+        self.writer = writer
+        self.definitions = definitions
+        self.stack = [spatial.IDENTITY]
+        self.expanding = 0
+        self.skipping = 0
+
+    @staticmethod
+    def number(value):
+        return round(value * geometry.SCALE) / geometry.SCALE
+
+    def point(self, point):
+        x, y = spatial.apply(self.stack[-1], point)
+        return (self.number(x), self.number(y))
+
+    def scale(self):
+        a, b, c, d, e, f = self.stack[-1]
+        return math.sqrt(abs(a * d - b * c))
+
+    def begin(self, viewbox):
+        self.writer.begin(viewbox)
+
+    def set_viewbox(self, viewbox):
+        return self.writer.set_viewbox(viewbox)
+
+    def end(self):
+        self.writer.end()
+
+    def flush(self):
+        self.writer.flush()
+
+    def begin_defs(self):
+        self.skipping += 1
+
+    def end_defs(self):
+        self.skipping -= 1
+
+    def begin_group(self, id=None, transform=None, **attrs):
+        self.stack.append(spatial.multiply(self.stack[-1], spatial.matrix(transform)))
+        if not self.skipping:
+            # ids inside expanded definitions would repeat for every instance
+            self.writer.begin_group(id=None if self.expanding else id, **attrs)
+
+    def end_group(self):
+        self.stack.pop()
+        if not self.skipping:
+            self.writer.end_group()
+
+    def line(self, start, end, style, id=None):
+        if not self.skipping:
+            self.writer.line(self.point(start), self.point(end), style, None if self.expanding else id)
+
+    def circle(self, center, r, style):
+        if not self.skipping:
+            self.writer.circle(self.point(center), self.number(r * self.scale()), style)
+
+    def rect(self, insert, size, style):
+        if self.skipping:
+            return
+        (x, y), (width, height) = insert, size
+        corners = [self.point(corner) for corner in ((x, y), (x + width, y), (x + width, y + height), (x, y + height))]
+        a, b, c, d, e, f = self.stack[-1]
+        if (b, c) == (0, 0) or (a, d) == (0, 0):
+            xmin, ymin, xmax, ymax = spatial.points_box(corners)
+            self.writer.rect((xmin, ymin), (self.number(xmax - xmin), self.number(ymax - ymin)), style)
+        else:
+            self.writer.path(" ".join(["M{} {}".format(*corners[0])] +
+                                      ["L{} {}".format(*corner) for corner in corners[1:]] + ["Z"]), style)
+
+    def path(self, d, style):
+        if not self.skipping:
+            self.writer.path(self.transform_path(d), style)
+
+    def transform_path(self, d):
+        """
+        d as written by the schematic objects: M, L, A with equal radii, and Z
+        """
+        tokens = self.path_tokens.findall(d)
+        mirrored = spatial.matrix_determinant(self.stack[-1]) < 0
+        path = []
+        index = 0
+        while index < len(tokens):
+            command = tokens[index]
+            if command in "ML":
+                x, y = self.point((float(tokens[index + 1]), float(tokens[index + 2])))
+                path.append("{}{} {}".format(command, x, y))
+                index += 3
+            elif command == "A":
+                r, large, sweep = float(tokens[index + 1]), int(tokens[index + 4]), int(tokens[index + 5])
+                target = self.point((float(tokens[index + 6]), float(tokens[index + 7])))
+                sweep = 1 - sweep if mirrored else sweep
+                path.append(arc2str(target, self.number(r * self.scale()), large, "+" if sweep else "-"))
+                index += 8
+            else:
+                path.append(command)
+                index += 1
+        return " ".join(path)
+
+    def text(self, text, insert, style, transform=None):
+        if self.skipping:
+            return
+        m = spatial.multiply(self.stack[-1], spatial.matrix(transform))
+        x, y = spatial.apply(m, insert)
+        x, y = self.number(x), self.number(y)
+        a, b, c, d, e, f = m
+        if (a, b, c, d) == (1.0, 0.0, 0.0, 1.0):
+            self.writer.text(text, (x, y), style)
+        else:
+            # the text is placed at its absolute position and turned around it
+            rotation = (a, b, c, d, x - a * x - c * y, y - b * x - d * y)
+            self.writer.text(text, (x, y), style, [("matrix",) + tuple(self.number(value) for value in rotation)])
+
+    def use(self, href, insert=None, id=None, transform=None, **attrs):
+        if self.skipping:
+            return
+        m = spatial.multiply(self.stack[-1], spatial.matrix(transform))
+        if insert is not None:
+            m = spatial.multiply(m, spatial.to_matrix(("translate",) + tuple(insert)))
+        self.stack.append(m)
+        self.writer.begin_group(id=None if self.expanding else id, **attrs)
+        self.expanding += 1
+        self.definitions.render_one(self, href)
+        self.expanding -= 1
+        self.writer.end_group()
+        self.stack.pop()
+
+
+def remove_existing(filename):
+    """
+    removes filename before it is written again, so a file hard linked to it, e.g. a cached result,
+    keeps its content instead of being overwritten through the link
+    """
+    try:
+        os.remove(filename)
+    except FileNotFoundError:
+        pass
+
+
+def streamed(filename):
+    """
+    True when the sink of filename is written only once from start to end, see open_sink()
+    """
+    return filename == "-" or filename.endswith(".svgz")
+
+
+@contextlib.contextmanager
+def open_sink(filename, fit_viewbox=False):
+    """
+    text file for filename: "-" is stdout, names ending in .svgz are gzip compressed.
+    with fit_viewbox both are written to a temporary file first and copied to their sink at the end,
+    so the viewBox can still be rewritten, which neither a pipe nor a gzip stream allows
+    """
+    if streamed(filename) and fit_viewbox:
+        with tempfile.TemporaryFile() as raw:
+            f = io.TextIOWrapper(raw, encoding="utf-8")
+            yield f
+            f.flush()
+            f.detach()
+            raw.seek(0)
+            if filename == "-":
+                shutil.copyfileobj(raw, sys.stdout.buffer)
+                sys.stdout.buffer.flush()
+            else:
+                remove_existing(filename)
+                with gzip.open(filename, "wb") as out:
+                    shutil.copyfileobj(raw, out)
+    elif filename == "-":
+        f = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8")
+        try:
+            yield f
+        finally:
+            f.flush()
+            # stdout stays open
+            f.detach()
+    elif filename.endswith(".svgz"):
+        remove_existing(filename)
+        with gzip.open(filename, "wt", encoding="utf-8") as f:
+            yield f
+    else:
+        remove_existing(filename)
+        with open(filename, "w", encoding="utf-8") as f:
+            yield f
+
+
+@contextlib.contextmanager
+def open_writer(filename, backend="stream", defs="", css=False, fit_viewbox=False):
+    """
+    backend: "stream" or "svgwrite"; fit_viewbox: see open_sink()
+    """
+    with open_sink(filename, fit_viewbox) as f:
+        if backend == "stream":
+            yield StreamWriter(f, defs, css, rewritable=fit_viewbox or not streamed(filename))
+        else:
+            yield SvgwriteWriter(f, defs=defs, css=css)